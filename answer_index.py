@@ -0,0 +1,236 @@
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from intents import NEGATIONS, normalize
+
+# Per-question alias index for closed questions: maps a spoken answer to one
+# of the question's options without an LLM call. Aliases are tagged with the
+# language they belong to so an English session doesn't silently accept an
+# Urdu answer (the agent treats that as wrong_language).
+
+# Synonyms for common survey options, keyed by normalized option text.
+# "ur" covers both Nastaliq and romanized Urdu.
+OPTION_SYNONYMS: Dict[str, Dict[str, List[str]]] = {
+    "yes": {
+        "en": ["yeah", "yep", "yup", "sure", "of course", "definitely", "correct", "right", "absolutely"],
+        "ur": ["ہاں", "جی", "جی ہاں", "ہاں جی", "بالکل", "haan", "han", "haa", "ha", "ji", "jee", "ji haan", "haan ji", "bilkul"],
+    },
+    "no": {
+        "en": ["nope", "nah", "not at all"],
+        "ur": ["نہیں", "جی نہیں", "نہیں جی", "بالکل نہیں", "nahi", "nahin", "nai", "na", "ji nahi", "nahi ji", "bilkul nahi"],
+    },
+    "always": {
+        "en": ["all the time", "every time", "constantly"],
+        "ur": ["ہمیشہ", "ہر وقت", "hamesha", "humesha", "har waqt"],
+    },
+    "often": {
+        "en": ["frequently", "usually", "mostly", "most of the time"],
+        "ur": ["اکثر", "زیادہ تر", "aksar", "akasr", "zyada tar", "ziada tar"],
+    },
+    "sometimes": {
+        "en": ["occasionally", "at times", "now and then", "some times"],
+        "ur": ["کبھی کبھی", "کبھی کبھار", "kabhi kabhi", "kabhi kabhar", "kabhi kabhaar"],
+    },
+    "rarely": {
+        "en": ["seldom", "hardly ever", "barely", "almost never", "not often"],
+        "ur": ["شاذ و نادر", "بہت کم", "کم ہی", "shaz o nadir", "bohat kam", "bahut kam", "kam hi"],
+    },
+    "never": {
+        "en": ["not ever", "not once"],
+        "ur": ["کبھی نہیں", "kabhi nahi", "kabhi nahin"],
+    },
+    "satisfied": {
+        "en": ["happy", "content", "fine", "okay", "ok"],
+        "ur": ["مطمئن", "خوش", "ٹھیک", "mutmain", "mutmaeen", "khush", "theek"],
+    },
+    "highly satisfied": {
+        "en": ["very satisfied", "extremely satisfied", "very happy", "really happy", "really satisfied", "completely satisfied"],
+        "ur": ["بہت مطمئن", "بہت خوش", "بالکل مطمئن", "bohat mutmain", "bahut mutmain", "bohat khush", "bahut khush"],
+    },
+    "not satisfied": {
+        "en": ["unsatisfied", "dissatisfied", "unhappy", "not happy", "not content"],
+        "ur": ["مطمئن نہیں", "غیر مطمئن", "خوش نہیں", "mutmain nahi", "mutmain nahin", "khush nahi", "ghair mutmain"],
+    },
+    "agree": {
+        "en": ["i agree", "agreed"],
+        "ur": ["متفق", "muttafiq", "mutafiq"],
+    },
+    "disagree": {
+        "en": ["i disagree", "don't agree", "do not agree"],
+        "ur": ["متفق نہیں", "muttafiq nahi", "mutafiq nahi"],
+    },
+    "neutral": {
+        "en": ["no opinion", "in between"],
+        "ur": ["درمیانہ", "darmiyana"],
+    },
+}
+
+# Aliases that only count as the whole reply: "i don't" answers "do you...?",
+# but "i don't know" or "i do not understand the question" must not.
+WHOLE_REPLY_SYNONYMS: Dict[str, Dict[str, List[str]]] = {
+    "yes": {"en": ["i have", "i do", "yes i have", "yes i do"]},
+    "no": {"en": ["i have not", "i haven't", "i havent", "i don't", "i dont", "i do not", "no i don't", "no i haven't"]},
+}
+
+# Replies saying the user can't or won't answer go to the LLM even when they
+# contain an option word ("right i dont know", "sure i can't say"), unless the
+# phrase is one of the question's own options ("don't know").
+UNCERTAIN_PHRASES = [
+    "don't know", "dont know", "do not know", "no idea", "not sure", "unsure",
+    "can't say", "cant say", "cannot say", "can not say",
+    "don't understand", "dont understand", "do not understand",
+    "don't want to", "dont want to", "do not want to", "rather not", "prefer not to",
+    "don't remember", "dont remember", "do not remember", "can't remember", "cant remember",
+    "not decided", "haven't decided", "have not decided",
+    "پتہ نہیں", "نہیں پتہ", "معلوم نہیں", "نہیں معلوم", "یاد نہیں", "سمجھ نہیں",
+    "pata nahi", "pata nahin", "nahi pata", "maloom nahi", "malum nahi", "nahi maloom",
+    "yaad nahi", "samajh nahi",
+]
+_UNCERTAIN = [tuple(normalize(phrase).split()) for phrase in UNCERTAIN_PHRASES]
+
+
+def _contains(tokens: Tuple[str, ...], phrase: Tuple[str, ...]) -> bool:
+    n = len(phrase)
+    return any(tokens[i:i + n] == phrase for i in range(len(tokens) - n + 1))
+
+
+ORDINALS: Dict[str, int] = {
+    "first": 1, "1st": 1, "second": 2, "2nd": 2, "third": 3, "3rd": 3, "fourth": 4, "4th": 4,
+    "fifth": 5, "5th": 5, "last": -1,
+    "پہلا": 1, "پہلے": 1, "پہلی": 1, "دوسرا": 2, "دوسرے": 2, "دوسری": 2,
+    "تیسرا": 3, "تیسرے": 3, "تیسری": 3, "چوتھا": 4, "چوتھے": 4, "چوتھی": 4,
+    "پانچواں": 5, "پانچویں": 5, "آخری": -1,
+    "pehla": 1, "pehle": 1, "pehli": 1, "dusra": 2, "doosra": 2, "dusre": 2, "doosre": 2,
+    "teesra": 3, "teesre": 3, "chautha": 4, "chothe": 4, "aakhri": -1, "akhri": -1,
+}
+# "option 2", "number two", "نمبر دو"
+_ORDINAL_LEADS = {"option", "number", "no", "choice", "آپشن", "نمبر"}
+# "second one", "the second option", "دوسرا والا", "dusra wala"
+_ORDINAL_NOUNS = {"one", "option", "choice", "آپشن", "والا", "والی", "والے", "wala", "wali", "wale"}
+# Ordinals that are mostly ordinary words ("last week", "pehle" = before):
+# only taken next to a lead or noun, never on their own
+_AMBIGUOUS_ORDINALS = {"last", "pehle", "پہلے"}
+_CARDINALS = {
+    "one": 1, "two": 2, "three": 3, "four": 4, "five": 5,
+    "ایک": 1, "دو": 2, "تین": 3, "چار": 4, "پانچ": 5,
+    "ek": 1, "do": 2, "teen": 3, "char": 4, "chaar": 4, "paanch": 5,
+}
+
+# Long replies that happen to contain an option word are left to the LLM.
+MAX_ANSWER_TOKENS = 12
+
+Alias = Tuple[Tuple[str, ...], int, Optional[str]]  # (tokens, option position, language or None)
+
+
+class OptionAliasIndex:
+    """
+    Normalized-token alias lookup for one closed question.
+
+    Aliases are the exact option texts, known synonyms and Urdu equivalents.
+    If no alias matches, ordinal references ("the second one", "option 3",
+    "دوسرا") are resolved against the option order.
+    """
+
+    __slots__ = ("options", "_by_first_token", "_whole_replies", "_uncertain", "_numeric_options")
+
+    def __init__(self, options: List[str], extra_aliases: Iterable[Tuple[str, int, Optional[str]]] = ()):
+        """extra_aliases: more spoken forms as (alias, option position, language), e.g. translations."""
+        self.options = [opt.strip() for opt in options if opt and opt.strip()]
+        self._by_first_token: Dict[str, List[Alias]] = {}
+        self._whole_replies: Dict[Tuple[str, ...], List[Tuple[int, Optional[str]]]] = {}
+        self._numeric_options = any(normalize(opt).isdigit() for opt in self.options)
+        for position, option in enumerate(self.options):
+            key = normalize(option)
+            self._add(key, position, None)
+            for language, aliases in OPTION_SYNONYMS.get(key, {}).items():
+                for alias in aliases:
+                    self._add(normalize(alias), position, language)
+            for language, aliases in WHOLE_REPLY_SYNONYMS.get(key, {}).items():
+                for alias in aliases:
+                    self._whole_replies.setdefault(tuple(normalize(alias).split()), []).append((position, language))
+        option_tokens = [tuple(normalize(option).split()) for option in self.options]
+        self._uncertain = [p for p in _UNCERTAIN if not any(_contains(tokens, p) for tokens in option_tokens)]
+        for alias, position, language in extra_aliases:
+            self._add(normalize(alias), position, language)
+
+    def _add(self, alias: str, position: int, language: Optional[str]):
+        tokens = tuple(alias.split())
+        if tokens and (tokens, position, language) not in self._by_first_token.get(tokens[0], ()):
+            self._by_first_token.setdefault(tokens[0], []).append((tokens, position, language))
+
+    def __len__(self):
+        return len(self.options)
+
+    def is_uncertain(self, text: str) -> bool:
+        """True for "I don't know"-style replies, which are never answered locally."""
+        tokens = tuple(normalize(text).split())
+        return any(_contains(tokens, phrase) for phrase in self._uncertain)
+
+    def _alias_matches(self, tokens: List[str], language: Optional[str]) -> List[Tuple[int, int, int]]:
+        """All (start, end, option position) spans where an alias occurs."""
+        spans = []
+        for i, token in enumerate(tokens):
+            for alias, position, alias_lang in self._by_first_token.get(token, ()):
+                if alias_lang is not None and language is not None and alias_lang != language:
+                    continue
+                end = i + len(alias)
+                if tuple(tokens[i:end]) == alias:
+                    spans.append((i, end, position))
+        return spans
+
+    def _ordinal(self, tokens: List[str]) -> Optional[int]:
+        # An ordinal is the whole reply ("second", "the third") or sits next to a
+        # lead or noun; "I did it last week" is not a reference to the last option.
+        alone = len([token for token in tokens if token not in ("the", "a")]) == 1
+        for i, token in enumerate(tokens):
+            if token in ORDINALS:
+                beside = (i > 0 and tokens[i - 1] in _ORDINAL_LEADS) or (i + 1 < len(tokens) and tokens[i + 1] in _ORDINAL_NOUNS)
+                if not beside and not (alone and token not in _AMBIGUOUS_ORDINALS):
+                    continue
+                n = ORDINALS[token]
+                return len(self.options) - 1 if n == -1 else n - 1
+            if i > 0 and tokens[i - 1] in _ORDINAL_LEADS:
+                if token.isdigit():
+                    return int(token) - 1
+                if token in _CARDINALS:
+                    return _CARDINALS[token] - 1
+        if len(tokens) == 1 and tokens[0].isdigit() and not self._numeric_options:
+            return int(tokens[0]) - 1
+        return None
+
+    def match(self, text: str, language: Optional[str] = None) -> Optional[str]:
+        """Returns the option the answer maps to, or None when absent or ambiguous."""
+        if not self.options or "?" in text or "؟" in text:
+            return None
+        tokens = normalize(text).split()
+        if not tokens or len(tokens) > MAX_ANSWER_TOKENS or self.is_uncertain(text):
+            return None
+
+        whole = {
+            position for position, alias_lang in self._whole_replies.get(tuple(tokens), ())
+            if alias_lang is None or language is None or alias_lang == language
+        }
+        if len(whole) == 1:
+            return self.options[whole.pop()]
+
+        spans = self._alias_matches(tokens, language)
+        # Drop matches nested in a longer one ("satisfied" inside "not satisfied").
+        spans = [
+            s for s in spans
+            if not any(o[0] <= s[0] and s[1] <= o[1] and (o[1] - o[0]) > (s[1] - s[0]) for o in spans)
+        ]
+        if spans:
+            positions = {position for _, _, position in spans}
+            if len(positions) != 1:
+                return None
+            covered = {i for start, end, _ in spans for i in range(start, end)}
+            for start, end, _ in spans:
+                # "not always", "always nahi": a stray negation flips the meaning.
+                for j in (start - 1, end):
+                    if 0 <= j < len(tokens) and j not in covered and tokens[j] in NEGATIONS:
+                        return None
+            return self.options[positions.pop()]
+
+        position = self._ordinal(tokens)
+        if position is not None and 0 <= position < len(self.options):
+            return self.options[position]
+        return None
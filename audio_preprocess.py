@@ -0,0 +1,210 @@
+import asyncio
+import concurrent.futures
+import io
+import wave
+from typing import Any, Dict, Optional
+
+import numpy as np
+
+# Local clean-up of uploaded clips before they are sent to Whisper:
+# decode WAV, downmix to mono, resample to 16 kHz (what Whisper uses
+# internally), trim leading/trailing silence with an energy-based VAD and
+# re-encode as 16-bit mono WAV. Clips with no speech are flagged as silent
+# so the caller can skip the STT call entirely.
+#
+# Only PCM WAV can be decoded without native codecs; other containers
+# (webm/ogg/mp3) are passed through unchanged unless they are empty.
+
+TARGET_RATE = 16000
+FRAME_MS = 30
+# A frame is speech if it is this much louder than the clip's noise floor...
+VAD_MARGIN_DB = 10.0
+# ...and louder than this in absolute terms (dBFS)
+VAD_MIN_DBFS = -55.0
+# Speech shorter than this in total is treated as silence (clicks, breaths)
+MIN_SPEECH_MS = 150
+# Kept around the detected speech so word onsets/endings aren't clipped
+PAD_MS = 250
+
+
+class PreparedAudio:
+    """What to send to STT. silent=True means there is nothing to transcribe."""
+
+    __slots__ = ("data", "filename", "content_type", "silent", "processed", "stats")
+
+    def __init__(self, data: bytes, filename: str, content_type: str, silent: bool = False,
+                 processed: bool = False, stats: Optional[Dict[str, Any]] = None):
+        self.data = data
+        self.filename = filename
+        self.content_type = content_type
+        self.silent = silent
+        self.processed = processed
+        self.stats = stats or {}
+
+
+def _is_wav(data: bytes) -> bool:
+    return len(data) >= 12 and data[:4] == b"RIFF" and data[8:12] == b"WAVE"
+
+
+def decode_wav(data: bytes):
+    """PCM WAV -> (float32 samples in [-1, 1], shape (frames, channels), sample rate)."""
+    with wave.open(io.BytesIO(data)) as w:
+        channels, width, rate = w.getnchannels(), w.getsampwidth(), w.getframerate()
+        raw = w.readframes(w.getnframes())
+    if width == 1:
+        samples = (np.frombuffer(raw, dtype=np.uint8).astype(np.float32) - 128.0) / 128.0
+    elif width == 2:
+        samples = np.frombuffer(raw, dtype="<i2").astype(np.float32) / 32768.0
+    elif width == 3:
+        b = np.frombuffer(raw, dtype=np.uint8).reshape(-1, 3).astype(np.int32)
+        ints = b[:, 0] | (b[:, 1] << 8) | (b[:, 2] << 16)
+        samples = (np.where(ints >= 1 << 23, ints - (1 << 24), ints)).astype(np.float32) / float(1 << 23)
+    elif width == 4:
+        samples = np.frombuffer(raw, dtype="<i4").astype(np.float32) / float(1 << 31)
+    else:
+        raise ValueError(f"Unsupported sample width: {width}")
+    frames = len(samples) // channels
+    return samples[: frames * channels].reshape(frames, channels), rate
+
+
+def encode_wav(mono: np.ndarray, rate: int) -> bytes:
+    pcm = (np.clip(mono, -1.0, 1.0) * 32767.0).astype("<i2")
+    buffer = io.BytesIO()
+    with wave.open(buffer, "wb") as w:
+        w.setnchannels(1)
+        w.setsampwidth(2)
+        w.setframerate(rate)
+        w.writeframes(pcm.tobytes())
+    return buffer.getvalue()
+
+
+def _lowpass_kernel(cutoff: float, taps: int = 63) -> np.ndarray:
+    """Windowed-sinc FIR; cutoff as a fraction of the input sample rate."""
+    n = np.arange(taps) - (taps - 1) / 2
+    kernel = np.sinc(2 * cutoff * n) * np.hamming(taps)
+    return (kernel / kernel.sum()).astype(np.float32)
+
+
+def resample(mono: np.ndarray, rate: int, target: int = TARGET_RATE) -> np.ndarray:
+    if rate == target or len(mono) == 0:
+        return mono
+    if rate > target:
+        # Anti-aliasing filter below the new Nyquist frequency
+        mono = np.convolve(mono, _lowpass_kernel(0.45 * target / rate), mode="same")
+    if rate % target == 0:
+        return mono[:: rate // target]
+    positions = np.arange(0, len(mono) * target // rate) * (rate / target)
+    return np.interp(positions, np.arange(len(mono)), mono).astype(np.float32)
+
+
+def speech_bounds(mono: np.ndarray, rate: int):
+    """
+    (start, end) sample indices of the speech in the clip, or None if there is
+    none. Frames louder than both the noise floor + VAD_MARGIN_DB and
+    VAD_MIN_DBFS count as speech.
+    """
+    frame = max(1, rate * FRAME_MS // 1000)
+    n_frames = len(mono) // frame
+    if n_frames == 0:
+        return None
+    frames = mono[: n_frames * frame].reshape(n_frames, frame)
+    energy_db = 10 * np.log10(np.mean(frames * frames, axis=1) + 1e-12)
+    noise_floor = np.percentile(energy_db, 10)
+    speech = energy_db > max(noise_floor + VAD_MARGIN_DB, VAD_MIN_DBFS)
+    if speech.sum() * FRAME_MS < MIN_SPEECH_MS:
+        return None
+    voiced = np.flatnonzero(speech)
+    pad = rate * PAD_MS // 1000
+    return max(0, voiced[0] * frame - pad), min(len(mono), (voiced[-1] + 1) * frame + pad)
+
+
+def preprocess_audio(data: bytes, filename: Optional[str], content_type: Optional[str]) -> PreparedAudio:
+    """CPU-bound; runs in the preprocessing pool."""
+    filename = filename or "audio.webm"
+    content_type = content_type or "audio/webm"
+    if not data:
+        return PreparedAudio(data, filename, content_type, silent=True, stats={"reason": "empty"})
+    if not _is_wav(data):
+        return PreparedAudio(data, filename, content_type, stats={"reason": "not wav"})
+    try:
+        samples, rate = decode_wav(data)
+    except (wave.Error, ValueError, EOFError) as e:
+        return PreparedAudio(data, filename, content_type, stats={"reason": f"undecodable: {e}"})
+
+    mono = samples.mean(axis=1) if samples.shape[1] > 1 else samples[:, 0]
+    mono = resample(mono, rate)
+    stats = {"in_bytes": len(data), "in_seconds": round(len(samples) / rate, 3) if rate else 0.0}
+    bounds = speech_bounds(mono, TARGET_RATE)
+    if bounds is None:
+        stats["reason"] = "no speech"
+        return PreparedAudio(b"", filename, content_type, silent=True, stats=stats)
+
+    start, end = bounds
+    out = encode_wav(mono[start:end], TARGET_RATE)
+    stats.update(out_bytes=len(out), out_seconds=round(float(end - start) / TARGET_RATE, 3))
+    return PreparedAudio(out, filename.rsplit(".", 1)[0] + ".wav", "audio/wav", processed=True, stats=stats)
+
+
+class AudioPreprocessor:
+    """
+    Runs preprocess_audio in a process pool (started on first use). workers=0
+    runs it in a thread instead; enabled=False passes clips through untouched.
+    """
+
+    def __init__(self, workers: int = 1, enabled: bool = True):
+        self.workers = workers
+        self.enabled = enabled
+        self._pool: Optional[concurrent.futures.ProcessPoolExecutor] = None
+        self.clips = 0
+        self.silent = 0
+        self.bytes_in = 0
+        self.bytes_out = 0
+        self.seconds = 0.0
+
+    def _executor(self):
+        if self.workers <= 0:
+            return None
+        if self._pool is None:
+            self._pool = concurrent.futures.ProcessPoolExecutor(max_workers=self.workers)
+        return self._pool
+
+    def warm(self):
+        """Starts the worker processes (blocking) so the first clip doesn't pay for it."""
+        executor = self._executor()
+        if executor is not None:
+            for future in [executor.submit(_is_wav, b"") for _ in range(self.workers)]:
+                future.result()
+
+    async def run(self, data: bytes, filename: Optional[str], content_type: Optional[str]) -> PreparedAudio:
+        if not self.enabled:
+            return PreparedAudio(data, filename or "audio.webm", content_type or "audio/webm",
+                                 silent=not data, stats={"reason": "disabled"})
+        loop = asyncio.get_running_loop()
+        start = loop.time()
+        prepared = await loop.run_in_executor(self._executor(), preprocess_audio, data, filename, content_type)
+        self.seconds += loop.time() - start
+        self.clips += 1
+        self.silent += prepared.silent
+        self.bytes_in += len(data)
+        self.bytes_out += len(prepared.data)
+        return prepared
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "enabled": self.enabled,
+            "workers": self.workers,
+            "clips": self.clips,
+            "silent_skipped": self.silent,
+            "bytes_in": self.bytes_in,
+            "bytes_out": self.bytes_out,
+            "bytes_saved_ratio": round(1 - self.bytes_out / self.bytes_in, 3) if self.bytes_in else 0.0,
+            "avg_ms": round(self.seconds / self.clips * 1000, 2) if self.clips else 0.0,
+        }
+
+    def close(self):
+        # Waits for the worker processes to exit: a worker that is itself a
+        # multiprocessing child (uvicorn --workers) joins its children at exit
+        # and would hang on a pool that was only told to stop.
+        if self._pool is not None:
+            self._pool.shutdown(wait=True, cancel_futures=True)
+            self._pool = None
@@ -0,0 +1,185 @@
+"""
+Audio preprocessing before Whisper: bytes uploaded and end-to-end turn time.
+
+Uses "Recording (13).wav" (48 kHz stereo) as is, padded with silence the way
+an open mic records it (--lead / --tail seconds), and as a silent clip. Each
+clip goes through /process_input with preprocessing off and on.
+
+The Whisper stub charges what the real upstream roughly costs: uploading
+the file at --uplink-mbps, then --stt-ms-per-second of audio on top of a
+fixed --stt-base-ms. A turn's LLM step is a local fast-path answer ("yes"),
+so the remaining time is upload + STT + the app's own work.
+
+Usage:
+    python benchmarks/audio_preprocessing.py [--turns 5] [--uplink-mbps 2] [--stt-base-ms 300] [--stt-ms-per-second 60]
+"""
+import argparse
+import asyncio
+import contextlib
+import io
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+import wave
+from types import SimpleNamespace
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+_tmp = tempfile.mkdtemp(prefix="voice_bench_")
+_employees = os.path.join(_tmp, "employee.csv")
+with open(_employees, "w", encoding="utf-8") as f:
+    f.write("firstname,lastname\nBench,User\n")
+os.environ.setdefault("OPENAI_API_KEY", "sk-bench")
+os.environ["EMPLOYEE_FILE"] = _employees
+os.environ["RESPONSES_FILE"] = os.path.join(_tmp, "responses.csv")
+os.environ["TTS_CACHE_DIR"] = os.path.join(_tmp, "tts_cache")
+
+import httpx  # noqa: E402
+
+with contextlib.redirect_stdout(open(os.devnull, "w")):
+    import main  # noqa: E402
+from providers import OpenAIProvider  # noqa: E402
+
+
+def wav_seconds(data: bytes) -> float:
+    try:
+        with wave.open(io.BytesIO(data)) as w:
+            return w.getnframes() / w.getframerate()
+    except (wave.Error, EOFError):
+        return 0.0
+
+
+class StubOpenAI:
+    """Whisper latency = upload time + per-second-of-audio cost; counts STT calls and bytes."""
+
+    def __init__(self, args):
+        self.args = args
+        self.stt_calls = 0
+        self.stt_bytes = 0
+        self.audio = SimpleNamespace(
+            transcriptions=SimpleNamespace(create=self._transcribe),
+            speech=SimpleNamespace(create=self._speech),
+        )
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self._chat))
+        self.responses = SimpleNamespace(create=self._responses)
+
+    async def _transcribe(self, **kwargs):
+        _, data, _ = kwargs["file"]
+        self.stt_calls += 1
+        self.stt_bytes += len(data)
+        upload = len(data) * 8 / (self.args.uplink_mbps * 1e6)
+        processing = (self.args.stt_base_ms + wav_seconds(data) * self.args.stt_ms_per_second) / 1000
+        await asyncio.sleep(upload + processing)
+        return SimpleNamespace(text="yes")
+
+    async def _chat(self, **kwargs):
+        args = json.dumps({"intent": "repeat_question", "reply_to_speak": "Sure, here it is again."})
+        tool_call = SimpleNamespace(function=SimpleNamespace(name="execute_survey_action", arguments=args))
+        return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=args, tool_calls=[tool_call]))])
+
+    async def _responses(self, **kwargs):
+        content = SimpleNamespace(text="Hello {employee_name}\nThis is a short survey.")
+        return SimpleNamespace(output=[SimpleNamespace(content=[content])])
+
+    async def _speech(self, **kwargs):
+        return SimpleNamespace(content=b"OggS")
+
+
+def pad_with_silence(data: bytes, lead: float, tail: float) -> bytes:
+    with wave.open(io.BytesIO(data)) as w:
+        params = w.getparams()
+        frames = w.readframes(w.getnframes())
+    frame_bytes = params.nchannels * params.sampwidth
+    silence = lambda seconds: b"\0" * (int(seconds * params.framerate) * frame_bytes)  # noqa: E731
+    out = io.BytesIO()
+    with wave.open(out, "wb") as w:
+        w.setparams(params)
+        w.writeframes(silence(lead) + frames + silence(tail))
+    return out.getvalue()
+
+
+def silent_clip(seconds: float) -> bytes:
+    out = io.BytesIO()
+    with wave.open(out, "wb") as w:
+        w.setnchannels(2)
+        w.setsampwidth(2)
+        w.setframerate(48000)
+        w.writeframes(b"\0" * int(seconds * 48000) * 4)
+    return out.getvalue()
+
+
+def report(line: str):
+    # The app prints per-turn debug output; keep the table on the real stdout.
+    print(line, file=sys.__stdout__, flush=True)
+
+
+async def run_clip(http, survey_id, stub, clip: bytes, turns: int):
+    stub.stt_calls = stub.stt_bytes = 0
+    times = []
+    for _ in range(turns):
+        r = await http.post("/start_session", params={"survey_id": survey_id})
+        session_id = r.json()["session_id"]
+        start = time.perf_counter()
+        r = await http.post(
+            "/process_input",
+            data={"session_id": session_id},
+            files={"audio": ("turn.wav", clip, "audio/wav")},
+        )
+        r.raise_for_status()
+        times.append(time.perf_counter() - start)
+    return statistics.median(times), stub.stt_calls, stub.stt_bytes // max(1, stub.stt_calls)
+
+
+async def main_async(args):
+    stub = StubOpenAI(args)
+    main.PROVIDER = OpenAIProvider(stub)
+    main.AUDIO_PREPROCESSOR.workers = args.workers
+    with open(os.path.join(ROOT, "questions.csv"), "rb") as f:
+        survey_csv = f.read()
+    with open(os.path.join(ROOT, "Recording (13).wav"), "rb") as f:
+        recording = f.read()
+    clips = {
+        "recording": recording,
+        f"recording +{args.lead:g}s/+{args.tail:g}s silence": pad_with_silence(recording, args.lead, args.tail),
+        f"silence {args.lead:g}s": silent_clip(args.lead),
+    }
+
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=main.app), base_url="http://bench", timeout=None) as http:
+        r = await http.post(
+            "/upload_survey_csv", params={"prerender": "false"},
+            files={"csv_file": ("questions.csv", survey_csv, "text/csv")},
+        )
+        survey_id = r.json()["survey_id"]
+        main.AUDIO_PREPROCESSOR.warm()
+
+        report(f"uplink {args.uplink_mbps} Mbit/s, STT {args.stt_base_ms:g} ms + {args.stt_ms_per_second:g} ms/s of audio, "
+               f"{args.turns} turns per row, {args.workers} preprocessing worker(s)")
+        report(f"{'clip':>34} {'in (KB)':>8} {'preproc':>8} {'sent (KB)':>10} {'STT calls':>10} {'turn (ms)':>10}")
+        for name, clip in clips.items():
+            for enabled in (False, True):
+                main.AUDIO_PREPROCESSOR.enabled = enabled
+                turn_s, calls, sent = await run_clip(http, survey_id, stub, clip, args.turns)
+                report(f"{name:>34} {len(clip) / 1000:>8.0f} {'on' if enabled else 'off':>8} "
+                       f"{sent / 1000:>10.0f} {calls:>10} {turn_s * 1000:>10.0f}")
+    main.AUDIO_PREPROCESSOR.close()
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--turns", type=int, default=5)
+    parser.add_argument("--uplink-mbps", type=float, default=2.0, help="upload bandwidth to the STT API")
+    parser.add_argument("--stt-base-ms", type=float, default=300)
+    parser.add_argument("--stt-ms-per-second", type=float, default=60, help="STT cost per second of audio")
+    parser.add_argument("--lead", type=float, default=3.0, help="silence before the speech (s)")
+    parser.add_argument("--tail", type=float, default=2.0, help="silence after the speech (s)")
+    parser.add_argument("--workers", type=int, default=1, help="preprocessing processes (0 = thread)")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    with contextlib.redirect_stdout(open(os.devnull, "w")):
+        asyncio.run(main_async(parse_args()))
@@ -0,0 +1,121 @@
+"""
+Load test for concurrent voice turns on a single worker.
+
+Drives the real FastAPI app in-process (httpx ASGI transport) with the
+upstream APIs replaced by the fake provider, sleeping like the real ones would.
+If upstream calls blocked the event loop, throughput would stay flat as the
+number of sessions grows; with the async client it should grow roughly
+linearly until the connection pool limit.
+
+Every turn is a free-form answer that the local fast path (intents, option
+aliases) can't resolve, so each one pays for STT and the LLM; the "llm"
+column counts the turns that reached the agent.
+
+Usage:
+    python benchmarks/concurrent_turns.py [--sessions 1 5 10 25 50] [--stt 0.3] [--llm 0.8]
+"""
+import argparse
+import asyncio
+import contextlib
+import os
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+_tmp = tempfile.mkdtemp(prefix="voice_bench_")
+_employees = os.path.join(_tmp, "employee.csv")
+with open(_employees, "w", encoding="utf-8") as f:
+    f.write("firstname,lastname\nBench,User\n")
+os.environ.setdefault("OPENAI_API_KEY", "sk-bench")
+os.environ["EMPLOYEE_FILE"] = _employees
+os.environ["RESPONSES_FILE"] = os.path.join(_tmp, "responses.csv")
+os.environ["TTS_CACHE_DIR"] = os.path.join(_tmp, "tts_cache")
+
+import httpx  # noqa: E402
+
+import main  # noqa: E402
+from providers import FakeProvider  # noqa: E402
+
+# Open-ended replies: none is a control command or a clear option, so none
+# is answered locally and the --llm latency applies to every turn
+TRANSCRIPTS = [
+    "I would say it depends on the week",
+    "it was a bit mixed to be honest",
+    "mostly fine but the commute is long",
+    "we had a lot going on this quarter",
+]
+
+
+def fake_provider(stt_latency: float, llm_latency: float, tts_latency: float) -> FakeProvider:
+    """Stand-in for the upstream APIs with fixed per-call latency."""
+    return FakeProvider({
+        "latency": {"stt": stt_latency, "chat": llm_latency, "chat_chunk": 0,
+                    "generate": llm_latency, "tts": tts_latency},
+        "transcripts": TRANSCRIPTS,
+        "transcript_order": "cycle",
+        "tool_arguments": {"intent": "repeat_question", "reply_to_speak": "Sure, here it is again."},
+    })
+
+
+async def run_turns(http: httpx.AsyncClient, session_ids, audio_bytes) -> float:
+    async def turn(session_id):
+        r = await http.post(
+            "/process_input",
+            data={"session_id": session_id},
+            files={"audio": ("turn.wav", audio_bytes, "audio/wav")},
+        )
+        r.raise_for_status()
+
+    start = time.perf_counter()
+    await asyncio.gather(*(turn(sid) for sid in session_ids))
+    return time.perf_counter() - start
+
+
+def report(line: str):
+    # The app prints per-turn debug output; keep the table on the real stdout.
+    print(line, file=sys.__stdout__, flush=True)
+
+
+async def main_async(args):
+    main.PROVIDER = fake_provider(args.stt, args.llm, args.tts)
+    with open(os.path.join(ROOT, "questions.csv"), "rb") as f:
+        survey_csv = f.read()
+    with open(os.path.join(ROOT, "Recording (13).wav"), "rb") as f:
+        audio_bytes = f.read()
+
+    transport = httpx.ASGITransport(app=main.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as http:
+        r = await http.post("/upload_survey_csv", files={"csv_file": ("questions.csv", survey_csv, "text/csv")})
+        survey_id = r.json()["survey_id"]
+
+        report(f"{'sessions':>8} {'wall (s)':>9} {'turns/s':>8} {'speedup':>8} {'llm':>5}")
+        base_rate = None
+        for n in args.sessions:
+            session_ids = []
+            for _ in range(n):
+                r = await http.post("/start_session", params={"survey_id": survey_id})
+                session_ids.append(r.json()["session_id"])
+            llm_before = main.FAST_PATH_STATS.snapshot()["llm_turns"]
+            elapsed = await run_turns(http, session_ids, audio_bytes)
+            llm_turns = main.FAST_PATH_STATS.snapshot()["llm_turns"] - llm_before
+            assert llm_turns == n, f"only {llm_turns} of {n} turns reached the LLM"
+            rate = n / elapsed
+            base_rate = base_rate or rate
+            report(f"{n:>8} {elapsed:>9.2f} {rate:>8.1f} {rate / base_rate:>7.1f}x {llm_turns:>5}")
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sessions", type=int, nargs="+", default=[1, 5, 10, 25, 50])
+    parser.add_argument("--stt", type=float, default=0.3, help="simulated Whisper latency (s)")
+    parser.add_argument("--llm", type=float, default=0.8, help="simulated gpt-4o latency (s)")
+    parser.add_argument("--tts", type=float, default=0.4, help="simulated TTS latency (s)")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    with contextlib.redirect_stdout(open(os.devnull, "w")):
+        asyncio.run(main_async(parse_args()))
@@ -0,0 +1,127 @@
+"""
+Microbenchmark: embedding answer matcher, per-option loop vs. precomputed index.
+
+The legacy path embedded every option on every answer and scored the pairs
+one at a time with freshly built NumPy arrays. The index embeds options once
+(at survey upload), caches answer embeddings and scores all options with a
+single matrix-vector product. Both use the same embedder, so the results
+are identical and only the cost differs.
+
+--embed-ms adds a fixed cost per embedder call to approximate a real model
+(sentence-transformers on CPU is a few ms per call).
+
+Usage:
+    python benchmarks/embedding_matcher.py [--answers 2000] [--options 5] [--embed-ms 0]
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from embeddings import AnswerEmbeddingCache, HashingEmbedder, OptionEmbeddings  # noqa: E402
+
+OPTION_SETS = [
+    ["yes", "no"],
+    ["always", "often", "sometimes", "rarely", "never"],
+    ["highly satisfied", "satisfied", "not satisfied"],
+    ["strongly agree", "agree", "neutral", "disagree", "strongly disagree"],
+    ["communication", "technical", "creativity", "problem solving", "other"],
+]
+
+
+class CostlyEmbedder:
+    """Wraps an embedder and burns a fixed amount of CPU per call."""
+
+    def __init__(self, inner, embed_ms: float):
+        self.inner = inner
+        self.name = inner.name
+        self.dim = inner.dim
+        self.embed_s = embed_ms / 1000.0
+        self.calls = 0
+
+    def embed(self, texts):
+        self.calls += 1
+        if self.embed_s:
+            deadline = time.perf_counter() + self.embed_s
+            while time.perf_counter() < deadline:
+                pass
+        return self.inner.embed(texts)
+
+
+def legacy_cosine_similarity(a, b):
+    a = np.array(a)
+    b = np.array(b)
+    return float(np.dot(a, b) / (np.linalg.norm(a) * np.linalg.norm(b)))
+
+
+def legacy_match(embedder, user_answer, options, threshold):
+    user_emb = embedder.embed([user_answer])[0].tolist()
+    best_option, best_score = None, -1
+    for option in options:
+        opt_emb = embedder.embed([option])[0].tolist()
+        score = legacy_cosine_similarity(user_emb, opt_emb)
+        if score > best_score:
+            best_score, best_option = score, option
+    return best_option if best_score > threshold else "NO_MATCH"
+
+
+def make_answers(n: int, rng: random.Random):
+    """Spoken-style answers: options with typos and filler, repeated like real traffic."""
+    pool = []
+    for options in OPTION_SETS:
+        for option in options:
+            pool += [option, option + "s", option[:-1], "i think " + option, option.replace("e", "a", 1)]
+    return [(rng.choice(pool), rng.randrange(len(OPTION_SETS))) for _ in range(n)]
+
+
+def run(args):
+    rng = random.Random(7)
+    answers = make_answers(args.answers, rng)
+    option_sets = [(s * ((args.options + len(s) - 1) // len(s)))[:args.options] for s in OPTION_SETS]
+    option_sets = [[f"{o} {i}" if i >= len(base) else o for i, o in enumerate(opts)]
+                   for opts, base in zip(option_sets, OPTION_SETS)]
+
+    legacy_embedder = CostlyEmbedder(HashingEmbedder(), args.embed_ms)
+    start = time.perf_counter()
+    legacy = [legacy_match(legacy_embedder, text, option_sets[q], args.threshold) for text, q in answers]
+    legacy_s = time.perf_counter() - start
+
+    index_embedder = CostlyEmbedder(HashingEmbedder(), args.embed_ms)
+    start = time.perf_counter()
+    indexes = [OptionEmbeddings(opts, index_embedder) for opts in option_sets]
+    build_s = time.perf_counter() - start
+    cache = AnswerEmbeddingCache(index_embedder)
+    start = time.perf_counter()
+    indexed = []
+    for text, q in answers:
+        option, _ = indexes[q].best(cache(text), args.threshold)
+        indexed.append(option or "NO_MATCH")
+    index_s = time.perf_counter() - start
+
+    mismatches = sum(1 for a, b in zip(legacy, indexed) if a != b)
+    n = len(answers)
+    print(f"answers={n} options/question={args.options} dim={index_embedder.dim} embed_ms={args.embed_ms}")
+    print(f"{'matcher':>16} {'total (ms)':>11} {'per answer (us)':>16} {'embed calls':>12}")
+    print(f"{'per-option loop':>16} {legacy_s * 1000:>11.1f} {legacy_s / n * 1e6:>16.1f} {legacy_embedder.calls:>12}")
+    print(f"{'index':>16} {index_s * 1000:>11.1f} {index_s / n * 1e6:>16.1f} {index_embedder.calls:>12}")
+    print(f"index build (once per survey): {build_s * 1000:.2f} ms | answer cache: {cache.info()}")
+    print(f"speedup: {legacy_s / index_s:.1f}x | mismatched results: {mismatches}")
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--answers", type=int, default=2000)
+    parser.add_argument("--options", type=int, default=5, help="options per question")
+    parser.add_argument("--embed-ms", type=float, default=0.0, help="simulated model cost per embed call")
+    parser.add_argument("--threshold", type=float, default=0.60)
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    run(parse_args())
@@ -0,0 +1,134 @@
+"""
+Employee directory at 500k employees: load time, memory, lookups and hot reload.
+
+Compares the indexed directory (packed records + id/email/phone hash tables) with
+the naive alternative of keeping csv.DictReader rows in a list and scanning
+it. Memory is what stays allocated after loading (tracemalloc). The reload
+check rewrites the file while a thread keeps looking employees up, and
+counts lookups that failed during the swap (should be 0).
+
+Usage:
+    python benchmarks/employee_directory.py [--employees 500000] [--lookups 100000]
+"""
+import argparse
+import csv
+import gc
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from employees import EmployeeDirectory  # noqa: E402
+
+FIRST = ["Ali", "Sara", "Ahmed", "Fatima", "Usman", "Ayesha", "Bilal", "Zainab", "Hamza", "Maryam"]
+LAST = ["Khan", "Ahmed", "Malik", "Hussain", "Sheikh", "Qureshi", "Butt", "Chaudhry"]
+
+
+def write_employees(path: str, n: int, suffix: str = ""):
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(["employee_id", "firstname", "lastname", "email", "phone"])
+        for i in range(n):
+            first, last = FIRST[i % len(FIRST)], LAST[i % len(LAST)]
+            writer.writerow([
+                f"E{i:07d}", first, last + suffix,
+                f"{first}.{last}.{i}@example.com", f"+92 3{i:09d}",
+            ])
+
+
+def measured(fn):
+    """(result, seconds, bytes still allocated afterwards); timed and traced in separate runs."""
+    gc.collect()
+    start = time.perf_counter()
+    fn()
+    elapsed = time.perf_counter() - start
+    gc.collect()
+    tracemalloc.start()
+    result = fn()
+    gc.collect()
+    retained = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return result, elapsed, retained
+
+
+def run(args):
+    random.seed(5)
+    tmp = tempfile.mkdtemp(prefix="employee_bench_")
+    path = os.path.join(tmp, "employee.csv")
+    write_employees(path, args.employees)
+    n = args.employees
+    print(f"employees={n} csv={os.path.getsize(path) / 1e6:.0f} MB")
+
+    def naive_load():
+        with open(path, newline="", encoding="utf-8") as f:
+            return list(csv.DictReader(f))
+
+    rows, naive_s, naive_bytes = measured(naive_load)
+    def directory_load():
+        directory = EmployeeDirectory(path)
+        directory.load()
+        return directory
+
+    directory, index_s, index_bytes = measured(directory_load)
+    print(f"{'':>22} {'load (s)':>9} {'retained (MB)':>14} {'bytes/employee':>15}")
+    print(f"{'list of DictReader rows':>22} {naive_s:>9.2f} {naive_bytes / 1e6:>14.1f} {naive_bytes / n:>15.0f}")
+    print(f"{'indexed directory':>22} {index_s:>9.2f} {index_bytes / 1e6:>14.1f} {index_bytes / n:>15.0f}")
+
+    picks = [random.randrange(n) for _ in range(args.lookups)]
+    keys = {
+        "id": [f"E{i:07d}" for i in picks],
+        "email": [f"{FIRST[i % len(FIRST)]}.{LAST[i % len(LAST)]}.{i}@EXAMPLE.com" for i in picks],
+        "phone": [f"03{i:09d}" for i in picks],
+    }
+    print(f"{'lookup':>22} {'per lookup (us)':>16}")
+    scan_keys = keys["email"][:args.scans]
+    start = time.perf_counter()
+    for key in scan_keys:
+        next(r for r in rows if r["email"].lower() == key.lower())
+    print(f"{'naive scan by email':>22} {(time.perf_counter() - start) / len(scan_keys) * 1e6:>16.1f}")
+    for kind, kind_keys in keys.items():
+        start = time.perf_counter()
+        found = sum(1 for key in kind_keys if directory.get(key) is not None)
+        elapsed = time.perf_counter() - start
+        assert found == len(kind_keys), f"{kind}: {len(kind_keys) - found} not found"
+        print(f"{'directory by ' + kind:>22} {elapsed / len(kind_keys) * 1e6:>16.2f}")
+    del rows
+
+    # Hot reload while another thread is looking employees up
+    failures, lookups, stop = [0], [0], threading.Event()
+
+    def reader():
+        while not stop.is_set():
+            if directory.get(keys["id"][lookups[0] % len(picks)]) is None:
+                failures[0] += 1
+            lookups[0] += 1
+
+    thread = threading.Thread(target=reader)
+    thread.start()
+    write_employees(path, n, suffix="-updated")
+    start = time.perf_counter()
+    swapped = directory.maybe_reload()
+    reload_s = time.perf_counter() - start
+    stop.set()
+    thread.join()
+    updated = directory.get(keys["id"][0]).name.endswith("-updated")
+    print(f"reload: swapped={swapped} in {reload_s:.2f} s, new data visible={updated}, "
+          f"{lookups[0]} lookups during reload, {failures[0]} failed")
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--employees", type=int, default=500_000)
+    parser.add_argument("--lookups", type=int, default=100_000)
+    parser.add_argument("--scans", type=int, default=20, help="lookups for the (slow) linear scan")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    run(parse_args())
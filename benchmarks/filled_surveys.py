@@ -0,0 +1,136 @@
+"""
+Filled-survey reads at 1M stored responses: CSV scans vs. the indexed store.
+
+The legacy endpoints ran pd.read_csv over the whole responses history on
+every request, then a groupby (list) or a string compare (one session). The
+store looks a session up through the (session_id, id) index and lists
+sessions a page at a time through the (submitted_at, session_id) index, so
+neither cost depends on how much history has accumulated.
+
+Both sides get the same data: --responses rows, --answers per session,
+submitted in time order.
+
+Usage:
+    python benchmarks/filled_surveys.py [--responses 1000000] [--answers 10] [--lookups 1000]
+"""
+import argparse
+import csv
+import os
+import random
+import sys
+import tempfile
+import time
+
+import pandas as pd
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from response_store import ResponseStore  # noqa: E402
+
+
+def write_history(path: str, n_responses: int, answers_per_session: int):
+    start_ts = 1_700_000_000.0
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(["session_id", "question", "answer", "timestamp"])
+        for i in range(n_responses):
+            session_no, question_no = divmod(i, answers_per_session)
+            writer.writerow([
+                f"session-{session_no:07d}",
+                f"Question {question_no + 1} about your week?",
+                random.choice(["yes", "no", "sometimes", "it depends on the team"]),
+                start_ts + session_no * 30,
+            ])
+    return start_ts
+
+
+def timed(fn, repeat: int = 1):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        result = fn()
+    return (time.perf_counter() - start) / repeat, result
+
+
+def legacy_lookup(csv_path: str, session_id: str):
+    df = pd.read_csv(csv_path)
+    session_df = df[df["session_id"].astype(str) == session_id]
+    return session_df[["question", "answer", "timestamp"]].to_dict(orient="records")
+
+
+def legacy_list(csv_path: str):
+    df = pd.read_csv(csv_path)
+    return [
+        {"session_id": str(session_id), "responses": group[["question", "answer", "timestamp"]].to_dict(orient="records")}
+        for session_id, group in df.groupby("session_id")
+    ]
+
+
+def walk_pages(store: ResponseStore, limit: int, **filters):
+    pages, sessions, cursor = 0, 0, None
+    while True:
+        page, cursor = store.sessions_page(limit, cursor, **filters)
+        pages += 1
+        sessions += len(page)
+        if cursor is None:
+            return pages, sessions
+
+
+def row(label: str, seconds: float, note: str = ""):
+    print(f"{label:>34} {seconds * 1000:>12.2f}  {note}")
+
+
+def run(args):
+    random.seed(3)
+    tmp = tempfile.mkdtemp(prefix="filled_surveys_bench_")
+    csv_path = os.path.join(tmp, "responses.csv")
+    n_sessions = args.responses // args.answers
+    start_ts = write_history(csv_path, n_sessions * args.answers, args.answers)
+
+    store = ResponseStore(os.path.join(tmp, "responses.db"))
+    load_s, imported = timed(lambda: store.import_csv(csv_path))
+    db_mb = os.path.getsize(store.path) / 1e6
+    print(f"responses={imported} sessions={n_sessions} csv={os.path.getsize(csv_path) / 1e6:.0f} MB "
+          f"db={db_mb:.0f} MB (import {load_s:.1f} s)")
+    print(f"{'operation':>34} {'latency (ms)':>12}")
+
+    targets = [f"session-{random.randrange(n_sessions):07d}" for _ in range(args.lookups)]
+    legacy_s, legacy_rows = timed(lambda: legacy_lookup(csv_path, targets[0]), repeat=args.legacy_repeat)
+    row("legacy: one session (read_csv)", legacy_s)
+    lookup_s, _ = timed(lambda: [store.rows_for_session(sid) for sid in targets])
+    row("store: one session (index)", lookup_s / len(targets), f"avg of {len(targets)}")
+    assert store.rows_for_session(targets[0]) == legacy_rows, "store and CSV disagree"
+
+    if not args.skip_legacy_list:
+        legacy_list_s, listed = timed(lambda: legacy_list(csv_path))
+        row("legacy: list all (read_csv+groupby)", legacy_list_s, f"{len(listed)} sessions in one response")
+
+    first_s, (page, cursor) = timed(lambda: store.sessions_page(args.page_size), repeat=20)
+    row(f"store: first page of {args.page_size}", first_s)
+    deep = f"session-{n_sessions - args.page_size - 1:07d}"
+    deep_cursor = store.sessions_page(1, since=start_ts + (n_sessions - args.page_size - 1) * 30)[1]
+    deep_s, _ = timed(lambda: store.sessions_page(args.page_size, deep_cursor), repeat=20)
+    row(f"store: page after {deep}", deep_s, "cursor near the end")
+    window = (start_ts + n_sessions * 15, start_ts + n_sessions * 15 + args.page_size * 30)
+    range_s, (in_range, _) = timed(lambda: store.sessions_page(args.page_size, since=window[0], until=window[1]), repeat=20)
+    row("store: time-range page", range_s, f"{len(in_range)} sessions")
+    narrow_s, _ = timed(lambda: store.sessions_page(args.page_size, fields=["answer"]), repeat=20)
+    row("store: first page, fields=answer", narrow_s)
+    walk_s, (pages, walked) = timed(lambda: walk_pages(store, 1000))
+    row("store: walk every page (1000/page)", walk_s, f"{pages} pages, {walked} sessions")
+    store.close()
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--responses", type=int, default=1_000_000)
+    parser.add_argument("--answers", type=int, default=10, help="answers per session")
+    parser.add_argument("--lookups", type=int, default=1000)
+    parser.add_argument("--page-size", type=int, default=100)
+    parser.add_argument("--legacy-repeat", type=int, default=3)
+    parser.add_argument("--skip-legacy-list", action="store_true", help="the legacy full listing is slow at 1M rows")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    run(parse_args())
@@ -0,0 +1,298 @@
+"""
+End-to-end load test: N concurrent simulated sessions against the real app.
+
+Drives the FastAPI app in-process (httpx ASGI transport, lifespan running)
+with the fake provider standing in for Whisper, gpt-4o and tts-1, so the
+upstream latencies are injected locally and the run needs no network. After
+one survey upload, every session does:
+
+    start_session -> GET /tts (greeting)
+    M x (process_input with "Recording (13).wav" -> GET /tts (reply))
+    submit_responses
+
+The transcripts cycle through a mix of clear answers (answered locally) and
+free-form replies (answered by the fake gpt-4o tool call).
+
+Reports p50/p95/p99 per endpoint (GET /tts as time to first byte and to the
+whole clip), turns per second, the process's RSS and how many speculative
+next-question syntheses (TTS_PREFETCH) were used. Results are compared
+with the stored baseline for the same scenario; a metric more than
+--tolerance worse (plus --slack-ms for latencies) fails the run (exit 1).
+--update-baseline stores this run as the new baseline instead.
+
+Usage:
+    python benchmarks/load_test.py [--sessions 20] [--turns 5] [--tolerance 0.3] [--update-baseline]
+"""
+import argparse
+import asyncio
+import contextlib
+import json
+import math
+import os
+import resource
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+BASELINE_FILE = os.path.join(ROOT, "benchmarks", "baselines", "load_test.json")
+ENDPOINTS = ("upload_survey_csv", "start_session", "process_input", "tts_first_byte", "tts", "submit_responses")
+PERCENTILES = (50, 95, 99)
+TRANSCRIPTS = [
+    "yes",
+    "I would say it depends on the week",
+    "sometimes",
+    "honestly I am not sure how to answer that",
+    "satisfied",
+    "most of the time I guess",
+]
+
+_tmp = tempfile.mkdtemp(prefix="voice_bench_")
+_employees = os.path.join(_tmp, "employee.csv")
+with open(_employees, "w", encoding="utf-8") as f:
+    f.write("firstname,lastname\nBench,User\n")
+os.environ["PROVIDER"] = "fake"
+os.environ["EMPLOYEE_FILE"] = _employees
+os.environ["RESPONSES_FILE"] = os.path.join(_tmp, "responses.csv")
+os.environ["TTS_CACHE_DIR"] = os.path.join(_tmp, "tts_cache")
+
+import httpx  # noqa: E402
+
+with contextlib.redirect_stdout(open(os.devnull, "w")):
+    import main  # noqa: E402
+from providers import FAKE_DEFAULTS, FakeProvider  # noqa: E402
+
+
+def percentile(values, p: float) -> float:
+    """Nearest-rank percentile."""
+    ordered = sorted(values)
+    return ordered[max(0, math.ceil(p / 100 * len(ordered)) - 1)]
+
+
+def rss_mb():
+    """(current, peak) resident set size of this process in MiB."""
+    current = peak = None
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    current = int(line.split()[1]) / 1024
+                elif line.startswith("VmHWM:"):
+                    peak = int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    if peak is None:
+        # ru_maxrss is KiB on Linux, bytes on macOS
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / (1024 * 1024 if sys.platform == "darwin" else 1024)
+    return current if current is not None else peak, peak
+
+
+class Recorder:
+    def __init__(self):
+        self.latencies = {name: [] for name in ENDPOINTS}
+        self.errors = {name: 0 for name in ENDPOINTS}
+
+    @contextlib.asynccontextmanager
+    async def timed(self, name: str):
+        start = time.perf_counter()
+        try:
+            yield
+        except httpx.HTTPStatusError:
+            self.errors[name] += 1
+            raise
+        self.latencies[name].append(time.perf_counter() - start)
+
+
+async def fetch_tts(http: httpx.AsyncClient, recorder: Recorder, audio_url: str):
+    start = time.perf_counter()
+    async with http.stream("GET", audio_url) as r:
+        try:
+            r.raise_for_status()
+        except httpx.HTTPStatusError:
+            recorder.errors["tts"] += 1
+            raise
+        first = None
+        async for _ in r.aiter_bytes():
+            first = first or time.perf_counter()
+    end = time.perf_counter()
+    recorder.latencies["tts_first_byte"].append((first or end) - start)
+    recorder.latencies["tts"].append(end - start)
+
+
+async def run_session(http, recorder: Recorder, survey_id: str, audio: bytes, turns: int):
+    async with recorder.timed("start_session"):
+        r = await http.post("/start_session", params={"survey_id": survey_id})
+        r.raise_for_status()
+    session_id = r.json()["session_id"]
+    await fetch_tts(http, recorder, r.json()["messages"][0]["audio_url"])
+
+    for _ in range(turns):
+        async with recorder.timed("process_input"):
+            r = await http.post(
+                "/process_input",
+                data={"session_id": session_id},
+                files={"audio": ("turn.wav", audio, "audio/wav")},
+            )
+            r.raise_for_status()
+        for message in r.json()["messages"]:
+            if message.get("audio_url"):
+                await fetch_tts(http, recorder, message["audio_url"])
+
+    async with recorder.timed("submit_responses"):
+        r = await http.post(f"/submit_responses/{session_id}")
+        r.raise_for_status()
+
+
+async def run_load(args) -> dict:
+    main.PROVIDER = FakeProvider({
+        "seed": args.seed,
+        "latency": {"stt": args.stt, "chat": args.llm, "generate": args.llm, "tts": args.tts},
+        "transcripts": TRANSCRIPTS,
+        "transcript_order": "cycle",
+    })
+    with open(os.path.join(ROOT, "questions.csv"), "rb") as f:
+        survey_csv = f.read()
+    with open(os.path.join(ROOT, "Recording (13).wav"), "rb") as f:
+        audio = f.read()
+
+    recorder = Recorder()
+    async with main.app.router.lifespan_context(main.app):
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=main.app), base_url="http://bench", timeout=None) as http:
+            while (await http.get("/ready")).status_code != 200:
+                await asyncio.sleep(0.05)
+            async with recorder.timed("upload_survey_csv"):
+                r = await http.post("/upload_survey_csv", files={"csv_file": ("questions.csv", survey_csv, "text/csv")})
+                r.raise_for_status()
+            survey_id = r.json()["survey_id"]
+
+            start = time.perf_counter()
+            results = await asyncio.gather(
+                *(run_session(http, recorder, survey_id, audio, args.turns) for _ in range(args.sessions)),
+                return_exceptions=True,
+            )
+            elapsed = time.perf_counter() - start
+
+    failed = [r for r in results if isinstance(r, BaseException)]
+    rss, rss_peak = rss_mb()
+    turns = (args.sessions - len(failed)) * args.turns
+    return {
+        "scenario": scenario(args),
+        "wall_seconds": round(elapsed, 3),
+        "turns_per_second": round(turns / elapsed, 2),
+        "failed_sessions": len(failed),
+        "first_error": repr(failed[0]) if failed else None,
+        "rss_mb": round(rss, 1),
+        "rss_peak_mb": round(rss_peak, 1),
+        "tts_prefetch": main.SPEECH_PREFETCHER.stats(),
+        "endpoints": {
+            name: {
+                "count": len(values),
+                "errors": recorder.errors[name],
+                **{f"p{p}_ms": round(percentile(values, p) * 1000, 2) for p in PERCENTILES},
+            }
+            for name, values in recorder.latencies.items() if values
+        },
+    }
+
+
+def scenario(args) -> str:
+    return f"sessions={args.sessions} turns={args.turns} stt={args.stt} llm={args.llm} tts={args.tts} seed={args.seed}"
+
+
+def report(line: str = ""):
+    # The app prints per-turn debug output; keep the table on the real stdout.
+    print(line, file=sys.__stdout__, flush=True)
+
+
+def print_results(results: dict):
+    report(results["scenario"])
+    report(f"{'endpoint':>18} {'count':>6} {'errors':>6} " + " ".join(f"{f'p{p} (ms)':>10}" for p in PERCENTILES))
+    for name, stats in results["endpoints"].items():
+        report(f"{name:>18} {stats['count']:>6} {stats['errors']:>6} "
+               + " ".join(f"{stats[f'p{p}_ms']:>10.1f}" for p in PERCENTILES))
+    report(f"turns/s: {results['turns_per_second']:.2f} (wall {results['wall_seconds']:.2f} s) | "
+           f"RSS {results['rss_mb']:.0f} MiB, peak {results['rss_peak_mb']:.0f} MiB | "
+           f"failed sessions: {results['failed_sessions']}")
+    prefetch = results["tts_prefetch"]
+    report(f"TTS prefetch: {prefetch['started']} started, {prefetch['hits']} used, {prefetch['unused']} unused, "
+           f"{prefetch['cancelled']} cancelled (hit rate {prefetch['hit_rate']:.0%}), {prefetch['already_cached']} already cached")
+    if results["first_error"]:
+        report(f"first error: {results['first_error']}")
+
+
+def regressions(results: dict, baseline: dict, tolerance: float, slack_ms: float):
+    found = []
+    if results["failed_sessions"]:
+        found.append(f"{results['failed_sessions']} session(s) failed")
+    for name, stats in baseline["endpoints"].items():
+        current = results["endpoints"].get(name)
+        if current is None:
+            found.append(f"{name}: no requests recorded")
+            continue
+        for p in PERCENTILES:
+            key = f"p{p}_ms"
+            limit = stats[key] * (1 + tolerance) + slack_ms
+            if current[key] > limit:
+                found.append(f"{name} {key}: {current[key]:.1f} > {limit:.1f} (baseline {stats[key]:.1f})")
+    floor = baseline["turns_per_second"] * (1 - tolerance)
+    if results["turns_per_second"] < floor:
+        found.append(f"turns/s: {results['turns_per_second']:.2f} < {floor:.2f} (baseline {baseline['turns_per_second']:.2f})")
+    ceiling = baseline["rss_peak_mb"] * (1 + tolerance)
+    if results["rss_peak_mb"] > ceiling:
+        found.append(f"RSS peak: {results['rss_peak_mb']:.0f} MiB > {ceiling:.0f} MiB (baseline {baseline['rss_peak_mb']:.0f})")
+    return found
+
+
+def load_baselines(path: str) -> dict:
+    if not os.path.exists(path):
+        return {}
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def run(args) -> int:
+    with contextlib.redirect_stdout(open(os.devnull, "w")):
+        results = asyncio.run(run_load(args))
+    print_results(results)
+
+    baselines = load_baselines(args.baseline)
+    if args.update_baseline:
+        baselines[results["scenario"]] = {k: v for k, v in results.items() if k not in ("scenario", "first_error", "tts_prefetch")}
+        os.makedirs(os.path.dirname(args.baseline), exist_ok=True)
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            json.dump(baselines, f, indent=2, sort_keys=True)
+            f.write("\n")
+        report(f"baseline updated: {args.baseline}")
+        return 1 if results["failed_sessions"] else 0
+
+    baseline = baselines.get(results["scenario"])
+    if baseline is None:
+        report(f"no baseline for this scenario in {args.baseline}; run with --update-baseline to store one")
+        return 1 if results["failed_sessions"] else 0
+    found = regressions(results, baseline, args.tolerance, args.slack_ms)
+    for line in found:
+        report(f"REGRESSION: {line}")
+    if not found:
+        report(f"within {args.tolerance:.0%} of the baseline")
+    return 1 if found else 0
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sessions", type=int, default=20, help="concurrent simulated sessions")
+    parser.add_argument("--turns", type=int, default=5, help="process_input turns per session")
+    parser.add_argument("--stt", default=FAKE_DEFAULTS["latency"]["stt"], help="fake Whisper latency (see providers.parse_latency)")
+    parser.add_argument("--llm", default=FAKE_DEFAULTS["latency"]["chat"], help="fake gpt-4o latency")
+    parser.add_argument("--tts", default=FAKE_DEFAULTS["latency"]["tts"], help="fake tts-1 latency")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--tolerance", type=float, default=0.3, help="allowed relative regression")
+    parser.add_argument("--slack-ms", type=float, default=10.0, help="absolute latency slack on top of --tolerance")
+    parser.add_argument("--baseline", default=BASELINE_FILE)
+    parser.add_argument("--update-baseline", action="store_true", help="store this run as the scenario's baseline")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    sys.exit(run(parse_args()))
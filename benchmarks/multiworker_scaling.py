@@ -0,0 +1,161 @@
+"""
+Throughput scaling from 1 to N worker processes sharing the SQLite session backend.
+
+Each worker is a separate process running the real FastAPI app in-process
+(httpx ASGI transport) with a zero-latency fake provider, so turns are bound
+by the app's own CPU work. Every round, each session gets one turn, and the
+session -> worker assignment rotates, so every session is served by every
+worker in turn and only works if state is shared. At the end each session
+must have exactly one answer per round.
+
+Throughput should grow roughly linearly with workers up to the number of
+cores (this machine: see "cores" in the output).
+
+Usage:
+    python benchmarks/multiworker_scaling.py [--workers 1 2 4] [--sessions 200] [--rounds 5]
+"""
+import argparse
+import asyncio
+import contextlib
+import multiprocessing as mp
+import os
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+# Children are spawned and re-import this module: they inherit the same directory via the env.
+_tmp = os.environ.setdefault("VOICE_BENCH_TMP", tempfile.mkdtemp(prefix="voice_bench_"))
+_employees = os.path.join(_tmp, "employee.csv")
+if not os.path.exists(_employees):
+    with open(_employees, "w", encoding="utf-8") as f:
+        f.write("firstname,lastname\nBench,User\n")
+os.environ.setdefault("OPENAI_API_KEY", "sk-bench")
+os.environ["EMPLOYEE_FILE"] = _employees
+os.environ["RESPONSES_FILE"] = os.path.join(_tmp, "responses.csv")
+os.environ["TTS_CACHE_DIR"] = os.path.join(_tmp, "tts_cache")
+os.environ["SESSION_BACKEND"] = "sqlite:///" + os.path.join(_tmp, "sessions.db")
+
+import httpx  # noqa: E402
+
+with contextlib.redirect_stdout(open(os.devnull, "w")):
+    import main  # noqa: E402
+from providers import FakeProvider  # noqa: E402
+
+
+def fake_provider() -> FakeProvider:
+    """Zero-latency stand-in: every utterance is mapped as an answer by the 'LLM'."""
+    return FakeProvider({
+        "latency": {kind: 0 for kind in ("stt", "chat", "chat_chunk", "generate", "tts")},
+        "transcripts": ["I would say it depends on the week"],
+        "tool_arguments": {"intent": "answer", "mapped_answer": "it depends", "reply_to_speak": "Thanks. Next question."},
+    })
+
+
+def report(line: str):
+    # The app prints per-turn debug output; keep the table on the real stdout.
+    print(line, file=sys.__stdout__, flush=True)
+
+
+def app_client() -> httpx.AsyncClient:
+    main.PROVIDER = fake_provider()
+    return httpx.AsyncClient(transport=httpx.ASGITransport(app=main.app), base_url="http://bench", timeout=None)
+
+
+async def setup_sessions(n_sessions: int, n_questions: int):
+    rows = "\n".join(f'{i},"Open question {i} about your week?",' for i in range(1, n_questions + 1))
+    survey_csv = ("id,question,options\n" + rows + "\n").encode()
+    async with app_client() as http:
+        r = await http.post(
+            "/upload_survey_csv", params={"prerender": "false"},
+            files={"csv_file": ("bench.csv", survey_csv, "text/csv")},
+        )
+        survey_id = r.json()["survey_id"]
+        ids = []
+        for _ in range(n_sessions):
+            r = await http.post("/start_session", params={"survey_id": survey_id})
+            ids.append(r.json()["session_id"])
+        return ids
+
+
+def worker(worker_id: int, n_workers: int, session_ids, rounds: int, barrier, results):
+    async def run():
+        statuses = {}
+        async with app_client() as http:
+            async def turn(session_id):
+                r = await http.post(
+                    "/process_input",
+                    data={"session_id": session_id},
+                    files={"audio": ("turn.wav", b"RIFF", "audio/wav")},
+                )
+                statuses[r.status_code] = statuses.get(r.status_code, 0) + 1
+
+            for round_no in range(rounds):
+                mine = [sid for i, sid in enumerate(session_ids) if (i + round_no) % n_workers == worker_id]
+                barrier.wait()
+                await asyncio.gather(*(turn(sid) for sid in mine))
+            barrier.wait()
+        return statuses
+
+    with contextlib.redirect_stdout(open(os.devnull, "w")):
+        results.put(asyncio.run(run()))
+        # No lifespan runs here, so shut the preprocessing pool down ourselves: a process
+        # started by multiprocessing waits for its live children before it can exit
+        main.AUDIO_PREPROCESSOR.close()
+
+
+def run_workers(n_workers: int, args):
+    with contextlib.redirect_stdout(open(os.devnull, "w")):
+        session_ids = asyncio.run(setup_sessions(args.sessions, args.rounds + 1))
+    ctx = mp.get_context("spawn")
+    barrier = ctx.Barrier(n_workers + 1)
+    results = ctx.Queue()
+    procs = [
+        ctx.Process(target=worker, args=(w, n_workers, session_ids, args.rounds, barrier, results))
+        for w in range(n_workers)
+    ]
+    for p in procs:
+        p.start()
+    barrier.wait()  # workers have imported the app
+    start = time.perf_counter()
+    for _ in range(args.rounds):
+        barrier.wait()
+    elapsed = time.perf_counter() - start
+    statuses = {}
+    for _ in procs:
+        for code, count in results.get().items():
+            statuses[code] = statuses.get(code, 0) + count
+    for p in procs:
+        p.join()
+
+    with contextlib.redirect_stdout(open(os.devnull, "w")):
+        answered = [len(asyncio.run(main.load_orchestrator(sid)).state.responses) for sid in session_ids]
+    consistent = all(n == args.rounds for n in answered)
+    return elapsed, statuses, consistent
+
+
+def main_cli(args):
+    report(f"cores: {os.cpu_count()} | sessions: {args.sessions} | rounds: {args.rounds} | backend: {os.environ['SESSION_BACKEND']}")
+    report(f"{'workers':>8} {'wall (s)':>9} {'turns/s':>8} {'speedup':>8} {'statuses':>16} {'state ok':>9}")
+    base_rate = None
+    for n in args.workers:
+        elapsed, statuses, consistent = run_workers(n, args)
+        turns = args.sessions * args.rounds
+        rate = turns / elapsed
+        base_rate = base_rate or rate
+        status_text = " ".join(f"{code}:{count}" for code, count in sorted(statuses.items()))
+        report(f"{n:>8} {elapsed:>9.2f} {rate:>8.1f} {rate / base_rate:>7.2f}x {status_text:>16} {str(consistent):>9}")
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--sessions", type=int, default=200)
+    parser.add_argument("--rounds", type=int, default=5)
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    main_cli(parse_args())
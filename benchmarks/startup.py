@@ -0,0 +1,156 @@
+"""
+Cold-start benchmark: how long `import main` takes and what it pulls in.
+
+Each run is a fresh interpreter with `-X importtime`; the per-module
+timings are parsed to report the total import time of main and its
+heaviest direct imports. A second set of runs measures time to ready:
+import, start the app's lifespan (background warm-up) and poll /ready
+until it returns 200.
+
+Use it as a regression check: the run fails (exit 1) if any --forbid
+module is imported by `import main` (heavy libraries must stay lazy) or
+if the median import time exceeds --max-import-ms.
+
+Usage:
+    python benchmarks/startup.py [--runs 5] [--top 10] [--max-import-ms 1500] [--forbid pandas openai]
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+READY_TIMEOUT_SECONDS = 60
+CHILD_IMPORT = "import json, sys, main; print(json.dumps(sorted(sys.modules)))"
+
+
+def bench_env(tmp: str) -> dict:
+    employees = os.path.join(tmp, "employee.csv")
+    with open(employees, "w", encoding="utf-8") as f:
+        f.write("firstname,lastname\nBench,User\n")
+    env = dict(os.environ)
+    env.setdefault("OPENAI_API_KEY", "sk-bench")
+    env.update(
+        EMPLOYEE_FILE=employees,
+        RESPONSES_FILE=os.path.join(tmp, "responses.csv"),
+        TTS_CACHE_DIR=os.path.join(tmp, "tts_cache"),
+        PYTHONPATH=ROOT,
+    )
+    return env
+
+
+def parse_importtime(stderr: str):
+    """-X importtime lines -> [(depth, name, self_us, cumulative_us)] in output order."""
+    rows = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|", 2)
+        depth = (len(name) - len(name.lstrip(" "))) // 2
+        rows.append((depth, name.strip(), int(self_us), int(cumulative_us)))
+    return rows
+
+
+def import_run(env: dict):
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", CHILD_IMPORT],
+        cwd=ROOT, env=env, capture_output=True, text=True, check=True,
+    )
+    rows = parse_importtime(proc.stderr)
+    main_us = next(cum for depth, name, _, cum in rows if name == "main")
+    # main's direct imports are the depth-1 entries that precede it
+    direct = [(name, cum) for depth, name, _, cum in rows if depth == 1]
+    modules = set(json.loads(proc.stdout.strip().splitlines()[-1]))
+    return main_us / 1000, direct, modules
+
+
+def child_ready():
+    """Runs in a subprocess: import main, start the lifespan, poll /ready."""
+    import asyncio
+    import contextlib
+    import time
+
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(open(os.devnull, "w")):
+        import main
+        import httpx
+    imported = time.perf_counter()
+
+    async def run():
+        async with main.app.router.lifespan_context(main.app):
+            async with httpx.AsyncClient(transport=httpx.ASGITransport(app=main.app), base_url="http://bench") as http:
+                while (await http.get("/ready")).status_code != 200:
+                    if time.perf_counter() - start > READY_TIMEOUT_SECONDS:
+                        return None
+                    await asyncio.sleep(0.005)
+        return time.perf_counter()
+
+    with contextlib.redirect_stdout(open(os.devnull, "w")):
+        ready = asyncio.run(run())
+    print(json.dumps({"import_ms": (imported - start) * 1000, "ready_ms": ready and (ready - start) * 1000}))
+
+
+def ready_run(env: dict):
+    proc = subprocess.run(
+        [sys.executable, os.path.abspath(__file__), "--child-ready"],
+        cwd=ROOT, env=env, capture_output=True, text=True, check=True,
+    )
+    return json.loads(proc.stdout.strip().splitlines()[-1])
+
+
+def run(args) -> int:
+    env = bench_env(tempfile.mkdtemp(prefix="startup_bench_"))
+    import_ms, direct, modules = [], {}, set()
+    for _ in range(args.runs):
+        ms, run_direct, run_modules = import_run(env)
+        import_ms.append(ms)
+        modules |= run_modules
+        for name, cum in run_direct:
+            direct.setdefault(name, []).append(cum / 1000)
+    ready = [ready_run(env) for _ in range(args.runs)]
+    never_ready = sum(1 for r in ready if r["ready_ms"] is None)
+    ready = [r for r in ready if r["ready_ms"] is not None] or [{"import_ms": 0.0, "ready_ms": 0.0}]
+
+    median_import = statistics.median(import_ms)
+    print(f"runs={args.runs} python={sys.version.split()[0]}")
+    print(f"import main (-X importtime): median {median_import:.0f} ms, min {min(import_ms):.0f} ms")
+    print(f"import -> /ready 200:        median {statistics.median(r['ready_ms'] for r in ready):.0f} ms "
+          f"(import {statistics.median(r['import_ms'] for r in ready):.0f} ms, then background warm-up)")
+    print("heaviest direct imports of main (median cumulative ms):")
+    heaviest = sorted(((statistics.median(v), k) for k, v in direct.items()), reverse=True)[:args.top]
+    for ms, name in heaviest:
+        print(f"  {ms:>8.1f}  {name}")
+
+    failures = []
+    if never_ready:
+        failures.append(f"/ready did not return 200 within {READY_TIMEOUT_SECONDS} s in {never_ready} run(s)")
+    loaded = [m for m in args.forbid if m in modules]
+    if loaded:
+        failures.append(f"imported at startup but should be lazy: {', '.join(loaded)}")
+    if args.max_import_ms is not None and median_import > args.max_import_ms:
+        failures.append(f"median import {median_import:.0f} ms > budget {args.max_import_ms:.0f} ms")
+    for failure in failures:
+        print(f"REGRESSION: {failure}")
+    return 1 if failures else 0
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--top", type=int, default=10, help="how many direct imports to list")
+    parser.add_argument("--max-import-ms", type=float, default=None, help="fail if the median import is slower")
+    parser.add_argument("--forbid", nargs="*", default=["pandas", "openai"], help="modules that must not load at import")
+    parser.add_argument("--child-ready", action="store_true", help=argparse.SUPPRESS)
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    if args.child_ready:
+        child_ready()
+    else:
+        sys.exit(run(args))
@@ -0,0 +1,166 @@
+"""
+Per-turn overhead and per-session memory: DataFrame-backed session state vs.
+the compiled survey (slotted Question records + fixed-size Responses).
+
+The DataFrame side is a copy of the previous SurveyState / get_summary
+(`iloc` per lookup, `iterrows` per summary, dict responses). The compiled
+side uses main.SurveyState and SurveyOrchestrator.get_summary as shipped.
+A "turn" is the state work every LLM turn does: current question, next
+question, the summary for the system prompt and recording the answer.
+
+Usage:
+    python benchmarks/survey_state.py [--questions 100] [--sessions 10000] [--turns 2000]
+"""
+import argparse
+import contextlib
+import gc
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+_tmp = tempfile.mkdtemp(prefix="voice_bench_")
+_employees = os.path.join(_tmp, "employee.csv")
+with open(_employees, "w", encoding="utf-8") as f:
+    f.write("firstname,lastname\nBench,User\n")
+os.environ.setdefault("OPENAI_API_KEY", "sk-bench")
+os.environ["EMPLOYEE_FILE"] = _employees
+os.environ["RESPONSES_FILE"] = os.path.join(_tmp, "responses.csv")
+os.environ["TTS_CACHE_DIR"] = os.path.join(_tmp, "tts_cache")
+
+import pandas as pd  # noqa: E402
+
+with contextlib.redirect_stdout(open(os.devnull, "w")):
+    import main  # noqa: E402
+from survey import compile_survey  # noqa: E402
+
+OPTION_SETS = ["yes|no", "always|often|sometimes|rarely", "highly satisfied|satisfied|not satisfied", None]
+
+
+class DataFrameState:
+    """The previous SurveyState: the survey DataFrame plus a dict of answers."""
+
+    def __init__(self, questions_df: pd.DataFrame, language: str = "en"):
+        self.questions = questions_df
+        self.responses = {}
+        self.language = language
+        self.current_index = 0
+        self.max_index = 0
+        self.completed = False
+        self.halfway = False
+        self.q_completed = False
+
+    def current_question(self):
+        if self.current_index >= len(self.questions):
+            return None
+        return self.questions.iloc[self.current_index]
+
+    def get_summary(self) -> str:
+        lines = ["Here is a summary of your responses:\n"]
+        for _, row in self.questions.iterrows():
+            qid = int(row["id"])
+            ans = self.responses.get(qid, "Not answered")
+            lines.append(f"Question {qid}: {ans}")
+        return " \n".join(lines)
+
+
+def survey_rows(n: int):
+    return [
+        {"id": i + 1, "question": f"Question number {i + 1} about your work?", "options": OPTION_SETS[i % len(OPTION_SETS)]}
+        for i in range(n)
+    ]
+
+
+def dataframe_turn(state: DataFrameState):
+    q = state.current_question()
+    if q is None:
+        state.current_index = state.max_index = 0
+        state.responses.clear()
+        return
+    _ = q["question"], q["options_list"]
+    next_idx = state.current_index + 1
+    if next_idx < len(state.questions):
+        _ = state.questions.iloc[next_idx]["question"]
+    state.get_summary()
+    state.responses[int(q["id"])] = "yes"
+    state.current_index += 1
+    state.max_index += 1
+
+
+def compiled_turn(orchestrator):
+    state = orchestrator.state
+    q = state.current_question()
+    if q is None:
+        orchestrator.state = main.SurveyState(state.questions, state.language)
+        return
+    _ = q.text, q.options_list
+    next_idx = state.current_index + 1
+    if next_idx < len(state.questions):
+        _ = state.questions[next_idx].text
+    orchestrator.get_summary(state.language)
+    orchestrator.record_answer(q, "yes")
+
+
+def time_turns(turn, target, n: int) -> float:
+    start = time.perf_counter()
+    for _ in range(n):
+        turn(target)
+    return time.perf_counter() - start
+
+
+def measure(build, n: int) -> float:
+    """Average traced bytes per object for n objects built by `build`."""
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    objects = [build() for _ in range(n)]
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del objects
+    return (after - before) / n
+
+
+def answered(state, questions):
+    # Mapped answers are option strings shared with the survey, so only the containers count
+    for q in questions:
+        state.responses[q] = "sometimes"
+    return state
+
+
+def run(args):
+    rows = survey_rows(args.questions)
+    df = pd.DataFrame(rows)
+    df["options_list"] = df["options"].apply(lambda x: [o.strip() for o in str(x).split("|")] if pd.notna(x) else [])
+    survey = compile_survey(rows, main.EMBEDDER)
+    ids = [row["id"] for row in rows]
+
+    with contextlib.redirect_stdout(open(os.devnull, "w")):
+        df_s = time_turns(dataframe_turn, DataFrameState(df), args.turns)
+        compiled_s = time_turns(compiled_turn, main.SurveyOrchestrator(main.SurveyState(survey)), args.turns)
+
+    print(f"survey: {args.questions} questions | turns: {args.turns} | sessions: {args.sessions}")
+    print(f"{'state':>10} {'per turn (us)':>14} {'session empty (B)':>18} {'session full (B)':>17}")
+    df_empty = measure(lambda: DataFrameState(df), args.sessions)
+    df_full = measure(lambda: answered(DataFrameState(df), ids), args.sessions)
+    compiled_empty = measure(lambda: main.SurveyState(survey), args.sessions)
+    compiled_full = measure(lambda: answered(main.SurveyState(survey), ids), args.sessions)
+    print(f"{'dataframe':>10} {df_s / args.turns * 1e6:>14.1f} {df_empty:>18.0f} {df_full:>17.0f}")
+    print(f"{'compiled':>10} {compiled_s / args.turns * 1e6:>14.1f} {compiled_empty:>18.0f} {compiled_full:>17.0f}")
+    print(f"per-turn speedup: {df_s / compiled_s:.1f}x | "
+          f"{args.sessions} full sessions: {df_full * args.sessions / 2**20:.1f} MiB -> {compiled_full * args.sessions / 2**20:.1f} MiB")
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--questions", type=int, default=100)
+    parser.add_argument("--sessions", type=int, default=10000)
+    parser.add_argument("--turns", type=int, default=2000)
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    run(parse_args())
@@ -0,0 +1,80 @@
+"""
+TTS cache under concurrent misses: coalescing, cancelled waiters, disk budget.
+
+Starts --waiters requests for the same uncached clip against a fake
+synthesis that sleeps --latency seconds, and checks that only one synthesis
+runs. Then checks that cancelling the request that started a synthesis
+(e.g. a /tts client disconnecting) doesn't cancel it for the other waiters:
+they still get the bytes, and the clip lands in the cache. Finally writes
+more clips than the disk budget holds and checks that the directory stays
+within it, keeping the clip that was read most recently.
+
+Usage:
+    python benchmarks/tts_coalescing.py [--waiters 100] [--latency 0.3]
+"""
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from tts_cache import TTSCache  # noqa: E402
+
+
+async def run(args):
+    cache = TTSCache(tempfile.mkdtemp(prefix="tts_cache_bench_"))
+    syntheses = [0]
+
+    async def synthesize():
+        syntheses[0] += 1
+        await asyncio.sleep(args.latency)
+        return b"OggS" + bytes(2048)
+
+    start = time.perf_counter()
+    results = await asyncio.gather(*(cache.get_or_create("coalesced", "hello", synthesize) for _ in range(args.waiters)))
+    elapsed = time.perf_counter() - start
+    assert all(results), "a waiter got no audio"
+    print(f"{args.waiters} concurrent misses: {syntheses[0]} synthesis in {elapsed:.2f} s "
+          f"(serial would take {args.waiters * args.latency:.1f} s)")
+    assert syntheses[0] == 1, f"{syntheses[0]} syntheses for one clip"
+
+    # The first waiter started the synthesis and goes away before it finishes
+    first = asyncio.ensure_future(cache.get_or_create("cancelled", "hi", synthesize))
+    await asyncio.sleep(0)
+    second = asyncio.ensure_future(cache.get_or_create("cancelled", "hi", synthesize))
+    await asyncio.sleep(args.latency / 2)
+    first.cancel()
+    data = await second
+    assert first.cancelled() and data, "second waiter lost the clip when the first was cancelled"
+    assert await cache.get("cancelled") == data, "cancelled synthesis did not reach the cache"
+    print("first waiter cancelled: second still got the clip, and it was cached")
+    print(cache.stats())
+
+    # Disk budget of 10 clips; memory holds none, so every read goes to disk
+    clip = b"OggS" + bytes(1020)
+    cache = TTSCache(tempfile.mkdtemp(prefix="tts_cache_bench_"), max_memory_bytes=0, max_disk_bytes=10 * len(clip))
+    await cache.put("kept", clip)
+    for i in range(30):
+        await cache.put(f"clip-{i:02d}", clip)
+        await asyncio.sleep(0.002)  # distinct mtimes
+        assert await cache.get("kept") == clip, "the most recently read clip was evicted"
+    on_disk = sum(size for _, size, _ in cache._disk_files())
+    assert on_disk <= cache.max_disk_bytes, f"{on_disk} bytes on disk, budget {cache.max_disk_bytes}"
+    assert not cache.contains("kept"), "contains() must not look on disk"
+    print(f"disk budget {cache.max_disk_bytes} bytes: {on_disk} on disk after 31 clips, "
+          f"{cache.disk_evictions} evicted, recently read clip kept")
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--waiters", type=int, default=100)
+    parser.add_argument("--latency", type=float, default=0.3, help="seconds per fake synthesis")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    asyncio.run(run(parse_args()))
@@ -0,0 +1,139 @@
+import zlib
+from functools import lru_cache
+from typing import List, Optional, Protocol, Tuple
+
+import numpy as np
+
+from intents import normalize
+from lazy import Lazy
+
+
+class Embedder(Protocol):
+    name: str
+    dim: int
+
+    def embed(self, texts: List[str]) -> np.ndarray:
+        """Returns an (n, dim) float32 matrix of L2-normalized rows."""
+        ...
+
+
+def _l2_normalize(matrix: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return (matrix / norms).astype(np.float32, copy=False)
+
+
+class HashingEmbedder:
+    """
+    Deterministic, dependency-free embedder: signed feature hashing of
+    character n-grams. It captures spelling-level similarity (Whisper
+    variants like "sometime" / "some times") rather than meaning; use it
+    for tests and as the default when no model is installed.
+    """
+
+    def __init__(self, dim: int = 256, ngrams: Tuple[int, ...] = (2, 3, 4)):
+        self.name = f"hashing-{dim}"
+        self.dim = dim
+        self.ngrams = ngrams
+
+    def _vector(self, text: str) -> np.ndarray:
+        padded = f" {normalize(text)} "
+        vec = np.zeros(self.dim, dtype=np.float32)
+        for n in self.ngrams:
+            for i in range(len(padded) - n + 1):
+                h = zlib.crc32(padded[i:i + n].encode("utf-8"))
+                vec[h % self.dim] += 1.0 if (h >> 31) & 1 else -1.0
+        return vec
+
+    def embed(self, texts: List[str]) -> np.ndarray:
+        if not texts:
+            return np.zeros((0, self.dim), dtype=np.float32)
+        return _l2_normalize(np.stack([self._vector(t) for t in texts]))
+
+
+class SentenceTransformerEmbedder:
+    """Multilingual sentence-transformers model; imported only when selected."""
+
+    def __init__(self, model_name: str = "paraphrase-multilingual-MiniLM-L12-v2"):
+        self.name = model_name
+        # The model is loaded on first use (or by the startup warm-up), not at import
+        self._model = Lazy(self._load)
+
+    def _load(self):
+        from sentence_transformers import SentenceTransformer
+
+        return SentenceTransformer(self.name)
+
+    @property
+    def model(self):
+        return self._model.get()
+
+    @property
+    def dim(self) -> int:
+        return self.model.get_sentence_embedding_dimension()
+
+    def embed(self, texts: List[str]) -> np.ndarray:
+        if not texts:
+            return np.zeros((0, self.dim), dtype=np.float32)
+        return self.model.encode(texts, normalize_embeddings=True, convert_to_numpy=True).astype(np.float32)
+
+
+def get_embedder(kind: str = "hashing") -> Embedder:
+    """EMBEDDER=hashing (default) or sentence-transformers[:model-name]."""
+    if kind.startswith("sentence-transformers"):
+        _, _, model_name = kind.partition(":")
+        return SentenceTransformerEmbedder(model_name or "paraphrase-multilingual-MiniLM-L12-v2")
+    return HashingEmbedder()
+
+
+class AnswerEmbeddingCache:
+    """LRU cache of answer embeddings so repeated utterances are embedded once."""
+
+    def __init__(self, embedder: Embedder, maxsize: int = 4096):
+        self.embedder = embedder
+        self._embed = lru_cache(maxsize=maxsize)(self._embed_one)
+
+    def _embed_one(self, text: str) -> np.ndarray:
+        vec = self.embedder.embed([text])[0]
+        vec.setflags(write=False)
+        return vec
+
+    def __call__(self, text: str) -> np.ndarray:
+        return self._embed(text)
+
+    def info(self):
+        return self._embed.cache_info()
+
+
+class OptionEmbeddings:
+    """
+    Option embeddings of one question, computed once at survey upload and
+    kept as a normalized float32 matrix. Scoring an answer is a single
+    matrix-vector product.
+    """
+
+    __slots__ = ("options", "matrix")
+
+    def __init__(self, options: List[str], embedder: Embedder):
+        self.options = list(options)
+        self.matrix = embedder.embed(self.options)
+        self.matrix.setflags(write=False)
+
+    def __len__(self):
+        return len(self.options)
+
+    def scores(self, answer_vec: np.ndarray) -> np.ndarray:
+        return self.matrix @ answer_vec
+
+    def best(self, answer_vec: np.ndarray, threshold: float, margin: float = 0.0) -> Tuple[Optional[str], float]:
+        """Best option and its cosine score; None when below threshold or too close to the runner-up."""
+        if not self.options:
+            return None, 0.0
+        scores = self.scores(answer_vec)
+        order = np.argsort(scores)[::-1]
+        best_score = float(scores[order[0]])
+        if best_score < threshold:
+            return None, best_score
+        if len(order) > 1 and best_score - float(scores[order[1]]) < margin:
+            return None, best_score
+        return self.options[int(order[0])], best_score
@@ -0,0 +1,303 @@
+import asyncio
+import csv
+import os
+import re
+import threading
+import time
+from typing import Any, Dict, Iterator, List, NamedTuple, Optional
+
+import numpy as np
+
+# Employee directory loaded from EMPLOYEE_FILE. Employees can be looked up by
+# id, email or phone in O(1) (expected). To stay compact at 500k+ employees
+# no per-employee Python objects are kept: every record is packed into one
+# UTF-8 buffer (with an offsets array), and each key kind has an
+# open-addressing hash table of (hash, position) in two NumPy arrays, about
+# 150 bytes per employee in total. Lookups verify the key against the
+# record, so hash collisions never return the wrong employee.
+#
+# Hot reload: poll_for_changes() stats the file; when its mtime or size
+# changes a new index is built off to the side and swapped in with a single
+# assignment, so lookups never see a half-built index. A file that fails to
+# load leaves the previous index in place.
+#
+# Columns: firstname + lastname (or name); optional employee_id/id, email,
+# phone/mobile. Without an id column the 1-based row number is the id.
+
+ID_COLUMNS = ("employee_id", "id")
+EMAIL_COLUMNS = ("email",)
+PHONE_COLUMNS = ("phone", "mobile")
+# Phones match on their last digits so "0300-1234567" and "+92 300 1234567" are the same number
+PHONE_MATCH_DIGITS = 10
+# Shorter identifiers are never treated as phone numbers by get()
+MIN_PHONE_DIGITS = 7
+
+KEY_FIELDS = {"id": 0, "email": 2, "phone": 3}
+_SEP = "\x1f"
+_NON_DIGITS = re.compile(r"\D")
+
+
+class Employee(NamedTuple):
+    id: str
+    name: str
+    email: Optional[str]
+    phone: Optional[str]
+
+
+def normalize_email(value: Optional[str]) -> Optional[str]:
+    value = (value or "").strip().lower()
+    return value or None
+
+
+def normalize_phone(value: Optional[str]) -> Optional[str]:
+    value = (value or "").strip()
+    digits = value if value.isdigit() else _NON_DIGITS.sub("", value)
+    return digits[-PHONE_MATCH_DIGITS:] or None
+
+
+def _column(header: List[str], names) -> Optional[int]:
+    for name in names:
+        if name in header:
+            return header.index(name)
+    return None
+
+
+class _HashTable:
+    """Open addressing with linear probing: key hash -> record position, load factor <= 0.5."""
+
+    __slots__ = ("hashes", "positions", "mask")
+
+    def __init__(self, hashes: np.ndarray, positions: np.ndarray):
+        size = 1 << max(4, (2 * len(hashes)).bit_length())
+        self.mask = size - 1
+        self.hashes = np.zeros(size, dtype=np.int64)
+        self.positions = np.full(size, -1, dtype=np.int32)
+        # Vectorized insert: every round, each free slot takes its first claimant and the
+        # other claimants move one slot on, which is exactly where a probe would look next
+        slots = hashes & self.mask
+        pending = np.arange(len(hashes))
+        while pending.size:
+            wanted = slots[pending]
+            free = self.positions[wanted] == -1
+            claimed, first = np.unique(wanted[free], return_index=True)
+            winners = pending[free][first]
+            self.hashes[claimed] = hashes[winners]
+            self.positions[claimed] = positions[winners]
+            pending = np.setdiff1d(pending, winners, assume_unique=True)
+            slots[pending] = (slots[pending] + 1) & self.mask
+
+    def candidates(self, key_hash: int) -> Iterator[int]:
+        """Positions whose key has this hash, in probe order."""
+        slot = key_hash & self.mask
+        while True:
+            position = int(self.positions[slot])
+            if position < 0:
+                return
+            if self.hashes[slot] == key_hash:
+                yield position
+            slot = (slot + 1) & self.mask
+
+    def nbytes(self) -> int:
+        return self.hashes.nbytes + self.positions.nbytes
+
+
+class _Index:
+    """One immutable snapshot of the file: packed records plus a hash table per key kind."""
+
+    __slots__ = ("records", "offsets", "tables", "mtime_ns", "size", "duplicates")
+
+    def __init__(self, path: str):
+        stat = os.stat(path)  # before reading: a change during the read triggers another reload
+        self.mtime_ns = stat.st_mtime_ns
+        self.size = stat.st_size
+        self.duplicates = 0
+
+        records: List[bytes] = []
+        # Temporary while building: normalized key -> first position with it
+        keys: Dict[str, Dict[str, int]] = {kind: {} for kind in KEY_FIELDS}
+        with open(path, newline="", encoding="utf-8-sig") as f:
+            reader = csv.reader(f)
+            header = [h.strip().lower() for h in next(reader, [])]
+            first, last, full = _column(header, ("firstname",)), _column(header, ("lastname",)), _column(header, ("name",))
+            if first is None and full is None:
+                raise ValueError(f"{path}: needs firstname/lastname or name columns")
+            id_col = _column(header, ID_COLUMNS)
+            email_col = _column(header, EMAIL_COLUMNS)
+            phone_col = _column(header, PHONE_COLUMNS)
+            width = len(header)
+
+            for row, record in enumerate(reader):
+                if not record:
+                    continue
+                if len(record) < width:
+                    record += [""] * (width - len(record))
+                if first is not None:
+                    name = f"{record[first].strip()} {record[last].strip() if last is not None else ''}".strip()
+                else:
+                    name = record[full].strip()
+                fields = (
+                    record[id_col].strip() if id_col is not None else str(row + 1),
+                    name,
+                    (normalize_email(record[email_col]) if email_col is not None else None) or "",
+                    (normalize_phone(record[phone_col]) if phone_col is not None else None) or "",
+                )
+                packed = _SEP.join(fields)
+                if packed.count(_SEP) != len(fields) - 1:
+                    packed = _SEP.join(field.replace(_SEP, "") for field in fields)
+                position = len(records)
+                records.append(packed.encode("utf-8"))
+                # First occurrence of a key wins
+                for kind, field in KEY_FIELDS.items():
+                    key = fields[field]
+                    if key:
+                        if key in keys[kind]:
+                            self.duplicates += 1
+                        else:
+                            keys[kind][key] = position
+
+        self.offsets = np.zeros(len(records) + 1, dtype=np.int64)
+        np.cumsum([len(r) for r in records], out=self.offsets[1:])
+        self.records = b"".join(records)
+        del records
+        self.tables: Dict[str, _HashTable] = {}
+        for kind, positions in keys.items():
+            if positions:
+                self.tables[kind] = _HashTable(
+                    np.fromiter((hash(key) for key in positions), dtype=np.int64, count=len(positions)),
+                    np.fromiter(positions.values(), dtype=np.int32, count=len(positions)),
+                )
+
+    def fields(self, position: int) -> List[str]:
+        start, end = self.offsets[position], self.offsets[position + 1]
+        return self.records[start:end].decode("utf-8").split(_SEP)
+
+    def employee(self, position: int) -> Employee:
+        employee_id, name, email, phone = self.fields(position)
+        return Employee(employee_id, name, email or None, phone or None)
+
+    def find(self, kind: str, key: Optional[str]) -> Optional[int]:
+        """Position of the employee whose (normalized) `kind` key equals key."""
+        table = self.tables.get(kind)
+        if table is None or not key:
+            return None
+        field = KEY_FIELDS[kind]
+        for position in table.candidates(hash(key)):
+            if self.fields(position)[field] == key:
+                return position
+        return None
+
+    def nbytes(self) -> int:
+        return len(self.records) + self.offsets.nbytes + sum(t.nbytes() for t in self.tables.values())
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+
+class EmployeeDirectory:
+    """Employees from a CSV, indexed by id, email and phone; loaded on first use."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._index: Optional[_Index] = None
+        self._lock = threading.Lock()
+        self.reloads = 0
+        self.last_load_seconds = 0.0
+        self.last_error: Optional[str] = None
+        self._failed_stat: Optional[tuple] = None
+
+    @property
+    def loaded(self) -> bool:
+        return self._index is not None
+
+    def _build(self) -> _Index:
+        start = time.perf_counter()
+        index = _Index(self.path)
+        self.last_load_seconds = time.perf_counter() - start
+        self.last_error = None
+        print(f"Loaded {len(index)} employees from {self.path} in {self.last_load_seconds:.2f} seconds")
+        return index
+
+    def load(self) -> _Index:
+        index = self._index
+        if index is None:
+            with self._lock:
+                if self._index is None:
+                    self._index = self._build()
+                index = self._index
+        return index
+
+    def maybe_reload(self) -> bool:
+        """Rebuilds the index if the file changed since it was loaded; True if it was swapped."""
+        current = self._index
+        if current is None:
+            return False
+        try:
+            stat = os.stat(self.path)
+            version = (stat.st_mtime_ns, stat.st_size)
+            # Unchanged, or the same broken file as last time: nothing to do until it changes again
+            if version == (current.mtime_ns, current.size) or version == self._failed_stat:
+                return False
+            self._failed_stat = version
+            with self._lock:
+                self._index = self._build()
+                self.reloads += 1
+            self._failed_stat = None
+            return True
+        except (OSError, ValueError, csv.Error) as e:
+            self.last_error = str(e)
+            print(f"Employee directory: reload of {self.path} failed, keeping the previous list: {e}")
+            return False
+
+    def get(self, identifier: str) -> Optional[Employee]:
+        """Looks up an employee id, then an email, then a phone number."""
+        index = self.load()
+        identifier = (identifier or "").strip()
+        position = index.find("id", identifier)
+        if position is None and "@" in identifier:
+            position = index.find("email", normalize_email(identifier))
+        if position is None:
+            phone = normalize_phone(identifier)
+            position = index.find("phone", phone) if phone and len(phone) >= MIN_PHONE_DIGITS else None
+        return None if position is None else index.employee(position)
+
+    def by_id(self, employee_id: str) -> Optional[Employee]:
+        index = self.load()
+        position = index.find("id", employee_id)
+        return None if position is None else index.employee(position)
+
+    def by_email(self, email: str) -> Optional[Employee]:
+        index = self.load()
+        position = index.find("email", normalize_email(email))
+        return None if position is None else index.employee(position)
+
+    def by_phone(self, phone: str) -> Optional[Employee]:
+        index = self.load()
+        position = index.find("phone", normalize_phone(phone))
+        return None if position is None else index.employee(position)
+
+    def first(self) -> Optional[Employee]:
+        index = self.load()
+        return index.employee(0) if len(index) else None
+
+    def __len__(self):
+        return len(self.load())
+
+    def stats(self) -> Dict[str, Any]:
+        index = self._index
+        return {
+            "loaded": index is not None,
+            "employees": len(index) if index is not None else 0,
+            "duplicate_keys": index.duplicates if index is not None else 0,
+            "index_bytes": index.nbytes() if index is not None else 0,
+            "reloads": self.reloads,
+            "last_load_seconds": round(self.last_load_seconds, 3),
+            "last_error": self.last_error,
+        }
+
+
+async def poll_for_changes(directory: EmployeeDirectory, interval_seconds: float):
+    """Background task: reloads the directory when its file changes on disk."""
+    while True:
+        await asyncio.sleep(interval_seconds)
+        if directory.loaded:
+            await asyncio.to_thread(directory.maybe_reload)
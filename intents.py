@@ -0,0 +1,221 @@
+import re
+import threading
+from typing import Any, Dict, List, Optional, Tuple
+
+# Local, keyword/regex intent detection for the control phrases of a voice
+# survey (English, Urdu in Nastaliq, romanized Urdu). It only answers when
+# it is confident; everything else goes to the LLM.
+
+# Utterances longer than this are likely real answers that merely contain a
+# keyword ("I'd like to see more options for training"), so we don't guess.
+MAX_COMMAND_TOKENS = 8
+
+_DIGITS = str.maketrans("۰۱۲۳۴۵۶۷۸۹٠١٢٣٤٥٦٧٨٩", "01234567890123456789")
+_PUNCT = re.compile(r"[^\w\s']+", re.UNICODE)
+
+NUMBER_WORDS = {
+    # English cardinals / ordinals
+    "one": 1, "two": 2, "three": 3, "four": 4, "five": 5, "six": 6, "seven": 7,
+    "eight": 8, "nine": 9, "ten": 10, "eleven": 11, "twelve": 12, "thirteen": 13,
+    "fourteen": 14, "fifteen": 15, "sixteen": 16, "seventeen": 17, "eighteen": 18,
+    "nineteen": 19, "twenty": 20,
+    "first": 1, "second": 2, "third": 3, "fourth": 4, "fifth": 5, "sixth": 6,
+    "seventh": 7, "eighth": 8, "ninth": 9, "tenth": 10,
+    # Urdu (Nastaliq)
+    "ایک": 1, "دو": 2, "تین": 3, "چار": 4, "پانچ": 5, "چھ": 6, "سات": 7,
+    "آٹھ": 8, "نو": 9, "دس": 10,
+    "پہلا": 1, "پہلے": 1, "پہلی": 1, "دوسرا": 2, "دوسرے": 2, "دوسری": 2,
+    "تیسرا": 3, "تیسرے": 3, "تیسری": 3, "چوتھا": 4, "چوتھے": 4, "چوتھی": 4,
+    "پانچواں": 5, "پانچویں": 5,
+    # Romanized Urdu
+    "ek": 1, "do": 2, "teen": 3, "char": 4, "chaar": 4, "paanch": 5, "panch": 5,
+    "chay": 6, "chhe": 6, "saat": 7, "aath": 8, "nau": 9, "das": 10,
+    "pehla": 1, "pehle": 1, "pehli": 1, "dusra": 2, "doosra": 2, "dusre": 2,
+    "doosre": 2, "teesra": 3, "teesre": 3, "chautha": 4, "chothe": 4,
+}
+
+# A question number only counts when it is attached to one of these: "question 3",
+# "answer 2", "sawal teen", "سوال نمبر دو" (word before), or "the third question",
+# "dusra sawal" (noun after). "I change jobs every 2 years" has no question in it.
+_QUESTION_WORDS = {
+    "question", "answer", "number", "q",
+    "سوال", "جواب", "نمبر",
+    "sawal", "swal", "jawab",
+}
+_QUESTION_NOUNS = {"question", "answer", "سوال", "جواب", "sawal", "swal", "jawab"}
+_NUMBER_WORDS_AFTER = {"number", "نمبر"}
+_SUFFIXED_NUMBER = re.compile(r"^(\d+)(st|nd|rd|th)?$")
+
+NEGATIONS = {"not", "don't", "dont", "never", "no", "nahi", "nahin", "na", "نہیں", "نا", "غیر", "mat", "مت"}
+
+# Submit and summary are only taken locally when the utterance is the command
+# itself, give or take these words ("please submit it", "khulasa batao");
+# "the summary was wrong" or "submit it after I check" go to the LLM.
+_WHOLE_COMMANDS = {"submit", "summary"}
+_COMMAND_FILLERS = {
+    "please", "plz", "ok", "okay", "now", "then", "so", "yes", "can", "could", "you", "i", "want", "to",
+    "let's", "lets", "me", "the", "a", "my", "it", "show", "give", "read", "tell", "just",
+    "جی", "اب", "بس", "مجھے", "میرا", "میرے", "براہ", "کرم", "دکھائیں", "دکھاؤ", "بتائیں", "بتاؤ", "سنائیں", "سناؤ",
+    "کر", "کریں", "کرو", "دیں", "دو", "دیجیے",
+    "ji", "jee", "ab", "bas", "mujhe", "mera", "mere", "dikhao", "dikhaen", "batao", "bataen", "sunao",
+    "kar", "karo", "karein", "karen", "do", "dein", "den",
+}
+# change_answer also allows the words around a question reference ("change my answer
+# for question 2", "sawal 2 ka jawab badlo"), but not "yes": "change question 2 to yes"
+# carries a new answer, which is the LLM's job.
+_CHANGE_FILLERS = (_COMMAND_FILLERS - {"yes"}) | {
+    "for", "of", "on", "in", "back", "question", "answer",
+    "سوال", "جواب", "کا", "کی", "کے", "کو", "میں",
+    "sawal", "swal", "jawab", "ka", "ki", "ke", "ko", "mein",
+}
+
+_PATTERNS: List[Tuple[str, re.Pattern]] = [
+    ("change_answer", re.compile(
+        r"\b(change|edit|update|modify|correct|redo|go back)\b|"
+        r"(تبدیل|بدل|بدلنا|تبدیلی|واپس)|"
+        r"\b(badal|badalna|badlo|tabdeel|tabdil|wapas)\b")),
+    ("repeat_question", re.compile(
+        r"\b(repeat|pardon|come again|say (it|that|the question) again|again please|once more|"
+        r"what was the question|didn't hear|did not hear)\b|^again$|"
+        r"(دوبارہ|دہرا|پھر سے|پھر بتا)|"
+        r"\b(dobara|dubara|dohra|dohrao|phir se)\b")),
+    ("list_options", re.compile(
+        r"\b(what|which|tell me|list|read)( are| is)?( the| my)? (options?|choices?)\b|"
+        r"^(the )?(options?|choices?)( please)?$|\bwhat can i (say|choose|pick)\b|"
+        # Urdu only as a question about the options: "دوسرا آپشن" or "میرا انتخاب ہاں" are answers
+        r"(کون سے|کونسے|کیا) (آپشنز?|اختیارات)|(آپشنز?|اختیارات) (کیا|کون سے) ہیں|"
+        r"(آپشنز?|اختیارات) (بتا|سنا|پڑھ|دہرا)\w*|^(آپشنز?|اختیارات)$|"
+        r"\b(kaun se|kon se|konse|kya|kia) (options?|ikhtiyarat?)\b|"
+        r"\b(options?|ikhtiyarat?) (kya|kia|kaun se) (hain|hai)\b|"
+        r"\b(options?|ikhtiyarat?) (batao|bataen|bataein|bataiye|sunao|parho)\b")),
+    ("summary", re.compile(
+        r"\b(summary|summarize|summarise|my answers|review (my )?answers|what did i (say|answer))\b|"
+        r"(خلاصہ|میرے جوابات)|"
+        r"\b(khulasa|khulasah|mere jawab(at)?)\b")),
+    ("submit", re.compile(
+        r"\bsubmit\b|\bsend (it|my answers)\b|^(finish|done|i'm done|i am done|that's all)( please)?$|"
+        r"(جمع کر\w*|جمع کرا\w*|ختم کر\w*)|"
+        r"\b(jama kar\w*|jama karo|submit kar\w*|khatam kar\w*)\b")),
+]
+
+
+def normalize(text: str) -> str:
+    text = text.translate(_DIGITS).lower()
+    text = _PUNCT.sub(" ", text)
+    return " ".join(text.split())
+
+
+def _number(token: str) -> Optional[int]:
+    match = _SUFFIXED_NUMBER.match(token)
+    if match:
+        return int(match.group(1))
+    return NUMBER_WORDS.get(token)
+
+
+def _question_reference(tokens: List[str]) -> Optional[Tuple[int, List[int]]]:
+    """(question number, indexes of the tokens that name it), or None."""
+    for i, token in enumerate(tokens):
+        if token.startswith("q") and token[1:].isdigit():
+            return int(token[1:]), [i]
+        number = _number(token)
+        if number is None:
+            continue
+        # "question 3", "sawal number teen"
+        if i > 0 and tokens[i - 1] in _QUESTION_WORDS:
+            used = [i - 1, i]
+            if tokens[i - 1] in _NUMBER_WORDS_AFTER and i > 1 and tokens[i - 2] in _QUESTION_NOUNS:
+                used.insert(0, i - 2)
+            return number, used
+        # "third question", "teen number sawal"
+        if i + 1 < len(tokens) and tokens[i + 1] in _QUESTION_NOUNS:
+            return number, [i, i + 1]
+        if i + 2 < len(tokens) and tokens[i + 1] in _NUMBER_WORDS_AFTER and tokens[i + 2] in _QUESTION_NOUNS:
+            return number, [i, i + 1, i + 2]
+    return None
+
+
+def extract_question_number(tokens: List[str]) -> Optional[int]:
+    """Finds a question number attached to a question word ("question 3", "third question", "سوال تین", "sawal teen")."""
+    reference = _question_reference(tokens)
+    return reference[0] if reference else None
+
+
+def _is_whole_command(pattern: re.Pattern, tokens: List[str], fillers=_COMMAND_FILLERS) -> bool:
+    """No negation ("don't submit yet"), and nothing but filler words around the command."""
+    if any(token in NEGATIONS for token in tokens):
+        return False
+    rest = pattern.sub(" ", " ".join(tokens)).split()
+    return all(token in fillers for token in rest)
+
+
+def detect_local_intent(text: str) -> Optional[Dict[str, Any]]:
+    """
+    Returns {"intent", "question_id", "new_answer", "confidence"} when the
+    utterance is clearly a control command, otherwise None.
+    """
+    normalized = normalize(text)
+    tokens = normalized.split()
+    if not tokens or len(tokens) > MAX_COMMAND_TOKENS:
+        return None
+
+    matched = [intent for intent, pattern in _PATTERNS if pattern.search(normalized)]
+
+    if "change_answer" in matched:
+        # "change" alone is too common in real answers; require a question reference,
+        # and nothing else in the utterance ("change question 2 to yes" goes to the LLM).
+        matched.remove("change_answer")
+        reference = _question_reference(tokens)
+        if reference is not None:
+            number, used = reference
+            rest = [token for i, token in enumerate(tokens) if i not in used]
+            if _is_whole_command(dict(_PATTERNS)["change_answer"], rest, _CHANGE_FILLERS):
+                return {"intent": "change_answer", "question_id": number, "new_answer": None, "confidence": 0.95}
+            return None
+
+    if len(matched) != 1:
+        return None
+    if matched[0] in _WHOLE_COMMANDS and not _is_whole_command(dict(_PATTERNS)[matched[0]], tokens):
+        return None
+
+    confidence = 0.9 if len(tokens) <= 4 else 0.8
+    return {"intent": matched[0], "question_id": None, "new_answer": None, "confidence": confidence}
+
+
+class FastPathStats:
+    """Counts turns resolved locally vs. by the LLM and their latency."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.local_turns = 0
+        self.llm_turns = 0
+        self.local_seconds = 0.0
+        self.llm_seconds = 0.0
+        self.by_intent: Dict[str, int] = {}
+
+    def record_local(self, intent: str, seconds: float):
+        with self._lock:
+            self.local_turns += 1
+            self.local_seconds += seconds
+            self.by_intent[intent] = self.by_intent.get(intent, 0) + 1
+
+    def record_llm(self, seconds: float):
+        with self._lock:
+            self.llm_turns += 1
+            self.llm_seconds += seconds
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            turns = self.local_turns + self.llm_turns
+            avg_local = self.local_seconds / self.local_turns if self.local_turns else 0.0
+            avg_llm = self.llm_seconds / self.llm_turns if self.llm_turns else 0.0
+            saved_per_turn = max(avg_llm - avg_local, 0.0) if self.llm_turns else 0.0
+            return {
+                "local_turns": self.local_turns,
+                "llm_turns": self.llm_turns,
+                "hit_rate": round(self.local_turns / turns, 4) if turns else 0.0,
+                "avg_local_ms": round(avg_local * 1000, 3),
+                "avg_llm_ms": round(avg_llm * 1000, 1),
+                "saved_ms_per_local_turn": round(saved_per_turn * 1000, 1),
+                "est_seconds_saved": round(saved_per_turn * self.local_turns, 2),
+                "by_intent": dict(self.by_intent),
+            }
@@ -0,0 +1,147 @@
+import math
+import re
+from collections import Counter
+from functools import lru_cache
+from typing import Dict, NamedTuple
+
+# Local language identification for transcripts, in microseconds and without
+# a model download. The script decides most cases: Arabic script (Nastaliq)
+# is Urdu and Devanagari is treated as Urdu too (Whisper writes spoken Urdu
+# as Hindi often enough, and the agent reads both). Latin-script text is
+# either English or romanized Urdu, which a small character-trigram model
+# trained on the word lists below tells apart. Any other script is neither.
+
+ARABIC = re.compile(r"[\u0600-\u06FF\u0750-\u077F\u08A0-\u08FF\uFB50-\uFDFF\uFE70-\uFEFF]")
+DEVANAGARI = re.compile(r"[\u0900-\u097F]")
+LATIN = re.compile(r"[a-zA-Z\u00C0-\u024F]")
+# Letters of any other script (CJK, Cyrillic...)
+OTHER_LETTER = re.compile(r"[^\W\d_a-zA-Z\u00C0-\u024F\u0600-\u06FF\u0750-\u077F\u08A0-\u08FF\uFB50-\uFDFF\uFE70-\uFEFF\u0900-\u097F]")
+LATIN_WORD = re.compile(r"[a-z\u00C0-\u024F]+")
+
+# A mismatch is only acted on above this confidence...
+MIN_CONFIDENCE = 0.9
+# ...and, for Latin script, with at least this many words: "ok", "done" or a
+# name are no evidence either way.
+MIN_LATIN_WORDS = 3
+# The trigram profiles are small, so proper nouns and jargon ("Karachi office has
+# parking issues") can score as the wrong language. A Latin-script mismatch also
+# needs this many function words of the guessed language; without them the text
+# goes to the LLM.
+MIN_MARKERS = 1
+
+# Function words that settle it, minus the ones both languages spell alike
+# (to, is, in, us, main, me, hi, par).
+_MARKERS = {
+    "ur": set("""
+        hai hain tha thi the hoon hun ho hoga hogi nahi nahin mat kya kia kyun kyunke kyunki kaise kahan kab
+        mera meri mere mujhe mujhay hamara humara tumhara apna apni apne uska iska unka woh yeh aur lekin magar
+        ka ki ke ko se ne bhi mein raha rahi rahe karta karti karte kiya gaya gayi chahiye sakta sakti sakte
+    """.split()),
+    "en": set("""
+        the a an and but or of for with from at by it it's i i'm you we they he she my your our their this that
+        these those am are was were be been has have had do does did don't didn't not can could would should
+        will what which who when where why how there here very just about
+    """.split()),
+}
+
+_ROMAN_URDU = """
+main mein mai hum tum aap woh wo yeh ye is us un in ka ki ke ko se ne par pe tak bhi hi to toh aur ya
+lekin magar kyun kyunke kyunki kya kia kaise kab kahan kaun kitna kitni jo jab tab ab abhi phir hai hain
+tha thi the ho hon hoon hun hoga hogi honge hota hoti hote raha rahi rahe karta karti karte karna karo
+kiya kiye kar gaya gayi gaye jana jata jati jate ja aana aata aaya diya dena lena liya mila milta milti
+nahi nahin na mat haan han ji jee bilkul theek thik acha accha achha bohat bahut zyada ziada kam thoda
+thora sab kuch kuchh koi apna apni apne mera meri mere mujhe mujhay humara hamara tera tumhara unka uska
+iska inka yahan wahan sirf shayad zaroor zaroori hamesha kabhi aksar aam taur din raat kaam naukri daftar
+log insaan sawal swal jawab baat pata maloom samajh lagta lagti lagay chahiye sakta sakti sakte
+wala wali wale dekh dekho suno bolo batao bataen shukriya meherbani matlab waqt saal mahina hafta aaj kal
+achi achay buri khush naraz mushkil asaan dafa baar jaisa waisa iske uske aise waise isliye warna
+"""
+
+_ENGLISH = """
+the be to of and a in that have i it for not on with he as you do at this but his by from they we say
+her she or an will my one all would there their what so up out if about who get which go me when make
+can like time no just him know take people into year your good some could them see other than then now
+look only come its over think also back after use two how our work first well way even new want because
+any these give day most us is are was were been has had did does am very really yes always often
+sometimes never rarely usually maybe sure don't didn't i'm it's satisfied happy agree disagree much
+more less little lot week month company policy policies manager team job role answer question please
+thank thanks okay fine better worse should might must depends honestly guess enough feel treated fair
+"""
+
+
+def _trigrams(word: str):
+    padded = f" {word} "
+    return [padded[i:i + 3] for i in range(len(padded) - 2)]
+
+
+def _train(words: str) -> Counter:
+    counts = Counter()
+    for word in words.split():
+        counts.update(_trigrams(word))
+    return counts
+
+
+_MODELS: Dict[str, Counter] = {"en": _train(_ENGLISH), "ur": _train(_ROMAN_URDU)}
+_VOCABULARY = len(set(_MODELS["en"]) | set(_MODELS["ur"]))
+# Add-one smoothed log probabilities; unseen trigrams fall back to the per-language floor
+_LOGPROB = {
+    language: {gram: math.log((count + 1) / (sum(counts.values()) + _VOCABULARY)) for gram, count in counts.items()}
+    for language, counts in _MODELS.items()
+}
+_FLOOR = {language: math.log(1 / (sum(counts.values()) + _VOCABULARY)) for language, counts in _MODELS.items()}
+
+
+class LanguageGuess(NamedTuple):
+    language: str       # "en", "ur", "other" (another script) or "unknown"
+    script: str         # "latin", "arabic", "devanagari", "other" or "none"
+    confidence: float   # 0..1
+    words: int
+    markers: int = 0    # Latin script: function words of the guessed language
+
+
+@lru_cache(maxsize=8192)
+def _word_log_odds(word: str) -> float:
+    en, ur = _LOGPROB["en"], _LOGPROB["ur"]
+    en_floor, ur_floor = _FLOOR["en"], _FLOOR["ur"]
+    return sum(ur.get(gram, ur_floor) - en.get(gram, en_floor) for gram in _trigrams(word))
+
+
+def romanized_urdu_probability(words) -> float:
+    """P(romanized Urdu) vs English for Latin-script words, from the trigram models."""
+    score = sum(_word_log_odds(word) for word in words)
+    # Log-odds to probability; clamp to keep exp() in range on long texts
+    return 1 / (1 + math.exp(-max(-50.0, min(50.0, score))))
+
+
+def identify_language(text: str) -> LanguageGuess:
+    arabic = len(ARABIC.findall(text))
+    devanagari = len(DEVANAGARI.findall(text))
+    latin = len(LATIN.findall(text))
+    other = len(OTHER_LETTER.findall(text))
+    letters = arabic + devanagari + latin + other
+    if not letters:
+        return LanguageGuess("unknown", "none", 0.0, 0)
+    words = len(text.split())
+
+    script, count = max((("arabic", arabic), ("devanagari", devanagari), ("latin", latin)), key=lambda item: item[1])
+    if count * 2 < letters:
+        return LanguageGuess("other", "other", round(other / letters, 3), words)
+    share = count / letters
+    if script != "latin":
+        return LanguageGuess("ur", script, round(share, 3), words)
+
+    latin_words = LATIN_WORD.findall(text.lower())
+    p_urdu = romanized_urdu_probability(latin_words)
+    language = "ur" if p_urdu >= 0.5 else "en"
+    markers = sum(1 for word in re.findall(r"[a-z']+", text.lower()) if word in _MARKERS[language])
+    confidence = p_urdu if language == "ur" else 1 - p_urdu
+    return LanguageGuess(language, script, round(share * confidence, 3), words, markers)
+
+
+def is_wrong_language(guess: LanguageGuess, expected: str, min_confidence: float = MIN_CONFIDENCE) -> bool:
+    """True only when the text is clearly not in the expected language (en or ur)."""
+    if guess.language in (expected, "unknown") or guess.confidence < min_confidence:
+        return False
+    if guess.script == "latin" and (guess.words < MIN_LATIN_WORDS or guess.markers < MIN_MARKERS):
+        return False
+    return True
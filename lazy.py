@@ -0,0 +1,45 @@
+import asyncio
+import threading
+from typing import Any, Callable, Generic, TypeVar
+
+# Values that are expensive to build (the OpenAI client, the employee list,
+# an embedding model) are built on first use instead of at import, so a
+# worker starts fast; the app's lifespan hook warms them in the background.
+
+T = TypeVar("T")
+
+
+class Lazy(Generic[T]):
+    """Value built by `factory` on first get() (once, thread-safe)."""
+
+    def __init__(self, factory: Callable[[], T]):
+        self._factory = factory
+        self._value: Any = None
+        self._loaded = False
+        self._lock = threading.Lock()
+
+    @property
+    def loaded(self) -> bool:
+        return self._loaded
+
+    def get(self) -> T:
+        if not self._loaded:
+            with self._lock:
+                if not self._loaded:
+                    self._value = self._factory()
+                    self._loaded = True
+        return self._value
+
+    async def aget(self) -> T:
+        """get() for async code: a first use builds the value in a worker thread."""
+        if not self._loaded:
+            await asyncio.to_thread(self.get)
+        return self._value
+
+
+class LazyProxy(Lazy[T]):
+    """A Lazy that forwards attribute access, so it can stand in for the object itself."""
+
+    def __getattr__(self, name: str) -> Any:
+        # Only called for attributes the proxy itself doesn't have
+        return getattr(self.get(), name)
@@ -0,0 +1,232 @@
+import asyncio
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import threading
+from typing import Any, Awaitable, Callable, Dict, Iterable, List, Optional, Tuple
+
+# Survey localization. When a survey is uploaded, every question text and
+# option is translated into each session language with one JSON-mode chat
+# call per language: the strings go out as {"1": text, "2": text, ...} and
+# must come back with exactly the same keys. Translations are stored by
+# (sha256 of the source text, language), so re-uploading a survey, or a
+# survey that shares questions and options with an earlier one, costs no
+# calls, and sessions read localized text from memory.
+#
+# The cache is a SQLite file (WAL, shared by every worker on the host) with
+# an in-memory dict in front; path None keeps it in memory only. Nothing
+# touches the file until the first lookup that misses memory, and file
+# reads and writes run in a worker thread, off the event loop.
+
+# Strings per chat call; a survey bigger than this takes several
+MAX_BATCH = 200
+
+TRANSLATE_PROMPT = """
+You are a translator for a voice survey.
+
+Translate every value of the JSON object the user sends into {language}.
+
+IMPORTANT:
+- Use simple, everyday spoken language.
+- Do NOT use formal, literary, or classical vocabulary.
+- Keep each translation short and natural, as it will be read aloud.
+- Translate each value on its own; do not merge, split or drop any.
+- Reply with ONLY a JSON object with exactly the same keys, each mapped to its translation.
+"""
+
+
+class TranslationError(ValueError):
+    """The model's reply did not have the requested shape."""
+
+
+def source_hash(text: str) -> str:
+    return hashlib.sha256(text.strip().encode("utf-8")).hexdigest()
+
+
+class TranslationCache:
+    def __init__(self, path: Optional[str]):
+        self.path = path
+        self._memory: Dict[tuple, str] = {}
+        self._local = threading.local()
+        self._schema_lock = threading.Lock()
+        self._schema_ready = False
+        self.hits = 0
+        self.misses = 0
+
+    def _conn(self) -> sqlite3.Connection:
+        # The file and table are created on first disk access, not at construction
+        if not self._schema_ready:
+            with self._schema_lock:
+                if not self._schema_ready:
+                    os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+                    conn = self._connect()
+                    conn.execute("PRAGMA journal_mode=WAL")
+                    conn.execute(
+                        """
+                        CREATE TABLE IF NOT EXISTS translations (
+                            source_hash TEXT NOT NULL,
+                            language TEXT NOT NULL,
+                            text TEXT NOT NULL,
+                            PRIMARY KEY (source_hash, language)
+                        )
+                        """
+                    )
+                    self._schema_ready = True
+        return self._connect()
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None, check_same_thread=False)
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("PRAGMA busy_timeout=30000")
+            self._local.conn = conn
+        return conn
+
+    def get(self, text: str, language: str) -> Optional[str]:
+        """Memory only: safe to call on every turn."""
+        return self._memory.get((source_hash(text), language))
+
+    def _disk_load(self, hashes: List[str], language: str) -> List[Tuple[str, str]]:
+        rows = []
+        for start in range(0, len(hashes), 500):
+            chunk = hashes[start:start + 500]
+            rows += self._conn().execute(
+                f"SELECT source_hash, text FROM translations WHERE language = ? "
+                f"AND source_hash IN ({','.join('?' * len(chunk))})",
+                (language, *chunk),
+            ).fetchall()
+        return rows
+
+    def _disk_put(self, rows: List[Tuple[str, str, str]]):
+        self._conn().executemany(
+            "INSERT OR REPLACE INTO translations (source_hash, language, text) VALUES (?, ?, ?)", rows,
+        )
+
+    async def load(self, texts: Iterable[str], language: str) -> Dict[str, str]:
+        """Translations of texts found in memory or on disk (disk hits are kept in memory)."""
+        found: Dict[str, str] = {}
+        pending: Dict[str, str] = {}
+        texts = list(dict.fromkeys(texts))
+        unique = len(texts)
+        for text in texts:
+            digest = source_hash(text)
+            translated = self._memory.get((digest, language))
+            if translated is not None:
+                found[text] = translated
+            else:
+                pending[digest] = text
+        if pending and self.path:
+            for digest, translated in await asyncio.to_thread(self._disk_load, list(pending), language):
+                self._memory[(digest, language)] = translated
+                found[pending[digest]] = translated
+        self.hits += len(found)
+        self.misses += unique - len(found)
+        return found
+
+    async def put_many(self, translations: Dict[str, str], language: str):
+        rows = [(source_hash(text), language, translated) for text, translated in translations.items()]
+        for digest, _, translated in rows:
+            self._memory[(digest, language)] = translated
+        if self.path and rows:
+            await asyncio.to_thread(self._disk_put, rows)
+
+    def stats(self) -> Dict[str, Any]:
+        """Counts the rows on disk: call it from a worker thread."""
+        stats: Dict[str, Any] = {"memory_entries": len(self._memory), "hits": self.hits, "misses": self.misses}
+        if self.path:
+            stats["entries"] = self._conn().execute("SELECT COUNT(*) FROM translations").fetchone()[0]
+        return stats
+
+    def close(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is not None:
+            conn.close()
+            self._local.conn = None
+
+
+def parse_translations(content: Optional[str], sources: List[str]) -> Dict[str, str]:
+    """Checks the reply maps "1".."n" to non-empty strings and returns {source: translation}."""
+    text = (content or "").strip()
+    # Tolerate a ```json fence around the object
+    fenced = re.match(r"^```(?:json)?\s*(.*?)\s*```$", text, re.DOTALL)
+    if fenced:
+        text = fenced.group(1)
+    try:
+        data = json.loads(text)
+    except json.JSONDecodeError as e:
+        raise TranslationError(f"reply is not JSON: {e}") from None
+    if not isinstance(data, dict):
+        raise TranslationError(f"reply is a JSON {type(data).__name__}, expected an object")
+    expected = {str(i) for i in range(1, len(sources) + 1)}
+    if set(data) != expected:
+        missing = sorted(expected - set(data), key=int)
+        extra = sorted(set(data) - expected)
+        raise TranslationError(f"reply keys don't match (missing {missing[:5]}, unexpected {extra[:5]})")
+    translations = {}
+    for i, source in enumerate(sources, start=1):
+        value = data[str(i)]
+        if not isinstance(value, str) or not value.strip():
+            raise TranslationError(f"translation {i} is empty or not a string")
+        translations[source] = value.strip()
+    return translations
+
+
+class SurveyLocalizer:
+    """Fills the TranslationCache for a set of texts with batched chat calls."""
+
+    def __init__(self, cache: TranslationCache, chat: Callable[..., Awaitable[Any]],
+                 language_names: Dict[str, str], model: str = "gpt-4o-mini"):
+        self.cache = cache
+        self.chat = chat
+        self.language_names = language_names
+        self.model = model
+        self.calls = 0
+        self.strings_translated = 0
+        self.failures = 0
+
+    async def translate(self, texts: List[str], language: str) -> Dict[str, str]:
+        """One chat call for up to MAX_BATCH texts; raises TranslationError on a malformed reply."""
+        payload = {str(i): text for i, text in enumerate(texts, start=1)}
+        self.calls += 1
+        response = await self.chat(
+            model=self.model,
+            temperature=0,
+            json_mode=True,
+            messages=[
+                {"role": "system", "content": TRANSLATE_PROMPT.format(language=self.language_names.get(language, language))},
+                {"role": "user", "content": json.dumps(payload, ensure_ascii=False)},
+            ],
+        )
+        try:
+            return parse_translations(response.content, texts)
+        except TranslationError:
+            self.failures += 1
+            raise
+
+    async def localize(self, texts: Iterable[str], language: str, cache_language: Optional[str] = None) -> Dict[str, int]:
+        """
+        Makes sure every text has a cached translation into language.
+        cache_language is the cache's language key if it differs from the
+        language code (e.g. tagged with the provider).
+        """
+        cache_language = cache_language or language
+        unique = [text for text in dict.fromkeys(texts) if text and text.strip()]
+        cached = await self.cache.load(unique, cache_language)
+        missing = [text for text in unique if text not in cached]
+        for start in range(0, len(missing), MAX_BATCH):
+            batch = missing[start:start + MAX_BATCH]
+            translations = await self.translate(batch, language)
+            await self.cache.put_many(translations, cache_language)
+            self.strings_translated += len(translations)
+        return {"texts": len(unique), "cached": len(cached), "translated": len(missing)}
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "calls": self.calls,
+            "strings_translated": self.strings_translated,
+            "failures": self.failures,
+            "cache": self.cache.stats(),
+        }
@@ -5,19 +5,43 @@ import time
 import json
 import base64
 import uuid
-import pandas as pd
-from fastapi import FastAPI, Form, HTTPException, UploadFile, File, BackgroundTasks
+import asyncio
+import atexit
+import zlib
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, Form, HTTPException, UploadFile, File, BackgroundTasks, WebSocket, WebSocketDisconnect, Query, Request
 from fastapi.responses import Response, JSONResponse,StreamingResponse
 # from polars import datetime
 # from pydub import AudioSegment
 from io import BytesIO
-import openai
 import csv
 from fastapi.middleware.cors import CORSMiddleware
-from typing import Dict,Any,List, Optional
-from openai import OpenAI
-import numpy as np
+from typing import Dict,Any,List, Optional, AsyncIterator, Tuple, TYPE_CHECKING
+from collections import deque
 from dotenv import load_dotenv
+from tts_cache import TTSCache, tts_cache_key
+from ogg import join_ogg_opus, OggOpusJoiner
+from sentences import split_sentences, SentenceBuffer
+from tool_stream import JSONStringFieldStream, find_string_field
+from intents import detect_local_intent, FastPathStats, normalize
+from language_id import identify_language, is_wrong_language
+from answer_index import OptionAliasIndex, NEGATIONS, MAX_ANSWER_TOKENS
+from embeddings import get_embedder, AnswerEmbeddingCache, OptionEmbeddings
+from survey import CompiledSurvey, Responses, compile_survey
+from stores import TTLStore, sweep_periodically
+from session_backend import make_session_backend, VersionConflict
+from response_store import ResponseStore, ResponseQueueFull, InvalidCursor
+from providers import make_provider
+from employees import EmployeeDirectory, poll_for_changes
+from audio_preprocess import AudioPreprocessor
+from tts_prefetch import SpeechPrefetcher
+from localization import TranslationCache, SurveyLocalizer
+from lazy import LazyProxy
+from metrics import REGISTRY, CONTENT_TYPE as METRICS_CONTENT_TYPE, observe, span, start_trace
+
+# pandas and openai are heavy to import; they are loaded on first use (see lifespan)
+if TYPE_CHECKING:
+    import pandas as pd
 # from langdetect import detect
 
 # from lingua import Language, LanguageDetectorBuilder
@@ -37,43 +61,143 @@ MODEL = "gpt-4o-mini"
 
 load_dotenv()
 
+# Which upstream serves STT, chat and TTS: "openai", or "fake" for the
+# in-process stand-in used for offline profiling and load tests (providers.py)
+PROVIDER_NAME = os.getenv("PROVIDER", "openai")
+
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
-if not OPENAI_API_KEY:
+if not OPENAI_API_KEY and PROVIDER_NAME == "openai":
     raise ValueError("OPENAI_API_KEY not found in environment")
 
-client = OpenAI(api_key=OPENAI_API_KEY)
+# Async client so a slow Whisper / gpt-4o call only suspends its own request
+# instead of blocking the event loop (and every other session) on the worker.
+# The connection pool size bounds how many upstream calls are in flight at once.
+OPENAI_MAX_CONNECTIONS = int(os.getenv("OPENAI_MAX_CONNECTIONS", "100"))
+OPENAI_TIMEOUT = float(os.getenv("OPENAI_TIMEOUT", "60"))
+
+
+def make_openai_client():
+    import httpx
+    from openai import AsyncOpenAI, DefaultAsyncHttpxClient
+
+    return AsyncOpenAI(
+        api_key=OPENAI_API_KEY,
+        timeout=OPENAI_TIMEOUT,
+        http_client=DefaultAsyncHttpxClient(
+            limits=httpx.Limits(
+                max_connections=OPENAI_MAX_CONNECTIONS,
+                max_keepalive_connections=OPENAI_MAX_CONNECTIONS,
+            )
+        ),
+    )
+
+
+# The OpenAI client is built on first use
+PROVIDER = make_provider(PROVIDER_NAME, make_openai_client)
+STT_MODEL = "whisper-1"
+# Model behind the survey agent's tool calls
+AGENT_MODEL = "gpt-4o"
+# TTS audio cache: same (text, model, voice, format) is only synthesized once.
+TTS_MODEL = "tts-1"
+TTS_VOICE = "alloy"
+TTS_FORMAT = "opus"
+TTS_CACHE_DIR = os.getenv("TTS_CACHE_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), "tts_cache"))
+TTS_CACHE_MEMORY_MB = int(os.getenv("TTS_CACHE_MEMORY_MB", "64"))
+# Disk budget for TTS_CACHE_DIR, least recently used clips go first (0 = unbounded)
+TTS_CACHE_DISK_MB = int(os.getenv("TTS_CACHE_DISK_MB", "1024"))
+# Sentence-chunked /tts: how many chunk syntheses run ahead of playback.
+TTS_PIPELINE_DEPTH = int(os.getenv("TTS_PIPELINE_DEPTH", "3"))
+TTS_CACHE = TTSCache(
+    TTS_CACHE_DIR or None,
+    max_memory_bytes=TTS_CACHE_MEMORY_MB * 1024 * 1024,
+    max_disk_bytes=TTS_CACHE_DISK_MB * 1024 * 1024 or None,
+)
+
+# Languages a survey can be conducted in; question audio is pre-rendered for each.
+SUPPORTED_LANGUAGES = ["en", "ur"]
+PRERENDER_CONCURRENCY = int(os.getenv("PRERENDER_CONCURRENCY", "4"))
+
+# Survey localization: at upload, questions and options are translated into every
+# other supported language with one batched call per language and cached by
+# (source text hash, language) in TRANSLATION_CACHE (sqlite; "" = memory only).
+SOURCE_LANGUAGE = os.getenv("SURVEY_SOURCE_LANGUAGE", "en")
+LANGUAGE_NAMES = {"en": "English", "ur": "Urdu"}
+TRANSLATION_CACHE = os.getenv("TRANSLATION_CACHE", os.path.join(TTS_CACHE_DIR, "translations.sqlite3") if TTS_CACHE_DIR else "")
+TRANSLATIONS = TranslationCache(TRANSLATION_CACHE or None)
+# PROVIDER is looked up per call so a swapped provider is used
+LOCALIZER = SurveyLocalizer(TRANSLATIONS, lambda **kwargs: PROVIDER.chat(**kwargs), LANGUAGE_NAMES, model=MODEL)
+
+# Embedding matcher: EMBEDDER=hashing (default, no model) or sentence-transformers[:model]
+EMBEDDER = get_embedder(os.getenv("EMBEDDER", "hashing"))
+ANSWER_EMBEDDINGS = AnswerEmbeddingCache(EMBEDDER, maxsize=int(os.getenv("ANSWER_EMBEDDING_CACHE_SIZE", "4096")))
+EMBEDDING_MATCH_THRESHOLD = float(os.getenv("EMBEDDING_MATCH_THRESHOLD", "0.70"))
+EMBEDDING_MATCH_MARGIN = float(os.getenv("EMBEDDING_MATCH_MARGIN", "0.10"))
+
+# Uploaded clips are cleaned up locally before Whisper (AUDIO_PREPROCESS=0 to disable);
+# AUDIO_PREPROCESS_WORKERS processes, 0 = a thread in this process
+AUDIO_PREPROCESSOR = AudioPreprocessor(
+    workers=int(os.getenv("AUDIO_PREPROCESS_WORKERS", "1")),
+    enabled=os.getenv("AUDIO_PREPROCESS", "1") != "0",
+)
+
 # File Paths
-EMPLOYEE_FILE = r"C:\Users\Lenovo\Desktop\voice_agent\backend\employee.csv"
+EMPLOYEE_FILE = os.getenv("EMPLOYEE_FILE", r"C:\Users\Lenovo\Desktop\voice_agent\backend\employee.csv")
 # QUESTIONS_FILE = r"C:\Users\Lenovo\Desktop\voice_agent\backend\questions.csv"
-RESPONSES_FILE = r"C:\Users\Lenovo\Desktop\voice_agent\backend\responses.csv"
+RESPONSES_FILE = os.getenv("RESPONSES_FILE", r"C:\Users\Lenovo\Desktop\voice_agent\backend\responses.csv")
+# Submitted answers: write-behind into SQLite (RESPONSES_FILE is imported once if the store is new).
+# By default the database sits beside RESPONSES_FILE if that is configured, else in the app directory.
+RESPONSES_DB = os.getenv("RESPONSES_DB") or (
+    os.path.splitext(os.path.abspath(RESPONSES_FILE))[0] + ".db" if os.getenv("RESPONSES_FILE")
+    else os.path.join(os.path.dirname(os.path.abspath(__file__)), "responses.db")
+)
+# Opened (schema, writer thread) by the startup warm-up or on first use
+RESPONSE_STORE = LazyProxy(lambda: ResponseStore(
+    RESPONSES_DB,
+    batch_size=int(os.getenv("RESPONSES_BATCH_SIZE", "500")),
+    flush_interval=float(os.getenv("RESPONSES_FLUSH_SECONDS", "0.2")),
+    fsync=os.getenv("RESPONSES_FSYNC", "batch"),
+))
+
+
+def close_response_store():
+    """Commits every queued submit; a store that was never opened is left alone."""
+    if RESPONSE_STORE.loaded:
+        RESPONSE_STORE.close()
 
-employee_df = pd.read_csv(EMPLOYEE_FILE)
 
-# Combine columns and convert to a list
-full_name = (employee_df["firstname"] + " " + employee_df["lastname"]).tolist()
-print("Employee Names: ", full_name)
+atexit.register(close_response_store)
 
 
-def load_questions_from_dataframe(df: pd.DataFrame) -> pd.DataFrame:
-    """Convert dataframe to questions format"""
+def import_legacy_responses() -> int:
+    """One-off: RESPONSES_FILE is imported if the store is new."""
+    imported = RESPONSE_STORE.import_csv(RESPONSES_FILE)
+    if imported:
+        print(f"Imported {imported} responses from {RESPONSES_FILE}")
+    return imported
+
+
+# Indexed by id, email and phone; loaded on first use or by the startup warm-up,
+# and reloaded when the file changes (checked every EMPLOYEE_RELOAD_SECONDS)
+EMPLOYEES = EmployeeDirectory(EMPLOYEE_FILE)
+EMPLOYEE_RELOAD_SECONDS = float(os.getenv("EMPLOYEE_RELOAD_SECONDS", "5"))
+
+
+def load_questions_from_dataframe(df: "pd.DataFrame") -> CompiledSurvey:
+    """Validate the uploaded dataframe and compile it into the survey used by sessions"""
     try:
         # Validate required columns
         required_columns = {"id", "question", "options"}
         if not required_columns.issubset(df.columns):
             raise ValueError(f"CSV must contain columns: {', '.join(required_columns)}")
         
-        # Normalize options: split by '|' and clean
-        df["options_list"] = df["options"].apply(
-            lambda x: [opt.strip().lower() for opt in str(x).split("|")] if pd.notna(x) else []
-        )
-        
-        return df
+        # Options are split by '|' (or ',') and indexed once here, per question
+        return compile_survey(df.to_dict("records"), EMBEDDER)
     except Exception as e:
         raise ValueError(f"Error processing CSV: {str(e)}")
 
 
 
-def build_message(text: str, qid: str, options=None):
+async def build_message(text: str, qid: str, options=None):
     options = options or []
     
     # Create a combined text for TTS
@@ -84,32 +208,107 @@ def build_message(text: str, qid: str, options=None):
     return {
         "role": "assistant",
         "text": text,
-        "audio": text_to_speech(tts_text),
+        "audio": await text_to_speech(tts_text),
         "options": options or [],
         "qid": qid
     }
 
 
-def text_to_speech(text: str) -> str:
-    tts = client.audio.speech.create(
-        model="tts-1",
-        voice="alloy",
-        input=text,
-        response_format="opus"
-    )
-    return base64.b64encode(tts.content).decode("utf-8")
+def speech_key(text: str, model: str = TTS_MODEL, voice: str = TTS_VOICE, response_format: str = TTS_FORMAT) -> str:
+    return tts_cache_key(text, PROVIDER.cache_tag + model, voice, response_format)
+
+
+async def synthesize_speech(text: str, model: str = TTS_MODEL, voice: str = TTS_VOICE, response_format: str = TTS_FORMAT,
+                            prefetch: bool = False) -> bytes:
+    """Returns synthesized audio bytes, served from TTS_CACHE when the same clip was made before."""
+    async def create():
+        return await PROVIDER.speech(text, model, voice, response_format)
+
+    key = speech_key(text, model, voice, response_format)
+    if not prefetch:
+        # A clip someone waits on must never be cancelled as an unused prefetch
+        SPEECH_PREFETCHER.claim(key)
+    return await TTS_CACHE.get_or_create(key, text, create)
+
+
+# Speculative TTS of the next question while the user answers (TTS_PREFETCH=0 to disable)
+SPEECH_PREFETCHER = SpeechPrefetcher(
+    synthesize=lambda text: synthesize_speech(text, prefetch=True),
+    key=speech_key,
+    cached=TTS_CACHE.contains,
+    ttl_seconds=float(os.getenv("TTS_PREFETCH_TTL_SECONDS", "120")),
+    enabled=os.getenv("TTS_PREFETCH", "1") != "0",
+)
+
+
+def prefetch_next_speech(session_id: str, orchestrator: "SurveyOrchestrator", reply_text: Optional[str] = None):
+    """After a turn: settle the session's predictions against its reply, then predict the next reply."""
+    if reply_text is not None:
+        SPEECH_PREFETCHER.settle(session_id, [reply_text, *split_sentences(reply_text)])
+    SPEECH_PREFETCHER.prefetch(session_id, orchestrator.likely_next_prompts())
 
-def extract_number(user_answer: str) -> str:
+
+def speech_chunks(segments: List[str]) -> List[str]:
+    """
+    Splits TTS segments into sentences for pipelined synthesis.
+    Segments already in the memory cache (pre-rendered prompts) are kept whole.
+    """
+    chunks = []
+    for segment in segments:
+        if TTS_CACHE.contains(speech_key(segment)):
+            chunks.append(segment)
+        else:
+            chunks.extend(split_sentences(segment))
+    return chunks
+
+
+def speech_language(segments: List[str]) -> str:
+    """Language label of reply text for metrics: Urdu replies are in Arabic script."""
+    return "ur" if any("\u0600" <= ch <= "\u06ff" for segment in segments for ch in segment) else "en"
+
+
+async def stream_speech(chunks: List[str]) -> AsyncIterator[bytes]:
+    """
+    Synthesizes chunks with up to TTS_PIPELINE_DEPTH requests in flight and
+    yields them, in order, as one continuous Ogg/Opus stream. Playback can
+    start as soon as the first chunk is ready.
+    """
+    joiner = OggOpusJoiner()
+    pending = deque()
+    next_chunk = 0
+    language = speech_language(chunks)
+    start = time.perf_counter()
+    try:
+        while next_chunk < len(chunks) or pending:
+            while next_chunk < len(chunks) and len(pending) < TTS_PIPELINE_DEPTH:
+                pending.append(asyncio.create_task(synthesize_speech(chunks[next_chunk])))
+                next_chunk += 1
+            clip = await pending.popleft()
+            if next_chunk - len(pending) == 1:
+                observe("tts_first_byte", time.perf_counter() - start, TTS_MODEL, language)
+            yield joiner.feed(clip)
+        observe("tts_total", time.perf_counter() - start, TTS_MODEL, language)
+    finally:
+        # Client went away (or a chunk failed): don't keep synthesizing for nobody.
+        for task in pending:
+            task.cancel()
+
+
+async def text_to_speech(text: str) -> str:
+    audio = await synthesize_speech(text)
+    return base64.b64encode(audio).decode("utf-8")
+
+async def extract_number(user_answer: str) -> str:
     """Extracts a number from text using Gemini."""
     prompt = f"Extract the number from the following text(find in words also like two, three). Return only the number. If no number is present, return 'NO_NUMBER'.\n\nText: {user_answer}"
-    response = client.chat.completions.create(
+    response = await PROVIDER.chat(
         model=MODEL,    
         messages=[{"role": "system", "content": prompt + "\n\nText: " + user_answer}],
         temperature=0
     )
-    return response.choices[0].message.content.strip()
+    return response.content.strip()
 
-def map_answer_llm(question: str, options: List[str], user_answer: str) -> str:
+async def map_answer_llm(question: str, options: List[str], user_answer: str) -> str:
     """Maps user answer to one of the provided options."""
     if not options:
         return user_answer # Open-ended
@@ -134,7 +333,7 @@ User Answer:
 {user_answer}
 """
 
-    response = client.chat.completions.create(
+    response = await PROVIDER.chat(
         model=MODEL,
         # messages=[{"role": "system", "content": prompt}],
         messages=[
@@ -144,9 +343,9 @@ User Answer:
         temperature=0
     )
 
-    return response.choices[0].message.content.strip()
+    return response.content.strip()
 
-def linguitic_answer_llm(question: str, options: List[str], user_answer: str) -> str:
+async def linguitic_answer_llm(question: str, options: List[str], user_answer: str) -> str:
     """Maps user answer to one of the provided options."""
     if not options:
         return user_answer # Open-ended
@@ -177,7 +376,7 @@ Rules:
 - Return only valid JSON.
 """
 
-    response = client.chat.completions.create(
+    response = await PROVIDER.chat(
         model="gpt-4o-mini",
         temperature=0,
         messages=[
@@ -186,7 +385,7 @@ Rules:
         ]
     )
 
-    output_text = response.choices[0].message.content.strip()
+    output_text = response.content.strip()
 
     try:
         parsed = json.loads(output_text)
@@ -214,40 +413,33 @@ def normalize_options(options):
 
     return []
 
-# def local_embed(text):
-#     vector = emb_model.encode(text)
-#     return vector.tolist()
 def local_embed(text):
-    return emb_model.encode(text).tolist()
-
-def cosine_similarity(a, b):
-    a = np.array(a)
-    b = np.array(b)
-    return float(np.dot(a, b) / (np.linalg.norm(a) * np.linalg.norm(b)))
+    return ANSWER_EMBEDDINGS(text)
 
-def map_with_embeddings(user_answer, options):
-    user_emb = local_embed(user_answer)
-    best_option = None
-    best_score = -1
-    if isinstance(options, str):
-        options = [opt.strip() for opt in options.split(",")]
-    elif isinstance(options, list):
-        if len(options) == 1 and "," in options[0]:
-            options = [opt.strip() for opt in options[0].split(",")]
-
-    print("Normalized options:", options)
-       
-    for option in options:
-        opt_emb = local_embed(option)
-        score = cosine_similarity(user_emb, opt_emb)
-        if score > best_score:
-            best_score = score
-            best_option = option
-            print("score: ", best_score, " for option: ", option)
-    print("Best score =", best_score)
-    return best_option if best_score > 0.60 else "NO_MATCH"
-
-def detect_intent_llm(user_input: str) -> Dict[str, Any]:
+def map_with_embeddings(user_answer, options, threshold=EMBEDDING_MATCH_THRESHOLD, margin=EMBEDDING_MATCH_MARGIN):
+    """
+    Maps an answer to the closest option by cosine similarity.
+    `options` is the question's precomputed OptionEmbeddings (or a plain option list).
+    """
+    if not isinstance(options, OptionEmbeddings):
+        options = OptionEmbeddings(normalize_options(options), EMBEDDER)
+    if not len(options) or "?" in user_answer or "؟" in user_answer:
+        return "NO_MATCH"
+    tokens = normalize(user_answer).split()
+    if not tokens or len(tokens) > MAX_ANSWER_TOKENS:
+        return "NO_MATCH"
+
+    best_option, best_score = options.best(local_embed(user_answer), threshold, margin)
+    print("Best score =", round(best_score, 3), " for option: ", best_option)
+    if best_option is None:
+        return "NO_MATCH"
+    # Similarity can't see negation ("not always" ~ "always")
+    option_tokens = set(normalize(best_option).split())
+    if any(t in NEGATIONS and t not in option_tokens for t in tokens):
+        return "NO_MATCH"
+    return best_option
+
+async def detect_intent_llm(user_input: str) -> Dict[str, Any]:
     """Detects user intent using Openai with JSON output."""
     system_prompt = """
 You are an intent classifier for a survey system.
@@ -267,7 +459,7 @@ Schema:
 """
     user_prompt = f'User input: "{user_input}"'
 
-    response = client.chat.completions.create(
+    response = await PROVIDER.chat(
         model=MODEL,
         messages=[
             {"role": "system", "content": system_prompt},
@@ -276,7 +468,7 @@ Schema:
         temperature=0
     )
 
-    raw = response.choices[0].message.content.strip()
+    raw = response.content.strip()
 
     try:
         return json.loads(raw)
@@ -290,34 +482,103 @@ Schema:
 
 
 
+# Below this confidence the local intent engine defers to the LLM.
+FAST_PATH_MIN_CONFIDENCE = float(os.getenv("FAST_PATH_MIN_CONFIDENCE", "0.8"))
+
 def quick_intent_check(text: str) -> Optional[Dict[str, Any]]:
-    """Fast keyword-based intent check."""
-    t = text.lower().strip()
-    if "option" in t:
-        return {"intent": "list_options", "question_id": None, "new_answer": None}
-    if t == "submit":
-        return {"intent": "submit", "question_id": None, "new_answer": None}
-    if "summary" in t:
-        return {"intent": "summary", "question_id": None, "new_answer": None}
-    if "repeat" in t:
-        return {"intent": "repeat_question", "question_id": None, "new_answer": None}
-    if "change" in t:
-        return {"intent": "change_answer", "question_id": None, "new_answer": None}
-    return None
-
-
-async def generate_survey_intro(questions_df, language="en", full_name=None, orchestrator=None, total_questions=None):
+    """Fast keyword-based intent check (English, Urdu, romanized Urdu). None when unsure."""
+    intent = detect_local_intent(text)
+    if intent is None or intent["confidence"] < FAST_PATH_MIN_CONFIDENCE:
+        return None
+    return intent
+
+
+# Fixed replies spoken by the orchestrator; pre-rendered with the survey audio.
+REPEAT_PROMPT = {
+    "en": "Please repeat that.",
+    "ur": "براہ کرم دوبارہ کہیں۔",
+}
+NOT_REACHED_PROMPT = {
+    "en": "You haven't reached that question yet.",
+    "ur": "آپ ابھی اس سوال تک نہیں پہنچے۔",
+}
+WRONG_LANGUAGE_PROMPT = {
+    "en": "Please provide your answer in English.",
+    "ur": "براہ کرم اپنا جواب اردو میں دیں۔",
+}
+
+
+def translation_key(language: str) -> str:
+    # Tagged like TTS keys, so a fake provider's translations never stand in for real ones
+    return PROVIDER.cache_tag + language
+
+
+def localized_text(text: str, language: str) -> str:
+    """text in the session language from the translation cache, or as written if it isn't localized."""
+    if language == SOURCE_LANGUAGE:
+        return text
+    return TRANSLATIONS.get(text, translation_key(language)) or text
+
+
+def localized_options(question, language: str) -> Optional[str]:
+    """The choices line's options in the session language, or as written if any is missing."""
+    if question.options is None or language == SOURCE_LANGUAGE:
+        return question.options
+    key = translation_key(language)
+    translated = [TRANSLATIONS.get(option, key) for option in question.options_list]
+    if not translated or None in translated:
+        return question.options
+    return ("، " if language == "ur" else ", ").join(translated)
+
+
+def question_prompt_text(question, language: str = "en") -> str:
+    """The spoken form of a question: its text plus the choices line, in the session language."""
+    options_val = localized_options(question, language)
+    if options_val is not None:
+        if language == 'ur':
+            options_text = f"اس سوال کے لیے آپ کے پاس یہ آپشنز ہیں: {options_val}"
+        else:
+            options_text = f"Choices for this questions are: {options_val}"
+    else:
+        if language == 'ur':
+            options_text = "اس سوال کا جواب آپ اپنی مرضی سے دے سکتے ہیں۔"
+        else:
+            options_text = "This is an open-ended question."
+    return localized_text(question.text, language) + "\n" + options_text
+
+
+def answer_reply(mapped: str, number: int, next_q, language: str = "en") -> str:
+    """Acknowledges an answer and asks the next question (number is 1-based)."""
+    if language == 'ur':
+        return f"ٹھیک ہے، آپ کا جواب ہے {mapped}۔ اگلا سوال نمبر {number} ہے۔\n{question_prompt_text(next_q, language)}"
+    return f"Got it, your answer is {mapped}. Here is question {number}.\n{question_prompt_text(next_q, language)}"
+
+
+# Stands in for the answer when predicting a reply; chunks containing it aren't prefetched
+ANSWER_PLACEHOLDER = "\x00"
+
+
+# Intro templates per (survey_id, language, question count). The employee name is
+# left as a placeholder and filled in locally, so only the first session of a
+# survey/language pays for the LLM call. Values are tasks so concurrent
+# start_session calls share one generation.
+NAME_PLACEHOLDER = "{employee_name}"
+INTRO_CACHE: Dict[Tuple[str, str, int], "asyncio.Task[str]"] = {}
+
+
+async def generate_intro_template(survey: CompiledSurvey, language="en", total_questions=None) -> str:
     """
     Creates a short 2–3 line summary describing:
     - What the survey is about
     - Its general purpose
+    The greeting addresses the user as {employee_name}.
     """
     # Combine first few questions to understand theme
-    sample_questions = questions_df["question"].dropna().tolist()
+    sample_questions = survey.texts()
 
     combined_text = " ".join(sample_questions)
 
-    name_instruction = f"Greet {full_name} naturally." if full_name else "Greet the user naturally."
+    name_instruction = f"Greet the user naturally by name, writing the name exactly as the placeholder {NAME_PLACEHOLDER}."
 
     prompt1 = f"""
 Generate a voice-friendly survey opening in {language}.
@@ -330,6 +591,7 @@ STRICT RULES:
 - Do NOT number anything.
 - Return ONLY plain text.
 - You MUST separate the Greeting and Introduction using line breaks.
+- Keep the placeholder {NAME_PLACEHOLDER} unchanged and untranslated.
 
 Output format must exactly be:
 Greeting
@@ -340,31 +602,55 @@ Introduction
 """
 
     # Assuming 'client' is defined globally in your environment
-    response = client.responses.create(
-        model="gpt-4o-mini",
-        input=prompt1,
-        temperature=0
+    template = await PROVIDER.generate(prompt1, model="gpt-4o-mini", temperature=0)
+    print("LLM Intro Response: ", template)
+    return template
+
+
+async def get_intro_template(survey_id, survey: CompiledSurvey, language="en", total_questions=None) -> str:
+    key = (survey_id, language, int(total_questions or 0))
+    task = INTRO_CACHE.get(key)
+    if task is None:
+        task = asyncio.ensure_future(generate_intro_template(survey, language, total_questions))
+        INTRO_CACHE[key] = task
+    try:
+        # shield: one cancelled request must not cancel the shared generation
+        return await asyncio.shield(task)
+    except Exception:
+        # Don't cache failures; the next session retries
+        if INTRO_CACHE.get(key) is task:
+            del INTRO_CACHE[key]
+        raise
+
+
+def personalize_intro(template: str, full_name=None) -> str:
+    if NAME_PLACEHOLDER in template:
+        return template.replace(NAME_PLACEHOLDER, full_name or "")
+    return template
+
+
+async def warm_intro_cache(survey_id, survey: CompiledSurvey):
+    """Generates the intro template for every supported language right after upload."""
+    total = len(survey)
+    results = await asyncio.gather(
+        *(get_intro_template(survey_id, survey, lang, total) for lang in SUPPORTED_LANGUAGES),
+        return_exceptions=True,
     )
-    
-    greeting_text = response.output[0].content[0].text
-    print("LLM Intro Response: ", greeting_text)
-    
-    first_q = orchestrator.state.current_question()
-    question_text = first_q['question']
-    options_val = first_q.get("options")
-    
-    # question_text = f"First question: {first_q['question']}" if first_q is not None else intro_text
-    # 1. Safely get the value
-    if pd.notna(options_val) and str(options_val).lower() != "nan":
-        if language == 'en':
-            options_text = f"Choices for this questions are: {options_val}"
-        if language == 'ur':
-            options_text = f"اس سوال کے لیے آپ کے پاس یہ آپشنز ہیں: {options_val}"
+    for lang, result in zip(SUPPORTED_LANGUAGES, results):
+        if isinstance(result, Exception):
+            print(f"Intro warm-up failed for survey {survey_id} ({lang}): {result}")
+
+
+async def generate_survey_intro(survey: CompiledSurvey, language="en", full_name=None, orchestrator=None, total_questions=None, survey_id=None):
+    """Greeting/introduction (from the cached template) and the first question prompt."""
+    if survey_id is None:
+        template = await generate_intro_template(survey, language, total_questions)
     else:
-        if language == 'en':
-            options_text = "This is an open-ended question."
-        if language == 'ur':
-            options_text = "اس سوال کا جواب آپ اپنی مرضی سے دے سکتے ہیں۔"
+        template = await get_intro_template(survey_id, survey, language, total_questions)
+    greeting_text = personalize_intro(template, full_name)
+
+    first_q = orchestrator.state.current_question()
+    question_text = question_prompt_text(first_q, language)
 
 #     prompt2 = f"""
 # You are a voice assistant conducting a survey in {language}.
@@ -387,9 +673,9 @@ Introduction
 #     )
     
     # question_text = response.output[0].content[0].text
-    print("LLM First Question Response: ", question_text + options_text)
+    print("LLM First Question Response: ", question_text)
     
-    return greeting_text, question_text + "\n" + options_text
+    return greeting_text, question_text
 # --- Survey Logic ---
 
 # survey_tools =[
@@ -454,10 +740,17 @@ survey_tools = [
 ]
 
 
+FAST_PATH_STATS = FastPathStats()
+
+
 class SurveyState:
-    def __init__(self, questions_df: pd.DataFrame, language: str = "en"):
-        self.questions = questions_df
-        self.responses: Dict[int, str] = {}
+    __slots__ = ("survey_id", "employee_id", "questions", "responses", "language", "current_index", "max_index", "completed", "halfway", "q_completed")
+
+    def __init__(self, survey: CompiledSurvey, language: str = "en", survey_id: Optional[str] = None, employee_id: Optional[str] = None):
+        self.survey_id = survey_id
+        self.employee_id = employee_id
+        self.questions = survey
+        self.responses = Responses(survey)
         self.language = language
         self.current_index = 0
         self.max_index = 0
@@ -468,14 +761,43 @@ class SurveyState:
     def current_question(self):
         if self.current_index >= len(self.questions):
             return None
-        return self.questions.iloc[self.current_index]
+        return self.questions[self.current_index]
 
     def is_done(self):
         return len(self.responses) >= len(self.questions)
 
+    def snapshot(self) -> Dict[str, Any]:
+        """JSON-serializable state; the survey itself is referenced by survey_id."""
+        return {
+            "survey_id": self.survey_id,
+            "employee_id": self.employee_id,
+            "language": self.language,
+            "current_index": self.current_index,
+            "max_index": self.max_index,
+            "completed": self.completed,
+            "halfway": self.halfway,
+            "q_completed": self.q_completed,
+            "answers": self.responses.to_positions(),
+        }
+
+    @classmethod
+    def from_snapshot(cls, snapshot: Dict[str, Any], survey: CompiledSurvey) -> "SurveyState":
+        state = cls(survey, snapshot["language"], snapshot["survey_id"], snapshot.get("employee_id"))
+        state.responses = Responses.from_positions(survey, snapshot["answers"])
+        state.current_index = snapshot["current_index"]
+        state.max_index = snapshot["max_index"]
+        state.completed = snapshot["completed"]
+        state.halfway = snapshot["halfway"]
+        state.q_completed = snapshot["q_completed"]
+        return state
+
 class SurveyOrchestrator:
-    def __init__(self, state: SurveyState):
+    def __init__(self, state: SurveyState, version: int = 0):
         self.state = state
+        # Session backend version this state was loaded at (optimistic concurrency)
+        self.version = version
+        # Summary rows from save_responses, written by save_orchestrator with the turn
+        self.summary_rows: Optional[List[Dict[str, Any]]] = None
 
 
     # def handle_input(self, user_input: str, session_id: str, detected_language: str = "en") -> str:
@@ -663,12 +985,275 @@ class SurveyOrchestrator:
 
     
     
-    def handle_input(self, user_text: str, session_id: str) -> str:
+    async def handle_input(self, user_text: str, session_id: str) -> str:
         # 1. Handle silent/empty audio instantly
         if not user_text.strip():
             # Quick fallback if Whisper heard nothing
-            return "Please repeat that." if self.state.language == "en" else "براہ کرم دوبارہ کہیں۔"
+            return REPEAT_PROMPT["en"] if self.state.language == "en" else REPEAT_PROMPT["ur"]
+
+        with span("fast_path"):
+            local_reply = self.try_fast_path(user_text, session_id)
+        if local_reply is not None:
+            return local_reply
+
+        start_llm = time.perf_counter()
+        with span("prompt_build"):
+            system_prompt = self.build_system_prompt()
+
+        # 4. Call the OpenAI Agent (Forcing it to use our Omni-Tool)
+        with span("llm", AGENT_MODEL):
+            response = await PROVIDER.chat(
+                model=AGENT_MODEL,
+                messages=[
+                    {"role": "system", "content": system_prompt},
+                    {"role": "user", "content": user_text}
+                ],
+                tools=survey_tools,
+                tool_choice={"type": "function", "function": {"name": "execute_survey_action"}}, # Forces structured JSON output
+                temperature=0.2 # Keep it focused
+            )
+
+        # 5. Extract the AI's Decisions
+        tool_call = response.tool_calls[0]
+        args = json.loads(tool_call.arguments)
+        with span("state_update"):
+            reply = await self.apply_action(args, user_text, session_id)
+        FAST_PATH_STATS.record_llm(time.perf_counter() - start_llm)
+        return reply
+
+    async def handle_input_stream(self, user_text: str, session_id: str) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Streaming variant of handle_input.
+
+        Yields {"type": "delta", "text": ...} events with pieces of
+        reply_to_speak as gpt-4o generates the tool call, then one
+        {"type": "final", "text": ..., "replaced": bool} event. State changes
+        are applied only once the full tool call has arrived, exactly as in
+        handle_input. replaced=True means the final text is not what was
+        streamed (e.g. the reply was overridden) and should be used instead.
+        """
+        if not user_text.strip():
+            reply = REPEAT_PROMPT["en"] if self.state.language == "en" else REPEAT_PROMPT["ur"]
+            yield {"type": "delta", "text": reply}
+            yield {"type": "final", "text": reply, "replaced": False}
+            return
+
+        with span("fast_path"):
+            local_reply = self.try_fast_path(user_text, session_id)
+        if local_reply is not None:
+            yield {"type": "delta", "text": local_reply}
+            yield {"type": "final", "text": local_reply, "replaced": False}
+            return
+
+        start_llm = time.perf_counter()
+        with span("prompt_build"):
+            system_prompt = self.build_system_prompt()
+        start_stream = time.perf_counter()
+        stream = PROVIDER.chat_stream(
+            model=AGENT_MODEL,
+            messages=[
+                {"role": "system", "content": system_prompt},
+                {"role": "user", "content": user_text}
+            ],
+            tools=survey_tools,
+            tool_choice={"type": "function", "function": {"name": "execute_survey_action"}},
+            temperature=0.2
+        )
 
+        reply_field = JSONStringFieldStream("reply_to_speak")
+        arguments = ""
+        intent = None
+        held = ""
+        streamed = ""
+        async for delta in stream:
+            fragment = delta.tool_arguments
+            if not fragment:
+                continue
+            if not arguments:
+                observe("llm_first_token", time.perf_counter() - start_stream, AGENT_MODEL)
+            arguments += fragment
+            held += reply_field.feed(fragment)
+            if intent is None:
+                intent = find_string_field(arguments, "intent")
+            # A summary reply is regenerated below, so don't speak the draft.
+            if held and intent is not None and intent != "summary":
+                streamed += held
+                yield {"type": "delta", "text": held}
+                held = ""
+        # Includes the time the consumer took for the deltas yielded meanwhile
+        observe("llm", time.perf_counter() - start_stream, AGENT_MODEL)
+
+        args = json.loads(arguments)
+        if args.get("intent") == "summary":
+            print("Agent Detected Intent: summary (streaming)")
+            summary_stream = PROVIDER.chat_stream(
+                model=AGENT_MODEL,
+                messages=self.summary_messages(user_text),
+                temperature=0.3
+            )
+            summary_text = ""
+            start_summary = time.perf_counter()
+            async for delta in summary_stream:
+                if delta.content:
+                    summary_text += delta.content
+                    yield {"type": "delta", "text": delta.content}
+            observe("llm", time.perf_counter() - start_summary, AGENT_MODEL)
+            FAST_PATH_STATS.record_llm(time.perf_counter() - start_llm)
+            yield {"type": "final", "text": summary_text, "replaced": bool(streamed)}
+            return
+
+        if held:
+            streamed += held
+            yield {"type": "delta", "text": held}
+        with span("state_update"):
+            reply = await self.apply_action(args, user_text, session_id)
+        FAST_PATH_STATS.record_llm(time.perf_counter() - start_llm)
+        yield {"type": "final", "text": reply, "replaced": reply != streamed}
+
+    def try_fast_path(self, user_text: str, session_id: str) -> Optional[str]:
+        """
+        Resolves control commands (repeat, options, summary, submit, change N)
+        and clear answers to closed questions without the LLM.
+        """
+        start = time.perf_counter()
+        intent = quick_intent_check(user_text)
+        if intent is None:
+            reply = self.try_local_answer(user_text, start)
+            if reply is None:
+                reply = self.reject_wrong_language(user_text, start)
+            return reply
+        reply = self.apply_local_intent(intent, session_id)
+        if reply is None:
+            return None
+        FAST_PATH_STATS.record_local(intent["intent"], time.perf_counter() - start)
+        print(f"Fast-path Intent: {intent['intent']} | Question: {intent['question_id']}")
+        return reply
+
+    def try_local_answer(self, user_text: str, start: float) -> Optional[str]:
+        question = self.state.current_question()
+        if question is None:
+            return None
+        alias_index = question.alias_index
+        if not alias_index or alias_index.is_uncertain(user_text):
+            return None
+        mapped = alias_index.match(user_text, self.state.language)
+        if mapped is None:
+            # Near-misses of an option (Whisper spelling variants) via the embedding index
+            option_embeddings = question.option_embeddings
+            if option_embeddings is None:
+                return None
+            mapped = map_with_embeddings(user_text, option_embeddings)
+            if mapped == "NO_MATCH":
+                return None
+        print(f"Fast-path Answer: {mapped}")
+        self.record_answer(question, mapped)
+        reply = self.local_answer_reply(mapped)
+        FAST_PATH_STATS.record_local("answer", time.perf_counter() - start)
+        return reply
+
+    def reject_wrong_language(self, user_text: str, start: float) -> Optional[str]:
+        """The agent's wrong_language guardrail, locally, for utterances that are obviously in another language."""
+        lang = self.state.language
+        guess = identify_language(user_text)
+        if not is_wrong_language(guess, lang):
+            return None
+        question = self.state.current_question()
+        if question is not None and question.options_list:
+            # Options are spoken as written, e.g. English choices in an Urdu session
+            spoken = f" {normalize(user_text)} "
+            if any(f" {option} " in spoken for option in question.options_list):
+                return None
+        print(f"Fast-path Language Guard: expected {lang}, got {guess}")
+        FAST_PATH_STATS.record_local("wrong_language", time.perf_counter() - start)
+        return WRONG_LANGUAGE_PROMPT["en"] if lang == "en" else WRONG_LANGUAGE_PROMPT["ur"]
+
+    def local_answer_reply(self, mapped: str) -> str:
+        """Acknowledgement + next question (or summary and submit prompt), like the agent's answer replies."""
+        lang = self.state.language
+        mapped = localized_text(mapped, lang)
+        next_q = self.state.current_question()
+        if next_q is None:
+            summary = self.get_summary(lang)
+            if lang == 'ur':
+                return f"ٹھیک ہے، آپ کا جواب ہے {mapped}۔\nزبردست! آپ نے تمام سوالات کے جوابات دے دیے ہیں۔\n{summary}\nفائنل کرنے کے لیے 'جمع کریں' یا 'submit' کہیں۔"
+            return f"Got it, your answer is {mapped}.\nGreat! You've answered all questions.\n{summary}\nSay 'submit' to finalize."
+        return answer_reply(mapped, self.state.current_index + 1, next_q, lang)
+
+    def likely_next_prompts(self) -> List[str]:
+        """
+        The sentence chunks /tts will speak if the user clearly answers the
+        current question: the local answer reply minus its acknowledgement,
+        i.e. the question record_answer moves on to and its choices line.
+        """
+        state = self.state
+        if state.completed:
+            return []
+        # Same move as record_answer: advance, or return to the bookmark after an edit
+        next_index = state.current_index + 1 if state.current_index == state.max_index else state.max_index
+        if next_index >= len(state.questions):
+            return []
+        reply = answer_reply(ANSWER_PLACEHOLDER, next_index + 1, state.questions[next_index], state.language)
+        return [chunk for chunk in split_sentences(reply) if ANSWER_PLACEHOLDER not in chunk]
+
+    def apply_local_intent(self, intent: Dict[str, Any], session_id: str) -> Optional[str]:
+        """Same state transitions as apply_action, with fixed bilingual replies. None = let the LLM handle it."""
+        lang = self.state.language
+        kind = intent["intent"]
+        question = self.state.current_question()
+
+        if kind == "summary":
+            if lang == 'ur':
+                return f"{self.get_summary(lang)}\nکیا آپ کچھ تبدیل کرنا چاہتے ہیں یا جمع کروانا چاہتے ہیں؟"
+            return f"{self.get_summary(lang)}\nWould you like to change anything, or submit?"
+
+        if kind == "submit":
+            if not self.state.is_done():
+                if lang == 'ur':
+                    return f"براہِ کرم جمع کروانے سے پہلے تمام سوالات کے جوابات دیں۔\n{self.get_summary(lang)}"
+                return f"Please answer all questions before submitting.\n{self.get_summary(lang)}"
+            self.save_responses(session_id)
+            self.state.completed = True
+            self.state.current_index += 1
+            if lang == 'ur':
+                return "سروے کامیابی سے جمع ہو گیا ہے۔ آپ کے وقت کا شکریہ!"
+            return "Survey submitted successfully. Thank you for your time!"
+
+        if kind == "change_answer":
+            target_qid = intent.get("question_id")
+            if not target_qid:
+                return None
+            if not 1 <= target_qid <= min(self.state.max_index + 1, len(self.state.questions)):
+                return NOT_REACHED_PROMPT["en"] if lang == "en" else NOT_REACHED_PROMPT["ur"]
+            self.state.current_index = target_qid - 1
+            target = self.state.current_question()
+            if lang == 'ur':
+                return f"سوال نمبر {target_qid} کے لیے آپ کا نیا جواب کیا ہے؟\n{question_prompt_text(target, lang)}"
+            return f"What is your new answer for question {target_qid}?\n{question_prompt_text(target, lang)}"
+
+        if question is None:
+            # Survey finished: repeat / options have nothing to point at.
+            if lang == 'ur':
+                return f"سروے مکمل ہو گیا ہے۔ آپ کے جوابات یہ ہیں:\n{self.get_summary(lang)}"
+            return f"The survey is complete. Here are your answers:\n{self.get_summary(lang)}"
+
+        if kind == "repeat_question":
+            if lang == 'ur':
+                return f"جی بالکل، میں دوبارہ دہرا دیتا ہوں:\n{question_prompt_text(question, lang)}"
+            return f"Sure, I'll repeat:\n{question_prompt_text(question, lang)}"
+
+        if kind == "list_options":
+            opts = question.options
+            if opts is not None:
+                if lang == 'ur':
+                    return f"آپ کے پاس یہ آپشنز ہیں: {opts}"
+                return f"The options are: {opts}."
+            if lang == 'ur':
+                return "کوئی مخصوص آپشنز نہیں ہیں۔ یہ ایک آزادانہ سوال ہے۔"
+            return "No specific options. This is an open-ended question."
+
+        return None
+
+    def build_system_prompt(self) -> str:
         # 2. Gather State Information for the LLM
         current_q = self.state.current_question()
         expected_lang = self.state.language
@@ -679,9 +1264,9 @@ class SurveyOrchestrator:
             # We are DURING the survey
             q_context = f"""
             CURRENT QUESTION:
-            - ID: {current_q['id']}
-            - Text: {current_q['question']}
-            - Options: {current_q.get('options_list', 'Open-ended')}
+            - ID: {current_q.id}
+            - Text: {current_q.text}
+            - Options: {list(current_q.options_list) or 'Open-ended'}
             """
 
             if self.state.current_index < self.state.max_index:
@@ -690,14 +1275,14 @@ class SurveyOrchestrator:
                     next_context = "NEXT STEP: You have already finished all questions. After acknowledging this change, show the SUMMARY and ask to SUBMIT."
                 else:
                     # User is mid-survey and went back.
-                    resumed_q = self.state.questions.iloc[self.state.max_index]
-                    next_context = f"NEXT STEP: After this change, you will resume from Question {self.state.max_index + 1}: {resumed_q['question']}"
+                    resumed_q = self.state.questions[self.state.max_index]
+                    next_context = f"NEXT STEP: After this change, you will resume from Question {self.state.max_index + 1}: {resumed_q.text}"
             else:
                 # Normal flow (no editing)
                 next_idx = self.state.current_index + 1
                 if next_idx < total_q:
-                    next_q = self.state.questions.iloc[next_idx]
-                    next_context = f"NEXT QUESTION: Question {next_idx + 1}: {next_q['question']} Options: {next_q.get('options_list', '')}"
+                    next_q = self.state.questions[next_idx]
+                    next_context = f"NEXT QUESTION: Question {next_idx + 1}: {next_q.text} Options: {list(next_q.options_list)}"
                 else:
                     next_context = "NEXT STEP: This was the last question. Provide the SUMMARY and ask to SUBMIT."
         else:
@@ -734,24 +1319,14 @@ class SurveyOrchestrator:
         7. SUBMITTING: If they ask to submit but haven't finished, politely tell them they must finish the questions first. and if finished then say goodbye greetings.
         8. RESPOND IN SELECTED LANGUAGE: Your 'reply_to_speak' MUST ALWAYS be in {expected_lang}.
         """
-        
+        return system_prompt
 
-        # 4. Call the OpenAI Agent (Forcing it to use our Omni-Tool)
-        response = client.chat.completions.create(
-            model="gpt-4o",
-            messages=[
-                {"role": "system", "content": system_prompt},
-                {"role": "user", "content": user_text}
-            ],
-            tools=survey_tools,
-            tool_choice={"type": "function", "function": {"name": "execute_survey_action"}}, # Forces structured JSON output
-            temperature=0.2 # Keep it focused
-        )
+    async def apply_action(self, args: Dict[str, Any], user_text: str, session_id: str) -> str:
+        """Applies the agent's decision to the session state and returns the reply to speak."""
+        current_q = self.state.current_question()
+        expected_lang = self.state.language
+        total_q = len(self.state.questions)
 
-        # 5. Extract the AI's Decisions
-        tool_call = response.choices[0].message.tool_calls[0]
-        args = json.loads(tool_call.function.arguments)
-        
         intent = args.get("intent")
         mapped_answer = args.get("mapped_answer")
         target_qid = args.get("target_question_id")
@@ -764,39 +1339,8 @@ class SurveyOrchestrator:
             return reply_to_speak
     
         # 6. Update Your Database/State based on the Agent's intent
-        if intent == "answer" and mapped_answer != "NO_MATCH":
-            qid = int(current_q["id"])
-            self.state.responses[qid] = mapped_answer
-            print(f"question: {qid} c: {self.state.current_index} m: {self.state.max_index}")
-            # Advance the state
-            # if self.state.current_index == self.state.max_index:
-            #     self.state.max_index += 1
-            # self.state.current_index += 1
-            
-            
-            # If answering the LATEST question (normal flow)
-            if self.state.current_index == self.state.max_index:
-                self.state.current_index += 1
-                self.state.max_index += 1
-            else:
-                # If answering a CHANGED question (jump back to bookmark)
-                self.state.current_index = self.state.max_index
-            print(f"question: {qid} c: {self.state.current_index} m: {self.state.max_index}")
-            
-            # Completion check
-            if self.state.max_index >= total_q:
-                print(f"q complete triggered")
-                self.state.q_completed = True
-            
-            
-            
-            # if self.state.q_completed:
-            #     self.state.current_index = total_q
-            
-            # self.state.max_index +=1
-            # self.state.current_index = self.state.max_index
-            # if self.state.max_index == len(self.state.questions):
-            #     self.state.q_completed = True
+        if intent == "answer" and mapped_answer != "NO_MATCH" and current_q is not None:
+            self.record_answer(current_q, mapped_answer)
 
         elif intent == "change_answer" and target_qid:
             print(f"change triggered for and at: {self.state.current_index}  {self.state.max_index}" )
@@ -806,7 +1350,7 @@ class SurveyOrchestrator:
                     self.state.current_index = target_qid - 1
                 # self.state.max_index -=1
             else:
-                return "You haven't reached that question yet." if expected_lang == "en" else "آپ ابھی اس سوال تک نہیں پہنچے۔" 
+                return NOT_REACHED_PROMPT["en"] if expected_lang == "en" else NOT_REACHED_PROMPT["ur"]
 
         elif intent == "submit" and self.state.is_done():
             self.save_responses(session_id)
@@ -814,83 +1358,149 @@ class SurveyOrchestrator:
             self.state.current_index += 1
 
         elif intent == "summary":
-            fresh_summary = self.get_summary(expected_lang)
-        
-            prompt = f"""
-            You are voice survey assistant
-            The user asked for a summary. Read the following summary and ask them if they want to change anything or submit: {fresh_summary}
-            Always respond in {expected_lang}
-            """
-            
-            response = client.chat.completions.create(
-                model="gpt-4o",
-                messages=[{"role": "system", "content": prompt}, {"role": "user", "content": user_text}],
+            response = await PROVIDER.chat(
+                model=AGENT_MODEL,
+                messages=self.summary_messages(user_text),
                 temperature=0.3
             )
     
-            return response.choices[0].message.content
+            return response.content
 
         # 7. Return the dynamically translated text back to your TTS!
         return reply_to_speak
+
+    def record_answer(self, current_q, mapped_answer: str):
+        """Stores an answer for the current question and advances (or returns to the bookmark)."""
+        total_q = len(self.state.questions)
+        qid = current_q.id
+        self.state.responses[qid] = mapped_answer
+        print(f"question: {qid} c: {self.state.current_index} m: {self.state.max_index}")
+        # Advance the state
+        # if self.state.current_index == self.state.max_index:
+        #     self.state.max_index += 1
+        # self.state.current_index += 1
+        
+        
+        # If answering the LATEST question (normal flow)
+        if self.state.current_index == self.state.max_index:
+            self.state.current_index += 1
+            self.state.max_index += 1
+        else:
+            # If answering a CHANGED question (jump back to bookmark)
+            self.state.current_index = self.state.max_index
+        print(f"question: {qid} c: {self.state.current_index} m: {self.state.max_index}")
+        
+        # Completion check
+        if self.state.max_index >= total_q:
+            print(f"q complete triggered")
+            self.state.q_completed = True
+        
+        
+        
+        # if self.state.q_completed:
+        #     self.state.current_index = total_q
+        
+        # self.state.max_index +=1
+        # self.state.current_index = self.state.max_index
+        # if self.state.max_index == len(self.state.questions):
+        #     self.state.q_completed = True
+
+    def summary_messages(self, user_text: str) -> List[Dict[str, str]]:
+        expected_lang = self.state.language
+        fresh_summary = self.get_summary(expected_lang)
+    
+        prompt = f"""
+            You are voice survey assistant
+            The user asked for a summary. Read the following summary and ask them if they want to change anything or submit: {fresh_summary}
+            Always respond in {expected_lang}
+            """
+        return [{"role": "system", "content": prompt}, {"role": "user", "content": user_text}]
     
     
     def get_summary(self, detected_language: str) -> str:
         if detected_language == 'en':
             lines = ["Here is a summary of your responses:\n"]
-            for _, row in self.state.questions.iterrows():
-                qid = int(row["id"])
-                ans = self.state.responses.get(qid, "Not answered")
-                lines.append(f"Question {qid}: {ans}")
+            for q in self.state.questions:
+                ans = self.state.responses.answer_at(q.position, "Not answered")
+                lines.append(f"Question {q.id}: {ans}")
             return " \n".join(lines)
         if detected_language == 'ur':
             lines = ["آپ کے جوابات کا خلاصہ یہ ہے:\n"]
-            for _, row in self.state.questions.iterrows():
-                qid = int(row["id"])
-                ans = self.state.responses.get(qid, "جواب نہیں دیا گیا")
-                lines.append(f"سوال نمبر {qid}: {ans}")
+            for q in self.state.questions:
+                ans = localized_text(self.state.responses.answer_at(q.position, "جواب نہیں دیا گیا"), detected_language)
+                lines.append(f"سوال نمبر {q.id}: {ans}")
             return " \n".join(lines)
 
 
 
-    def save_responses_csv(self, session_id: str):
+    def persist_responses(self, session_id: str):
+        """Queues the answers for the response writer; the future resolves once they are committed."""
         data = []
-        for _, row in self.state.questions.iterrows():
-            qid = int(row["id"])
+        for q in self.state.questions:
             data.append({
                 "session_id": session_id,
-                "question": row["question"],
-                "answer": self.state.responses.get(qid, "Not answered"),
+                "question": q.text,
+                "answer": self.state.responses.answer_at(q.position, "Not answered"),
                 "timestamp": time.time()
             })
-        
-        df = pd.DataFrame(data)
-        
-        # Check if file exists to decide on writing the header
-        file_exists = os.path.isfile(RESPONSES_FILE)
-        
-        df.to_csv(
-            RESPONSES_FILE, 
-            mode='a',           # 'a' stands for Append
-            index=False, 
-            header=not file_exists  # Only write header if the file is new
-        )
+        return RESPONSE_STORE.submit(data)
+
     def save_responses(self, session_id: str):
+        """Builds the /session_summary rows; save_orchestrator stores them with the turn's state."""
         data = []
 
-        for _, row in self.state.questions.iterrows():
-            qid = int(row["id"])
+        for q in self.state.questions:
             data.append({
-                "question_id": qid,
-                "question_text": row["question"],
-                "user_answer": self.state.responses.get(qid, "Not answered"),
+                "question_id": q.id,
+                "question_text": q.text,
+                "user_answer": self.state.responses.answer_at(q.position, "Not answered"),
                 "timestamp": time.time()
             })
 
-        SESSION_STORE[session_id] = data
+        self.summary_rows = data
 
 # --- FastAPI App ---
 
-app = FastAPI()
+# Startup warm-up: each step runs in a thread after the worker starts serving;
+# /ready reports 200 once all of them are done.
+WARMUP_STEPS = {
+    "employees": EMPLOYEES.load,
+    "provider": PROVIDER.warm,
+    "embedder": lambda: EMBEDDER.embed(["warm up"]),
+    "legacy_responses": import_legacy_responses,
+    "audio_preprocess": AUDIO_PREPROCESSOR.warm,
+}
+WARMUP: Dict[str, str] = {name: "pending" for name in WARMUP_STEPS}
+
+
+async def warm_up():
+    for name, step in WARMUP_STEPS.items():
+        start = time.perf_counter()
+        try:
+            await asyncio.to_thread(step)
+            WARMUP[name] = "ready"
+        except Exception as e:
+            WARMUP[name] = f"failed: {e}"
+        print(f"⏳ [TIMER] Warm-up {name}: {WARMUP[name]} in {time.perf_counter() - start:.2f} seconds")
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    run_in_background(sweep_periodically(STORES, STORE_SWEEP_SECONDS))
+    run_in_background(warm_up())
+    run_in_background(poll_for_changes(EMPLOYEES, EMPLOYEE_RELOAD_SECONDS))
+    yield
+    for task in list(BACKGROUND_TASKS):
+        task.cancel()
+    # Commit every queued submit before the worker exits
+    await asyncio.to_thread(close_response_store)
+    SPEECH_PREFETCHER.close()
+    TRANSLATIONS.close()
+    SESSION_BACKEND.close()
+    AUDIO_PREPROCESSOR.close()
+
+
+app = FastAPI(lifespan=lifespan)
 
 # Enable CORS
 app.add_middleware(
@@ -899,35 +1509,258 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor", "X-Export-Watermark"],
 )
 
-# Global session storage (In-memory for this example)
-SESSION_STORE = {}
-SESSIONS: Dict[str, SurveyOrchestrator] = {}
-SURVEYS: dict[str, pd.DataFrame] = {}
-TTS_STORE = {}
+def store_from_env(name: str, ttl_seconds: int, max_entries: int, max_mb: int, **kwargs) -> TTLStore:
+    """TTLStore whose limits can be overridden with <NAME>_TTL_SECONDS, <NAME>_MAX_ENTRIES and <NAME>_MAX_MB."""
+    prefix = name.upper()
+    return TTLStore(
+        name,
+        ttl_seconds=int(os.getenv(f"{prefix}_TTL_SECONDS", str(ttl_seconds))),
+        max_entries=int(os.getenv(f"{prefix}_MAX_ENTRIES", str(max_entries))),
+        max_bytes=int(os.getenv(f"{prefix}_MAX_MB", str(max_mb))) * 1024 * 1024,
+        **kwargs,
+    )
+
+
+def forget_survey(survey_id: str, survey: CompiledSurvey, reason: str):
+    """Drops per-survey caches when a survey leaves the store."""
+    PRERENDER_JOBS.pop(survey_id, None)
+    LOCALIZATION_JOBS.pop(survey_id, None)
+    for key in [k for k in INTRO_CACHE if k[0] == survey_id]:
+        INTRO_CACHE.pop(key, None)
+    print(f"Survey {survey_id} {reason}")
+
+
+# Global session storage, shared by all workers: SESSION_BACKEND=memory (single process,
+# bounded: per-kind TTL, entry and memory limits, LRU eviction) or sqlite:///path/sessions.db.
+# Sessions are JSON snapshots with a version; surveys, TTS texts and results are JSON values.
+SESSION_BACKEND = make_session_backend(os.getenv("SESSION_BACKEND", "memory"), {
+    # Sessions expire after an hour without a turn
+    "sessions": store_from_env("sessions", ttl_seconds=3600, max_entries=10000, max_mb=256, sliding=True),
+    "surveys": store_from_env("surveys", ttl_seconds=7 * 24 * 3600, max_entries=1000, max_mb=256, sliding=True),
+    # Reply texts waiting for the client to fetch /tts/{tts_id}
+    "tts": store_from_env("tts_store", ttl_seconds=600, max_entries=50000, max_mb=64),
+    # Submitted results for /session_summary
+    "results": store_from_env("session_store", ttl_seconds=24 * 3600, max_entries=10000, max_mb=128),
+})
+TTS_STORE = SESSION_BACKEND.kind("tts")
+SESSION_STORE = SESSION_BACKEND.kind("results")
+# This worker's compiled copies of the surveys in the backend
+SURVEYS: TTLStore = store_from_env("survey_cache", ttl_seconds=24 * 3600, max_entries=1000, max_mb=256, sliding=True, on_evict=forget_survey)
+STORES = [SESSION_BACKEND, SURVEYS]
+STORE_SWEEP_SECONDS = float(os.getenv("STORE_SWEEP_SECONDS", "30"))
+PRERENDER_JOBS: Dict[str, Dict[str, Any]] = {}
+# Upload-time localization per survey; the result is {language: counts or error}
+LOCALIZATION_JOBS: Dict[str, "asyncio.Task[Dict[str, Any]]"] = {}
+BACKGROUND_TASKS = set()
+
+
+async def get_survey(survey_id: str) -> Optional[CompiledSurvey]:
+    """Compiled survey from this worker's cache, or compiled from the shared backend."""
+    survey = SURVEYS.get(survey_id)
+    if survey is None:
+        rows = await SESSION_BACKEND.run(SESSION_BACKEND.get, "surveys", survey_id)
+        if rows is None:
+            return None
+        survey = compile_survey(rows, EMBEDDER)
+        # Localized on the worker that took the upload; the translations are on disk
+        texts = localization_texts(survey)
+        for language in SUPPORTED_LANGUAGES:
+            if language != SOURCE_LANGUAGE:
+                await TRANSLATIONS.load(texts, translation_key(language))
+        survey = with_localized_aliases(survey)
+        SURVEYS[survey_id] = survey
+    return survey
+
 
-emb_model = None  # global reference
+async def load_orchestrator(session_id: str) -> Optional[SurveyOrchestrator]:
+    """Rebuilds the session from its latest snapshot (any worker may have handled the last turn)."""
+    loaded = await SESSION_BACKEND.run(SESSION_BACKEND.load_session, session_id)
+    if loaded is None:
+        return None
+    snapshot, version = loaded
+    survey = await get_survey(snapshot["survey_id"])
+    if survey is None:
+        return None
+    return SurveyOrchestrator(SurveyState.from_snapshot(snapshot, survey), version)
 
-# @app.on_event("startup")
-# async def load_embedding_model():
-#     global emb_model
-#     print("Loading embedding model...")
-#     emb_model = SentenceTransformer("paraphrase-multilingual-MiniLM-L12-v2")
-#     print("Embedding model loaded.")
+
+async def save_orchestrator(session_id: str, orchestrator: SurveyOrchestrator):
+    """Saves the turn's state; raises VersionConflict if another turn saved the session first."""
+    snapshot, summary_rows = orchestrator.state.snapshot(), orchestrator.summary_rows
+
+    def save() -> int:
+        version = SESSION_BACKEND.save_session(session_id, snapshot, orchestrator.version)
+        if summary_rows is not None:
+            SESSION_STORE.put(session_id, summary_rows)
+        return version
+
+    orchestrator.version = await SESSION_BACKEND.run(save)
+    orchestrator.summary_rows = None
+
+
+SESSION_CONFLICT_DETAIL = "Session was updated by another request; please retry"
+
+# Embedding model is selected with EMBEDDER (see embeddings.get_embedder)
 
 @app.get("/")
 def read_root():
     return {"message": "Voice Survey API is running"}
 
+@app.get("/stats")
+async def get_stats():
+    """Runtime counters for caches and fast paths."""
+    return {
+        "stores": {"backend": SESSION_BACKEND.name, **await SESSION_BACKEND.run(SESSION_BACKEND.stats), "survey_cache": SURVEYS.stats()},
+        "tts_cache": TTS_CACHE.stats(),
+        "tts_prefetch": SPEECH_PREFETCHER.stats(),
+        "localization": await asyncio.to_thread(LOCALIZER.stats),
+        "intent_fast_path": FAST_PATH_STATS.snapshot(),
+        "employees": EMPLOYEES.stats(),
+        "audio_preprocess": AUDIO_PREPROCESSOR.stats(),
+        "provider": PROVIDER.stats(),
+    }
+
+
+@app.get("/ready")
+async def ready():
+    """Readiness probe: 200 once the startup warm-up has loaded everything, 503 until then."""
+    is_ready = all(status == "ready" for status in WARMUP.values())
+    return JSONResponse({"ready": is_ready, "warmup": WARMUP}, status_code=200 if is_ready else 503)
+
+
+@app.get("/metrics")
+async def metrics():
+    """Per-stage turn latency histograms (stage, model, language) in the Prometheus text format."""
+    return Response(content=REGISTRY.render(), media_type=METRICS_CONTENT_TYPE)
+
+def run_in_background(coro):
+    """Schedules a coroutine on the loop and keeps a reference so it isn't garbage collected."""
+    task = asyncio.create_task(coro)
+    BACKGROUND_TASKS.add(task)
+    task.add_done_callback(BACKGROUND_TASKS.discard)
+    return task
+
+
+def prerender_texts(survey: CompiledSurvey) -> List[str]:
+    """Every static prompt a session of this survey can speak, per supported language."""
+    texts = []
+    for language in SUPPORTED_LANGUAGES:
+        for question in survey:
+            texts.append(question_prompt_text(question, language))
+        texts.append(REPEAT_PROMPT[language])
+        texts.append(NOT_REACHED_PROMPT[language])
+        texts.append(WRONG_LANGUAGE_PROMPT[language])
+    return list(dict.fromkeys(texts))
+
+
+def localization_texts(survey: CompiledSurvey) -> List[str]:
+    """Every question text and option of the survey, in order, without repeats."""
+    texts = []
+    for question in survey:
+        texts.append(question.text)
+        texts.extend(question.options_list)
+    return list(dict.fromkeys(texts))
+
+
+def with_localized_aliases(survey: CompiledSurvey) -> CompiledSurvey:
+    """
+    A copy of the survey whose questions also match their translated options,
+    e.g. the Urdu wording a session heard. Compiled surveys are shared by
+    running sessions, so the copy replaces the original instead of changing it.
+    """
+    questions = []
+    for question in survey:
+        aliases = []
+        for language in SUPPORTED_LANGUAGES:
+            if language == SOURCE_LANGUAGE:
+                continue
+            key = translation_key(language)
+            for position, option in enumerate(question.options_list):
+                translated = TRANSLATIONS.get(option, key)
+                if translated:
+                    aliases.append((translated, position, language))
+        questions.append(question.with_aliases(aliases) if aliases else question)
+    return CompiledSurvey(questions)
+
+
+async def localize_survey(survey_id: str, survey: CompiledSurvey) -> Dict[str, Any]:
+    """Translates the survey into every other supported language: one chat call per language, none if cached."""
+    texts = localization_texts(survey)
+
+    async def localize(language):
+        try:
+            with span("localize", LOCALIZER.model, language):
+                return await LOCALIZER.localize(texts, language, translation_key(language))
+        except Exception as e:
+            # Sessions fall back to the source text
+            print(f"Localization into {language} failed for survey {survey_id}: {e}")
+            return {"error": str(e)}
+
+    languages = [language for language in SUPPORTED_LANGUAGES if language != SOURCE_LANGUAGE]
+    results = dict(zip(languages, await asyncio.gather(*(localize(language) for language in languages))))
+    # Swapped in whole; a survey that was evicted meanwhile stays gone
+    if SURVEYS.get(survey_id) is survey:
+        SURVEYS[survey_id] = with_localized_aliases(survey)
+    print(f"Localized survey {survey_id}: {results}")
+    return results
+
+
+async def wait_for_localization(survey_id: str):
+    task = LOCALIZATION_JOBS.get(survey_id)
+    if task is not None and not task.done():
+        # shield: a cancelled request must not cancel the shared job
+        await asyncio.shield(task)
+
+
+async def prerender_survey_audio(survey_id: str, survey: CompiledSurvey):
+    """Synthesizes the survey's static prompts into TTS_CACHE so sessions never wait on them."""
+    job = PRERENDER_JOBS[survey_id]
+    # The prompts are rendered in their localized form
+    await wait_for_localization(survey_id)
+    texts = prerender_texts(survey)
+    job.update(status="running", total=len(texts))
+    semaphore = asyncio.Semaphore(PRERENDER_CONCURRENCY)
+
+    async def render(text):
+        async with semaphore:
+            try:
+                await synthesize_speech(text)
+                job["done"] += 1
+            except Exception as e:
+                job["failed"] += 1
+                print(f"Pre-render failed for survey {survey_id}: {e}")
+
+    await asyncio.gather(*(render(text) for text in texts))
+    job["status"] = "done" if not job["failed"] else "partial"
+    job["finished_at"] = time.time()
+    print(f"Pre-rendered {job['done']}/{job['total']} prompts for survey {survey_id}")
+
+
+def parse_survey_csv(contents: bytes) -> CompiledSurvey:
+    import pandas as pd
+
+    df = pd.read_csv(io.StringIO(contents.decode('utf-8')))
+    # Validate and process the dataframe
+    return load_questions_from_dataframe(df)
+
+
 @app.post("/upload_survey_csv")
-async def upload_survey_csv(csv_file: UploadFile = File(...)):
+async def upload_survey_csv(csv_file: UploadFile = File(...), prerender: bool = True):
     """
     Handle CSV file upload for custom surveys
     Saves to global dataframe
     
     Required columns: id, question, options
     Options should be separated by '|' (e.g., "Option1|Option2|Option3")
+
+    Questions and options are translated into every other supported
+    language in the background (reused from the translation cache when the
+    same texts were uploaded before). With prerender=true (default) the
+    question audio for every supported language is then synthesized too;
+    poll /prerender_status/{survey_id}.
     """
     # global uploaded_questions_df
     
@@ -938,34 +1771,64 @@ async def upload_survey_csv(csv_file: UploadFile = File(...)):
         
         # Read the uploaded file
         contents = await csv_file.read()
-        df = pd.read_csv(io.StringIO(contents.decode('utf-8')))
-        
-        # Validate and process the dataframe
-        validated_df = load_questions_from_dataframe(df)
+        # Parsed in a thread: the first upload also pays for importing pandas
+        survey = await asyncio.to_thread(parse_survey_csv, contents)
         
         survey_id = str(uuid.uuid4())
-        SURVEYS[survey_id] = validated_df
+        await SESSION_BACKEND.run(SESSION_BACKEND.put, "surveys", survey_id, survey.rows())
+        SURVEYS[survey_id] = survey
+        LOCALIZATION_JOBS[survey_id] = run_in_background(localize_survey(survey_id, survey))
+        run_in_background(warm_intro_cache(survey_id, survey))
         # Save to global variable
         # questions_df = validated_df
         print("Uploaded Questions DataFrame:")
-        print(validated_df[["options", "options_list"]].head())
+        for q in survey.questions[:5]:
+            print(q)
+        if not prerender:
+            return {
+                "survey_id": survey_id
+            }
+
+        PRERENDER_JOBS[survey_id] = {"status": "pending", "total": 0, "done": 0, "failed": 0, "started_at": time.time()}
+        run_in_background(prerender_survey_audio(survey_id, survey))
         return {
-            "survey_id": survey_id
+            "survey_id": survey_id,
+            "prerender": {
+                "status": "pending",
+                "status_url": f"/prerender_status/{survey_id}"
+            }
         }
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error processing file: {str(e)}")
 
+@app.get("/prerender_status/{survey_id}")
+async def prerender_status(survey_id: str):
+    job = PRERENDER_JOBS.get(survey_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="No pre-render job for this survey")
+    localization = LOCALIZATION_JOBS.get(survey_id)
+    return {
+        "survey_id": survey_id,
+        **job,
+        "localization": localization.result() if localization is not None and localization.done() and not localization.cancelled() else "pending",
+    }
+
 # from openai import OpenAI
 
-def translate_text(text: str, target_language: str) -> str:
+async def translate_text(text: str, target_language: str) -> str:
     """
-    Translate given text into target_language.
-    Returns translated string only.
+    Translate given text into target_language (a code from LANGUAGE_NAMES or a language name).
+    Returns translated string only; translations are kept in the translation cache.
     """
+    key = translation_key(target_language)
+    cached = (await TRANSLATIONS.load([text], key)).get(text)
+    if cached is not None:
+        return cached
+    target_language = LANGUAGE_NAMES.get(target_language, target_language)
 
-    response = client.chat.completions.create(
+    response = await PROVIDER.chat(
         model="gpt-4o-mini",   # fast + cheap + multilingual
         temperature=0,        # deterministic translation
         messages=[
@@ -990,24 +1853,40 @@ IMPORTANT:
             }
         ]
     )
-    
 
-    return response.choices[0].message.content.strip()
+    translated = response.content.strip()
+    await TRANSLATIONS.put_many({text: translated}, key)
+    return translated
 
 @app.post("/start_session")
-async def start_session(survey_id: str = None, language: str = "en"):
-    if survey_id not in SURVEYS:
+async def start_session(survey_id: str = None, language: str = "en", employee_id: str = None):
+    """employee_id may be an employee id, email or phone number; without it the first employee is greeted."""
+    survey = await get_survey(survey_id) if survey_id else None
+    if survey is None:
         raise HTTPException(status_code=400, detail="Invalid survey ID")
-    questions_df = SURVEYS[survey_id]
+
+    # In a thread: before the warm-up has loaded the directory, the lookup builds its index
+    try:
+        if employee_id:
+            employee = await asyncio.to_thread(EMPLOYEES.get, employee_id)
+        else:
+            employee = await asyncio.to_thread(EMPLOYEES.first)
+    except (OSError, ValueError, csv.Error) as e:
+        raise HTTPException(status_code=503, detail=f"Employee directory unavailable: {e}")
+    if employee_id and employee is None:
+        raise HTTPException(status_code=404, detail="Employee not found")
     
+    if language != SOURCE_LANGUAGE:
+        # Only sessions started right after the upload wait here; the localized copy is cached after
+        await wait_for_localization(survey_id)
+        survey = await get_survey(survey_id) or survey
+
     session_id = str(uuid.uuid4())
-    state = SurveyState(questions_df, language=language)
+    state = SurveyState(survey, language=language, survey_id=survey_id, employee_id=employee.id if employee else None)
     orchestrator = SurveyOrchestrator(state)
-    SESSIONS[session_id] = orchestrator
-    start_g = time.perf_counter()
-    greeting_text, question_text = await generate_survey_intro(questions_df, language,full_name[0].upper(),orchestrator , int(len(state.questions)))
-    end_g = time.perf_counter()
-    print(f"⏳ [TIMER] Survey Intro Generation took: {end_g - start_g:.2f} seconds")
+    orchestrator.version = await SESSION_BACKEND.run(SESSION_BACKEND.create_session, session_id, state.snapshot())
+    with span("intro", "gpt-4o-mini", language):
+        greeting_text, question_text = await generate_survey_intro(survey, language,employee.name.upper() if employee else "",orchestrator , int(len(state.questions)), survey_id=survey_id)
     # question_tts = client.audio.speech.create(
     #     model="tts-1",
     #     voice="alloy",
@@ -1016,11 +1895,8 @@ async def start_session(survey_id: str = None, language: str = "en"):
     # question_audio = base64.b64encode(
     #     question_tts.content
     # ).decode("utf-8")
-    start_gtts = time.perf_counter()
     # question_audio = text_to_speech(question_text)
     # greeting_audio = text_to_speech(greeting_text)
-    end_gtts = time.perf_counter()
-    print(f"⏳ [TIMER] greeetings Text-to-Speech Generation took: {end_gtts - start_gtts:.2f} seconds")
     # greeting_tts = client.audio.speech.create(
     #     model="tts-1",
     #     voice="alloy",
@@ -1031,10 +1907,13 @@ async def start_session(survey_id: str = None, language: str = "en"):
     # ).decode("utf-8")
     tts_id_1 = str(uuid.uuid4())
     # tts_id_2 = str(uuid.uuid4())
-    TTS_STORE[tts_id_1] = greeting_text + question_text
+    # Stored as segments so the (pre-rendered) question clip comes straight from the cache
+    await SESSION_BACKEND.run(TTS_STORE.put, tts_id_1, [greeting_text, question_text])
     # TTS_STORE[tts_id_2] = question_text
+    prefetch_next_speech(session_id, orchestrator)
     return {
         "session_id": session_id,
+        "employee": {"id": employee.id, "name": employee.name} if employee else None,
         "total_questions": int(len(state.questions)),
         "messages": [
             {
@@ -1182,64 +2061,88 @@ async def start_session(survey_id: str = None, language: str = "en"):
     
     
 
-@app.post("/process_input")
-async def process_input(
-    session_id: str = Form(...),
-    audio: UploadFile = File(...)
-):
-    # 1. Validate Session
-    if session_id not in SESSIONS:
-        raise HTTPException(status_code=404, detail="Session not found")
-    
-    orchestrator = SESSIONS[session_id]
-    messages =[]
-    
+async def transcribe_audio(audio_bytes: bytes, filename: Optional[str], content_type: Optional[str]) -> str:
+    # Trim silence, downmix and resample locally; clips without speech never reach Whisper
+    with span("audio_preprocess"):
+        prepared = await AUDIO_PREPROCESSOR.run(audio_bytes, filename, content_type)
+    print(f"Audio preprocessing: {prepared.stats}")
+    if prepared.silent:
+        return ""
+    with span("stt", STT_MODEL):
+        return await PROVIDER.transcribe(prepared.data, prepared.filename, prepared.content_type, model=STT_MODEL)
+
+
+async def transcribe_upload(audio: UploadFile, session_id: str) -> str:
+    """Reads an uploaded clip and transcribes it with Whisper (400 on failure)."""
     try:
         # 2. Transcribe Audio using Whisper
-        start_stt = time.perf_counter()
         print(f"Transcribing audio for session: {session_id}")
         
-        audio_bytes = await audio.read()
-        transcription = client.audio.transcriptions.create(
-            model="whisper-1",
-            file=(audio.filename or "audio.webm", audio_bytes, audio.content_type or "audio/webm")
-        )
-        end_stt = time.perf_counter()
-        print(f"⏳ [TIMER] Whisper Transcription took: {end_stt - start_stt:.2f} seconds")
+        with span("upload_read"):
+            audio_bytes = await audio.read()
+        user_text = await transcribe_audio(audio_bytes, audio.filename, audio.content_type)
         
-        user_text = transcription.text.strip()
         print(f"User text: {user_text}")
+        return user_text
         
     except Exception as e:
         print("Error transcribing audio: ", e)
         raise HTTPException(status_code=400, detail=f"Audio transcription failed: {str(e)}")
 
-    # 3. Pass text to the Agent (Omni-Tool Handles Everything!)
-    start_hi = time.perf_counter()
-    
-    # Notice we no longer pass 'detected_lang' because the System Prompt handles it natively
-    agent_text = orchestrator.handle_input(user_text, session_id) 
-    
-    end_hi = time.perf_counter()
-    print(f"⏳ [TIMER] Agent handle_input took: {end_hi - start_hi:.2f} seconds")
-    print(f"Agent Reply: {agent_text}")
 
+async def build_reply_message(orchestrator: SurveyOrchestrator, agent_text: str) -> Dict[str, Any]:
+    """Stores the reply for /tts and builds the assistant message the frontend renders."""
     # 4. Store Text for TTS Streaming
     tts_id = str(uuid.uuid4())
-    TTS_STORE[tts_id] = agent_text
+    await SESSION_BACKEND.run(TTS_STORE.put, tts_id, agent_text)
     
     # 5. Build Response for the Frontend
     is_completed = orchestrator.state.completed
     qid = int(orchestrator.state.current_index)
     
-    messages.append({
+    return {
         "role": "assistant",
         "type": "question" if not is_completed else "completion",
         "question_id": qid,
         "text": agent_text,           # The perfectly formatted Urdu or English text
         "audio_url": f"/tts/{tts_id}", # Frontend will call this to play audio
         "iscomplete": is_completed
-    })
+    }
+
+
+@app.post("/process_input")
+async def process_input(
+    session_id: str = Form(...),
+    audio: UploadFile = File(...)
+):
+    # 1. Validate Session
+    orchestrator = await load_orchestrator(session_id)
+    if orchestrator is None:
+        raise HTTPException(status_code=404, detail="Session not found")
+    trace = start_trace("process_input", orchestrator.state.language)
+    
+    messages =[]
+    
+    try:
+        user_text = await transcribe_upload(audio, session_id)
+
+        # 3. Pass text to the Agent (Omni-Tool Handles Everything!)
+        # Notice we no longer pass 'detected_lang' because the System Prompt handles it natively
+        agent_text = await orchestrator.handle_input(user_text, session_id)
+        with span("session_save"):
+            await save_orchestrator(session_id, orchestrator)
+    except VersionConflict:
+        trace.finish("conflict")
+        raise HTTPException(status_code=409, detail=SESSION_CONFLICT_DETAIL)
+    except BaseException:
+        trace.finish("error")
+        raise
+
+    print(f"⏳ [TRACE] process_input took {trace.finish():.2f} seconds: {trace.summary()}")
+    print(f"Agent Reply: {agent_text}")
+
+    prefetch_next_speech(session_id, orchestrator, agent_text)
+    messages.append(await build_reply_message(orchestrator, agent_text))
 
     return {
         "messages": messages, 
@@ -1247,44 +2150,398 @@ async def process_input(
     }
 
 
+def sse_event(event: str, data: Dict[str, Any]) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
+@app.post("/process_input_stream")
+async def process_input_stream(
+    session_id: str = Form(...),
+    audio: UploadFile = File(...)
+):
+    """
+    Server-sent events version of /process_input.
+
+    Events, in order:
+      transcript  {"user_text"}
+      text        {"delta"}                 reply text as gpt-4o writes it
+      audio       {"index", "text", "audio"} base64 Ogg/Opus per sentence, in order
+      reply       {"text"}                  only if the final reply differs from
+                                            what was streamed; discard earlier
+                                            text/audio and use this instead
+      done        same body as /process_input
+    Sentences are sent to TTS as soon as they are complete, while the model
+    is still generating the rest of the reply.
+    """
+    orchestrator = await load_orchestrator(session_id)
+    if orchestrator is None:
+        raise HTTPException(status_code=404, detail="Session not found")
+    trace = start_trace("process_input_stream", orchestrator.state.language)
+
+    try:
+        user_text = await transcribe_upload(audio, session_id)
+    except BaseException:
+        trace.finish("error")
+        raise
+
+    async def events() -> AsyncIterator[str]:
+        yield sse_event("transcript", {"user_text": user_text})
+
+        sentences = SentenceBuffer()
+        audio_tasks = deque()
+        audio_index = 0
+        final_text = ""
+        replaced = False
+        tts_start = None
+        outcome = "error"
+
+        def speak(chunks):
+            nonlocal tts_start
+            for chunk in chunks:
+                tts_start = tts_start or time.perf_counter()
+                audio_tasks.append((chunk, asyncio.create_task(synthesize_speech(chunk))))
+
+        def ready_audio():
+            # Emit finished clips in order, without waiting on unfinished ones.
+            nonlocal audio_index
+            out = []
+            while audio_tasks and audio_tasks[0][1].done():
+                chunk, task = audio_tasks.popleft()
+                if audio_index == 0:
+                    trace.record("tts_first_byte", time.perf_counter() - tts_start, TTS_MODEL)
+                out.append(sse_event("audio", {
+                    "index": audio_index,
+                    "text": chunk,
+                    "audio": base64.b64encode(task.result()).decode("utf-8"),
+                }))
+                audio_index += 1
+            return out
+
+        try:
+            async for event in orchestrator.handle_input_stream(user_text, session_id):
+                if event["type"] == "delta":
+                    yield sse_event("text", {"delta": event["text"]})
+                    speak(sentences.feed(event["text"]))
+                    for message in ready_audio():
+                        yield message
+                else:
+                    final_text = event["text"]
+                    replaced = event["replaced"]
+            try:
+                with span("session_save"):
+                    await save_orchestrator(session_id, orchestrator)
+            except VersionConflict:
+                outcome = "conflict"
+                yield sse_event("error", {"status": 409, "detail": SESSION_CONFLICT_DETAIL})
+                return
+            prefetch_next_speech(session_id, orchestrator, final_text)
+
+            if replaced:
+                for _, task in audio_tasks:
+                    task.cancel()
+                audio_tasks.clear()
+                yield sse_event("reply", {"text": final_text})
+                speak(split_sentences(final_text))
+            else:
+                speak(sentences.finish())
+
+            while audio_tasks:
+                await asyncio.wait([audio_tasks[0][1]])
+                for message in ready_audio():
+                    yield message
+            if tts_start is not None:
+                trace.record("tts_total", time.perf_counter() - tts_start, TTS_MODEL)
+
+            print(f"Agent Reply: {final_text}")
+            yield sse_event("done", {
+                "messages": [await build_reply_message(orchestrator, final_text)],
+                "user_text": user_text
+            })
+            outcome = "ok"
+        finally:
+            for _, task in audio_tasks:
+                task.cancel()
+            print(f"⏳ [TRACE] process_input_stream took {trace.finish(outcome):.2f} seconds: {trace.summary()}")
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
+class VoiceSocketSpeaker:
+    """
+    Plays one reply over a WebSocket: sentences are synthesized with up to
+    TTS_PIPELINE_DEPTH in flight and sent, in order, as binary Ogg/Opus
+    frames of a single stream. cancel() stops playback immediately (barge-in).
+    """
+
+    def __init__(self, send_json, send_bytes):
+        self.send_json = send_json
+        self.send_bytes = send_bytes
+        self.joiner = OggOpusJoiner()
+        self.queue: asyncio.Queue = asyncio.Queue()
+        self.pending = deque()
+        self.started = False
+        self.cancelled = False
+        self.pump = asyncio.create_task(self._run())
+
+    def say(self, chunks: List[str]):
+        for chunk in chunks:
+            if not self.cancelled:
+                self.queue.put_nowait(chunk)
+
+    def close(self):
+        self.queue.put_nowait(None)
+
+    async def _run(self):
+        closed = False
+        start = None
+        while not closed or self.pending:
+            # Keep up to TTS_PIPELINE_DEPTH syntheses running ahead of playback.
+            while not closed and len(self.pending) < TTS_PIPELINE_DEPTH:
+                if self.pending and self.queue.empty():
+                    break
+                chunk = await self.queue.get()
+                if chunk is None:
+                    closed = True
+                    break
+                start = start or time.perf_counter()
+                self.pending.append(asyncio.create_task(synthesize_speech(chunk)))
+            if not self.pending:
+                continue
+            clip = await self.pending.popleft()
+            if not self.started:
+                self.started = True
+                observe("tts_first_byte", time.perf_counter() - start, TTS_MODEL)
+                await self.send_json({"type": "audio_start", "format": "audio/ogg"})
+            await self.send_bytes(self.joiner.feed(clip))
+        if self.started:
+            observe("tts_total", time.perf_counter() - start, TTS_MODEL)
+            await self.send_json({"type": "audio_end"})
+
+    async def wait(self):
+        await asyncio.wait([self.pump])
+        if not self.pump.cancelled() and self.pump.exception():
+            raise self.pump.exception()
+
+    async def cancel(self, notify: bool = True):
+        if self.cancelled or self.pump.done():
+            return
+        self.cancelled = True
+        self.pump.cancel()
+        for task in self.pending:
+            task.cancel()
+        self.pending.clear()
+        if self.started and notify:
+            await self.send_json({"type": "audio_cancelled"})
+
+
+@app.websocket("/ws/session/{session_id}")
+async def voice_session_socket(websocket: WebSocket, session_id: str):
+    """
+    Full-duplex voice turn loop for one session.
+
+    Client -> server:
+      binary frames               audio of the current utterance, as recorded
+      {"type": "start", "mime"}   new utterance (optional; first frame implies it)
+      {"type": "end"}             utterance finished: transcribe and answer
+      {"type": "barge_in"}        stop the reply that is playing
+    Server -> client:
+      {"type": "ready"}, {"type": "transcript"}, {"type": "text", "delta"},
+      {"type": "reply", "text"} (replace streamed text), {"type": "done", ...}
+      {"type": "audio_start"}, binary Ogg/Opus frames, {"type": "audio_end"}
+      {"type": "audio_cancelled"} after a barge-in, {"type": "error", "detail"}
+
+    Audio that starts arriving while a reply is playing cancels that reply.
+    """
+    await websocket.accept()
+    orchestrator = await load_orchestrator(session_id)
+    if orchestrator is None:
+        await websocket.send_json({"type": "error", "detail": "Session not found"})
+        await websocket.close(code=4404)
+        return
+    language = orchestrator.state.language
+
+    send_lock = asyncio.Lock()
+    turn_lock = asyncio.Lock()
+    speaker: Optional[VoiceSocketSpeaker] = None
+    turn_tasks = set()
+    utterance = bytearray()
+    mime = "audio/webm"
+
+    async def send_json(data):
+        async with send_lock:
+            await websocket.send_json(data)
+
+    async def send_bytes(data):
+        async with send_lock:
+            await websocket.send_bytes(data)
+
+    async def barge_in():
+        nonlocal speaker
+        if speaker is not None:
+            await speaker.cancel()
+            speaker = None
+
+    async def run_turn(audio_bytes: bytes, content_type: str):
+        nonlocal speaker, language
+        # Turns are applied to the session one at a time, in arrival order.
+        async with turn_lock:
+            trace = start_trace("ws", language)
+            outcome = "error"
+            try:
+                extension = content_type.split("/")[-1].split(";")[0] or "webm"
+                user_text = await transcribe_audio(audio_bytes, f"audio.{extension}", content_type)
+                await send_json({"type": "transcript", "user_text": user_text})
+
+                # Reload per turn: HTTP requests to other workers may have changed the session
+                orchestrator = await load_orchestrator(session_id)
+                if orchestrator is None:
+                    await send_json({"type": "error", "detail": "Session not found"})
+                    return
+                language = trace.language = orchestrator.state.language
+
+                turn_speaker = VoiceSocketSpeaker(send_json, send_bytes)
+                speaker = turn_speaker
+                sentences = SentenceBuffer()
+                final_text, replaced = "", False
+                async for event in orchestrator.handle_input_stream(user_text, session_id):
+                    if event["type"] == "delta":
+                        await send_json({"type": "text", "delta": event["text"]})
+                        turn_speaker.say(sentences.feed(event["text"]))
+                    else:
+                        final_text, replaced = event["text"], event["replaced"]
+                try:
+                    with span("session_save"):
+                        await save_orchestrator(session_id, orchestrator)
+                except VersionConflict:
+                    outcome = "conflict"
+                    await turn_speaker.cancel()
+                    await send_json({"type": "error", "status": 409, "detail": SESSION_CONFLICT_DETAIL})
+                    return
+                prefetch_next_speech(session_id, orchestrator, final_text)
+
+                if replaced:
+                    await turn_speaker.cancel()
+                    await send_json({"type": "reply", "text": final_text})
+                    turn_speaker = VoiceSocketSpeaker(send_json, send_bytes)
+                    speaker = turn_speaker
+                    turn_speaker.say(split_sentences(final_text))
+                else:
+                    turn_speaker.say(sentences.finish())
+                turn_speaker.close()
+
+                print(f"Agent Reply: {final_text}")
+                await send_json({
+                    "type": "done",
+                    "messages": [await build_reply_message(orchestrator, final_text)],
+                    "user_text": user_text
+                })
+                await turn_speaker.wait()
+                outcome = "ok"
+            except (WebSocketDisconnect, asyncio.CancelledError):
+                outcome = "cancelled"
+                raise
+            except Exception as e:
+                print("Error in voice socket turn: ", e)
+                await send_json({"type": "error", "detail": str(e)})
+            finally:
+                print(f"⏳ [TRACE] ws turn took {trace.finish(outcome):.2f} seconds: {trace.summary()}")
+
+    def start_turn(audio_bytes: bytes, content_type: str):
+        task = asyncio.create_task(run_turn(audio_bytes, content_type))
+        turn_tasks.add(task)
+        task.add_done_callback(turn_tasks.discard)
+
+    await send_json({"type": "ready", "session_id": session_id})
+    try:
+        while True:
+            message = await websocket.receive()
+            if message["type"] == "websocket.disconnect":
+                break
+            if message.get("bytes") is not None:
+                if not utterance:
+                    # User started speaking over the reply.
+                    await barge_in()
+                utterance.extend(message["bytes"])
+                continue
+
+            try:
+                control = json.loads(message.get("text") or "{}")
+            except json.JSONDecodeError:
+                await send_json({"type": "error", "detail": "Invalid control message"})
+                continue
+
+            kind = control.get("type")
+            if kind == "start":
+                await barge_in()
+                utterance.clear()
+                mime = control.get("mime") or mime
+            elif kind == "end":
+                if utterance:
+                    start_turn(bytes(utterance), mime)
+                    utterance.clear()
+            elif kind == "barge_in":
+                await barge_in()
+            elif kind == "ping":
+                await send_json({"type": "pong"})
+    except WebSocketDisconnect:
+        pass
+    finally:
+        if speaker is not None:
+            await speaker.cancel(notify=False)
+        for task in turn_tasks:
+            task.cancel()
+
+
 @app.get("/tts/{tts_id}")
-async def stream_tts(tts_id: str):
+async def stream_tts(tts_id: str, chunked: bool = True):
     """
     The frontend will call this URL via an <audio> tag or JS Audio object.
     This streams the audio bytes directly from OpenAI to the user's speakers!
+
+    chunked=true (default) splits the reply into sentences and streams each
+    one as soon as it is synthesized; chunked=false returns the whole clip.
     """
-    text_to_speak = TTS_STORE.get(tts_id)
+    # One fetch per tts_id; unfetched ids expire with the store's TTL
+    text_to_speak = await SESSION_BACKEND.run(TTS_STORE.get, tts_id)
     
     if not text_to_speak:
         raise HTTPException(status_code=404, detail="TTS audio not found")
 
+    segments = text_to_speak if isinstance(text_to_speak, list) else [text_to_speak]
+    if chunked:
+        await SESSION_BACKEND.run(TTS_STORE.pop, tts_id, None)
+        return StreamingResponse(
+            stream_speech(speech_chunks(segments)),
+            media_type="audio/ogg"
+        )
+
     # text_to_speak = cleaned_text
-    # Generate audio
-    response = client.audio.speech.create(
-        model="tts-1",
-        voice="alloy",
-        input=text_to_speak,
-        response_format="opus"
-    )
-    del TTS_STORE[tts_id]
-    # Stream the bytes directly to the browser. 
-    # The browser will start playing the audio while it is still downloading!
-    return StreamingResponse(
-        response.iter_bytes(), 
-        media_type="audio/ogg" 
+    # Generate audio (or reuse it: greetings, question wordings and guardrail
+    # replies repeat across sessions)
+    with span("tts_total", TTS_MODEL, speech_language(segments)):
+        clips = await asyncio.gather(*(synthesize_speech(segment) for segment in segments))
+    audio_bytes = join_ogg_opus(list(clips))
+    await SESSION_BACKEND.run(TTS_STORE.pop, tts_id, None)
+    return Response(
+        content=audio_bytes,
+        media_type="audio/ogg"
     )
     
 @app.get("/summary/{session_id}")
 async def get_summary(session_id: str):
-    if session_id not in SESSIONS:
+    orchestrator = await load_orchestrator(session_id)
+    if orchestrator is None:
         raise HTTPException(status_code=404, detail="Session not found")
     
-    orchestrator = SESSIONS[session_id]
     summary_text = orchestrator.get_summary()
     
     return {
         "text": summary_text,
-        "audio": text_to_speech(summary_text)
+        "audio": await text_to_speech(summary_text)
     }
 
 from fastapi import HTTPException
@@ -1292,11 +2549,10 @@ from fastapi import HTTPException
 @app.get("/session_summary/{session_id}")
 async def get_session_summary(session_id: str):
     try:
-        if session_id not in SESSION_STORE:
+        questions_with_answers = await SESSION_BACKEND.run(SESSION_STORE.get, session_id)
+        if questions_with_answers is None:
             raise HTTPException(status_code=404, detail="Session not found")
 
-        questions_with_answers = SESSION_STORE[session_id]
-
         return {
             "session_id": session_id,
             "total_questions": len(questions_with_answers),
@@ -1311,7 +2567,7 @@ async def get_session_summary(session_id: str):
 async def submit_responses(session_id: str):
     try:
         # Get survey instance for this session
-        orchestrator = SESSIONS.get(session_id)
+        orchestrator = await load_orchestrator(session_id)
 
         if not orchestrator:
             raise HTTPException(status_code=404, detail="Session not found")
@@ -1319,44 +2575,138 @@ async def submit_responses(session_id: str):
         if not orchestrator.state.responses:
             raise HTTPException(status_code=400, detail="No responses to save")
 
-        orchestrator.save_responses_csv(session_id)
+        store = await RESPONSE_STORE.aget()
+        written = orchestrator.persist_responses(session_id)
+        SPEECH_PREFETCHER.forget(session_id)
+        if store.fsync == "always":
+            await asyncio.wrap_future(written)
 
         return {"status": "success"}
 
+    except HTTPException:
+        raise
+    except ResponseQueueFull as e:
+        raise HTTPException(status_code=503, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
     
     
+FILLED_SURVEYS_PAGE_SIZE = int(os.getenv("FILLED_SURVEYS_PAGE_SIZE", "100"))
+
+
+def parse_fields(fields: Optional[str]) -> Optional[List[str]]:
+    """"question,answer" -> ["question", "answer"]; None keeps every field."""
+    return None if fields is None else fields.split(",")
+
+
 @app.get("/filled_surveys")
-async def list_filled_surveys():
-    
-    df = pd.read_csv(RESPONSES_FILE)
-    
-    grouped = []
+async def list_filled_surveys(
+    response: Response,
+    limit: int = Query(FILLED_SURVEYS_PAGE_SIZE, ge=1, le=1000),
+    cursor: Optional[str] = None,
+    since: Optional[float] = None,
+    until: Optional[float] = None,
+    fields: Optional[str] = None,
+):
+    """
+    Filled surveys ordered by submission time, one page at a time. The next
+    page's cursor is returned in the X-Next-Cursor header (absent on the last
+    page). since/until are unix timestamps; fields projects the per-answer
+    fields, e.g. fields=question,answer.
+    """
+    try:
+        store = await RESPONSE_STORE.aget()
+        sessions, next_cursor = await asyncio.to_thread(
+            store.sessions_page, limit, cursor, since, until, parse_fields(fields)
+        )
+    except InvalidCursor:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
 
-    for session_id, group in df.groupby("session_id"):
-        responses = group[["question", "answer", "timestamp"]] \
-            .to_dict(orient="records")
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
+    return sessions
+
+
+EXPORT_CHUNK_ROWS = int(os.getenv("EXPORT_CHUNK_ROWS", "2000"))
+EXPORT_FORMATS = {"ndjson": "application/x-ndjson", "csv": "text/csv; charset=utf-8"}
+EXPORT_COLUMNS = ("id", "session_id", "question", "answer", "timestamp")
+
+
+def export_chunks(rows_iter, fmt: str):
+    """Encodes row chunks as NDJSON lines or CSV (header first), one bytes object per chunk."""
+    if fmt == "csv":
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        writer.writerow(EXPORT_COLUMNS)
+        for chunk in rows_iter:
+            writer.writerows(chunk)
+            yield buffer.getvalue().encode("utf-8")
+            buffer.seek(0)
+            buffer.truncate()
+        if buffer.tell():
+            yield buffer.getvalue().encode("utf-8")
+        return
+    for chunk in rows_iter:
+        yield "".join(
+            json.dumps(dict(zip(EXPORT_COLUMNS, row)), ensure_ascii=False) + "\n" for row in chunk
+        ).encode("utf-8")
+
+
+def gzip_chunks(chunks):
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31)  # wbits=31: gzip container
+    for chunk in chunks:
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+@app.get("/filled_surveys/export")
+async def export_filled_surveys(
+    request: Request,
+    format: str = "ndjson",
+    since: int = Query(0, ge=0),
+):
+    """
+    Streams every stored response (one row per answer) as NDJSON or CSV, in
+    commit order, a chunk at a time, so memory stays flat however large the
+    history is. Gzip-encoded when the client sends Accept-Encoding: gzip.
 
-        grouped.append({
-            "session_id": str(session_id),
-            "responses": responses
-        })
+    Incremental pulls: the X-Export-Watermark header is the id of the last row
+    included; pass it back as `since` to get only rows committed after it.
+    """
+    if format not in EXPORT_FORMATS:
+        raise HTTPException(status_code=400, detail=f"format must be one of {', '.join(EXPORT_FORMATS)}")
+
+    store = await RESPONSE_STORE.aget()
+    watermark = await asyncio.to_thread(store.export_watermark)
+    # A sync generator: Starlette pulls each chunk in the threadpool, off the event loop
+    body = export_chunks(store.iter_rows(since, watermark, EXPORT_CHUNK_ROWS), format)
+    headers = {
+        "X-Export-Watermark": str(max(since, watermark)),
+        "Content-Disposition": f'attachment; filename="filled_surveys.{format}"',
+        "Vary": "Accept-Encoding",
+    }
+    if "gzip" in request.headers.get("accept-encoding", "").lower():
+        body = gzip_chunks(body)
+        headers["Content-Encoding"] = "gzip"
 
-    return grouped
+    return StreamingResponse(body, media_type=EXPORT_FORMATS[format], headers=headers)
 
 
 @app.get("/filled_surveys/{session_id}")
-async def get_filled_survey(session_id: str):
-    df = pd.read_csv(RESPONSES_FILE)
-    session_df = df[df["session_id"].astype(str) == session_id]
+async def get_filled_survey(session_id: str, fields: Optional[str] = None):
+    try:
+        store = await RESPONSE_STORE.aget()
+        responses = await asyncio.to_thread(store.rows_for_session, session_id, parse_fields(fields))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
 
-    if session_df.empty:
+    if not responses:
         raise HTTPException(status_code=404, detail="Session not found")
 
-    responses = session_df[["question", "answer", "timestamp"]] \
-        .to_dict(orient="records")
-
     return {
         "session_id": session_id,
         "responses": responses
@@ -1372,40 +2722,23 @@ async def check_input_language(
 
     audio_bytes = await audio.read()
     
-    transcription = client.audio.transcriptions.create(
-        model="whisper-1",
-        file=(audio.filename, audio_bytes, audio.content_type),
-        # response_format="verbose_json",
-        # prompt=whisper_prompt
-    )
-
-    user_text = transcription.text.strip()
+    user_text = await transcribe_audio(audio_bytes, audio.filename, audio.content_type)
     print(f"Raw Whisper Text: {user_text}")
 
-        # 2. LINGUA LANGUAGE DETECTION
-    detected_lang_enum = detector.detect_language_of(user_text)
-    print(f"Lingua Detected: {detected_lang_enum}")
-    
-    # Map Lingua's Enum to your expected string format
-    if detected_lang_enum == Language.ENGLISH:
-        detected_lang = "en"
-    elif detected_lang_enum in [Language.URDU, Language.HINDI]:
-        # We treat Hindi script as Urdu because spoken they are identical, 
-        # and your GPT-4o agent can read Hindi script perfectly anyway.
-        detected_lang = "ur"
-    else:
-        detected_lang = "unknown"
+    # 2. LOCAL LANGUAGE DETECTION (script ranges + romanized Urdu trigrams, see language_id)
+    # Hindi script counts as Urdu: spoken they are identical, and the gpt-4o
+    # agent reads Hindi script perfectly anyway.
+    guess = identify_language(user_text)
+    print(f"Detected Language: {guess}")
+    detected_lang = guess.language
 
     # 3. STRICT LANGUAGE RESTRICTION
     expected_lang = selected_language # 'en' or 'ur'
 
-    if detected_lang != expected_lang:
+    if is_wrong_language(guess, expected_lang):
         print(f"Language Mismatch! Expected {expected_lang}, got {detected_lang}")
         
-        if expected_lang == "ur":
-            reject_msg = "براہ کرم اپنا جواب اردو میں دیں۔" # "Please answer in Urdu"
-        else:
-            reject_msg = "Please provide your answer in English."
+        reject_msg = WRONG_LANGUAGE_PROMPT["ur"] if expected_lang == "ur" else WRONG_LANGUAGE_PROMPT["en"]
             
         return {
             "messages":[{
@@ -1419,7 +2752,8 @@ async def check_input_language(
     
     return {
         "detected_language": detected_lang,
-        "is_matching": detected_lang in ["urdu", "hindi"] if selected_language == "ur" else detected_lang == selected_language,
+        "confidence": guess.confidence,
+        "is_matching": detected_lang == expected_lang,
         "user_text": user_text,
         # "converted_text": converted_text
     }
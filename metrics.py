@@ -0,0 +1,209 @@
+import bisect
+import contextlib
+import contextvars
+import threading
+import time
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
+
+# Latency metrics in the Prometheus text format, without a client library.
+# A turn is traced as spans (upload read, STT, prompt build, LLM, state
+# update, TTS...); each span is observed into the voice_stage_seconds
+# histogram labelled by stage, model and language, and GET /metrics
+# renders every registered metric.
+#
+# An observation is a bisect over the bucket bounds and two additions under
+# a lock, so tracing costs about a microsecond per span. Metrics are per
+# process: with several uvicorn workers, scrape each worker separately.
+
+# Seconds; upstream calls take 0.1-5 s, local stages well under 10 ms
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(str(value))}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _number(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+class Histogram:
+    """Cumulative-bucket histogram with a fixed set of label names."""
+
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = DEFAULT_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.bounds = tuple(sorted(buckets))
+        # label values -> [per-bucket counts (last = +Inf), sum, count]
+        self._series: Dict[Tuple[str, ...], list] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, *labelvalues: str):
+        index = bisect.bisect_left(self.bounds, value)
+        with self._lock:
+            series = self._series.get(labelvalues)
+            if series is None:
+                series = self._series[labelvalues] = [[0] * (len(self.bounds) + 1), 0.0, 0]
+            series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    def snapshot(self) -> Dict[Tuple[str, ...], Tuple[List[int], float, int]]:
+        with self._lock:
+            return {labels: (list(counts), total, count) for labels, (counts, total, count) in self._series.items()}
+
+    def render(self) -> List[str]:
+        lines = []
+        for labels, (counts, total, count) in sorted(self.snapshot().items()):
+            cumulative = 0
+            for bound, bucket_count in zip(self.bounds + (float("inf"),), counts):
+                cumulative += bucket_count
+                le = f'le="{_number(bound)}"'
+                lines.append(f"{self.name}_bucket{_labels(self.labelnames, labels, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{_labels(self.labelnames, labels)} {_number(total)}")
+            lines.append(f"{self.name}_count{_labels(self.labelnames, labels)} {count}")
+        return lines
+
+
+class Counter:
+    kind = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *labelvalues: str, amount: float = 1):
+        with self._lock:
+            self._values[labelvalues] = self._values.get(labelvalues, 0) + amount
+
+    def render(self) -> List[str]:
+        with self._lock:
+            values = sorted(self._values.items())
+        return [f"{self.name}{_labels(self.labelnames, labels)} {_number(value)}" for labels, value in values]
+
+
+class Registry:
+    def __init__(self):
+        self.metrics = []
+
+    def histogram(self, *args, **kwargs) -> Histogram:
+        metric = Histogram(*args, **kwargs)
+        self.metrics.append(metric)
+        return metric
+
+    def counter(self, *args, **kwargs) -> Counter:
+        metric = Counter(*args, **kwargs)
+        self.metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        lines = []
+        for metric in self.metrics:
+            lines.append(f"# HELP {metric.name} {metric.documentation}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+STAGE_SECONDS = REGISTRY.histogram(
+    "voice_stage_seconds", "Time spent in one stage of a voice turn.", ("stage", "model", "language"),
+)
+TURN_SECONDS = REGISTRY.histogram(
+    "voice_turn_seconds", "Server time of a whole voice turn, audio upload to reply.", ("endpoint", "language"),
+)
+TURNS = REGISTRY.counter(
+    "voice_turns_total", "Voice turns handled, by how they ended.", ("endpoint", "language", "outcome"),
+)
+
+# Stage labels for work done by the app itself rather than a model
+APP_MODEL = "app"
+UNKNOWN_LANGUAGE = "unknown"
+
+
+class Trace:
+    """The spans of one turn. Each finished span is observed into STAGE_SECONDS right away."""
+
+    __slots__ = ("endpoint", "language", "spans", "start")
+
+    def __init__(self, endpoint: str, language: str = UNKNOWN_LANGUAGE):
+        self.endpoint = endpoint
+        self.language = language
+        self.spans: List[Tuple[str, str, float]] = []
+        self.start = time.perf_counter()
+
+    def record(self, stage: str, seconds: float, model: str = APP_MODEL):
+        self.spans.append((stage, model, seconds))
+        STAGE_SECONDS.observe(seconds, stage, model, self.language)
+
+    @contextlib.contextmanager
+    def span(self, stage: str, model: str = APP_MODEL) -> Iterator[None]:
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(stage, time.perf_counter() - start, model)
+
+    def finish(self, outcome: str = "ok") -> float:
+        seconds = time.perf_counter() - self.start
+        TURN_SECONDS.observe(seconds, self.endpoint, self.language)
+        TURNS.inc(self.endpoint, self.language, outcome)
+        return seconds
+
+    def summary(self) -> str:
+        return " ".join(f"{stage}={seconds:.2f}s" for stage, _, seconds in self.spans)
+
+
+# The trace of the turn being handled by the current task (set by the endpoint)
+_CURRENT: contextvars.ContextVar[Optional[Trace]] = contextvars.ContextVar("voice_trace", default=None)
+
+
+def start_trace(endpoint: str, language: str = UNKNOWN_LANGUAGE) -> Trace:
+    trace = Trace(endpoint, language)
+    _CURRENT.set(trace)
+    return trace
+
+
+def current_trace() -> Optional[Trace]:
+    return _CURRENT.get()
+
+
+@contextlib.contextmanager
+def span(stage: str, model: str = APP_MODEL, language: Optional[str] = None) -> Iterator[None]:
+    """Times a stage into the current turn's trace, or straight into STAGE_SECONDS outside a turn."""
+    trace = _CURRENT.get()
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        seconds = time.perf_counter() - start
+        if trace is not None:
+            trace.record(stage, seconds, model)
+        else:
+            STAGE_SECONDS.observe(seconds, stage, model, language or UNKNOWN_LANGUAGE)
+
+
+def observe(stage: str, seconds: float, model: str = APP_MODEL, language: Optional[str] = None):
+    """Records an already measured stage (e.g. time to first byte of a stream)."""
+    trace = _CURRENT.get()
+    if trace is not None:
+        trace.record(stage, seconds, model)
+    else:
+        STAGE_SECONDS.observe(seconds, stage, model, language or UNKNOWN_LANGUAGE)
@@ -0,0 +1,162 @@
+import struct
+from typing import Iterator, List, Tuple
+
+# Ogg page header: capture pattern, version, header type, granule position,
+# bitstream serial, page sequence number, CRC, segment count.
+_PAGE_HEADER = struct.Struct("<4sBBqIIIB")
+
+_FLAG_CONTINUED = 0x01
+_FLAG_BOS = 0x02
+_FLAG_EOS = 0x04
+
+
+def _make_crc_table() -> List[int]:
+    table = []
+    for i in range(256):
+        r = i << 24
+        for _ in range(8):
+            r = ((r << 1) ^ 0x04C11DB7) if r & 0x80000000 else (r << 1)
+        table.append(r & 0xFFFFFFFF)
+    return table
+
+
+_CRC_TABLE = _make_crc_table()
+
+
+def ogg_crc(data: bytes) -> int:
+    crc = 0
+    for b in data:
+        crc = ((crc << 8) & 0xFFFFFFFF) ^ _CRC_TABLE[((crc >> 24) & 0xFF) ^ b]
+    return crc
+
+
+def iter_pages(data: bytes) -> Iterator[Tuple[int, int, int, bytes, bytes]]:
+    """Yields (header_type, granule, serial, lacing, body) for every page in an Ogg stream."""
+    pos = 0
+    size = len(data)
+    while pos + _PAGE_HEADER.size <= size:
+        magic, _version, header_type, granule, serial, _seqno, _crc, nsegs = _PAGE_HEADER.unpack_from(data, pos)
+        if magic != b"OggS":
+            raise ValueError("Not an Ogg page")
+        seg_start = pos + _PAGE_HEADER.size
+        lacing = data[seg_start:seg_start + nsegs]
+        body_start = seg_start + nsegs
+        body_end = body_start + sum(lacing)
+        yield header_type, granule, serial, lacing, data[body_start:body_end]
+        pos = body_end
+
+
+def encode_page(header_type: int, granule: int, serial: int, seqno: int, lacing: bytes, body: bytes) -> bytes:
+    header = _PAGE_HEADER.pack(b"OggS", 0, header_type, granule, serial, seqno, 0, len(lacing))
+    page = bytearray(header + lacing + body)
+    struct.pack_into("<I", page, 22, ogg_crc(page))
+    return bytes(page)
+
+
+def opus_packet_samples(packet: bytes) -> int:
+    """Duration of an Opus packet in 48 kHz samples, from its TOC byte (RFC 6716, 3.1)."""
+    if not packet:
+        return 0
+    config = packet[0] >> 3
+    if config < 12:  # SILK: 10/20/40/60 ms
+        frame = (480, 960, 1920, 2880)[config % 4]
+    elif config < 16:  # hybrid: 10/20 ms
+        frame = (480, 960)[config % 2]
+    else:  # CELT: 2.5/5/10/20 ms
+        frame = (120, 240, 480, 960)[config % 4]
+    code = packet[0] & 0x03
+    if code == 0:
+        frames = 1
+    elif code < 3:
+        frames = 2
+    else:
+        frames = packet[1] & 0x3F if len(packet) > 1 else 0
+    return frame * frames
+
+
+def opus_pre_skip(head: bytes) -> int:
+    """Pre-skip (encoder priming samples) from an OpusHead packet, 0 if it isn't one."""
+    if not head.startswith(b"OpusHead") or len(head) < 12:
+        return 0
+    return struct.unpack_from("<H", head, 10)[0]
+
+
+def _drop_leading_packets(lacing: bytes, body: bytes, samples: int) -> Tuple[bytes, bytes, int]:
+    """Drops whole packets from the start of a page until `samples` are covered; returns (lacing, body, dropped)."""
+    seg = pos = dropped = 0
+    while dropped < samples:
+        end = seg
+        while end < len(lacing) and lacing[end] == 255:
+            end += 1
+        if end == len(lacing):
+            # Nothing left, or the packet continues on the next page: keep it
+            break
+        size = sum(lacing[seg:end + 1])
+        dropped += opus_packet_samples(body[pos:pos + size])
+        seg, pos = end + 1, pos + size
+    return lacing[seg:], body[pos:], dropped
+
+
+class OggOpusJoiner:
+    """
+    Splices independently synthesized Ogg/Opus clips into one logical stream.
+
+    The first clip is passed through with its OpusHead/OpusTags headers.
+    Later clips drop their own header pages and have their pages rewritten
+    onto the first clip's serial number, with continuous page sequence
+    numbers and granule positions, so players see a single continuous
+    stream instead of a chained one. Non-Ogg input is passed through as-is.
+
+    Only the stream's own pre-skip is discarded by the decoder, so the
+    encoder priming samples at the start of every later clip would play as
+    a click at the splice. The packets covering a later clip's pre-skip
+    (usually its first 20 ms packet) are dropped instead, and its granule
+    positions rebased by the samples removed.
+    """
+
+    def __init__(self):
+        self.serial = None
+        self.seqno = 0
+        self.granule_offset = 0
+
+    def feed(self, clip: bytes) -> bytes:
+        if not clip.startswith(b"OggS"):
+            return clip
+
+        out = bytearray()
+        first_clip = self.serial is None
+        last_granule = 0
+        pre_skip = None
+        dropped = 0
+        for header_type, granule, serial, lacing, body in iter_pages(clip):
+            if self.serial is None:
+                self.serial = serial
+            # Header pages (OpusHead / OpusTags) always carry granule 0.
+            if granule == 0 and not first_clip:
+                if pre_skip is None:
+                    pre_skip = opus_pre_skip(body)
+                continue
+            if pre_skip:
+                # First audio page of a later clip: trim the priming samples
+                if not header_type & _FLAG_CONTINUED:
+                    lacing, body, dropped = _drop_leading_packets(lacing, body, pre_skip)
+                pre_skip = 0
+                if not lacing:
+                    continue
+            # More clips may follow, so never mark end-of-stream.
+            header_type &= ~_FLAG_EOS
+            if not first_clip:
+                header_type &= ~_FLAG_BOS
+            if granule > 0:
+                last_granule = granule
+                granule += self.granule_offset - dropped
+            out += encode_page(header_type, granule, self.serial, self.seqno, lacing, body)
+            self.seqno += 1
+
+        self.granule_offset += last_granule - dropped
+        return bytes(out)
+
+
+def join_ogg_opus(clips: List[bytes]) -> bytes:
+    joiner = OggOpusJoiner()
+    return b"".join(joiner.feed(clip) for clip in clips)
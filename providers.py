@@ -0,0 +1,360 @@
+import asyncio
+import json
+import math
+import os
+import random
+import struct
+import zlib
+from typing import Any, AsyncIterator, Callable, Dict, List, NamedTuple, Optional
+
+from lazy import LazyProxy
+from ogg import encode_page
+
+# Upstream speech/LLM services behind one interface: speech-to-text,
+# chat (with tool calling, streamed or not), single-prompt generation and
+# text-to-speech. main.py only talks to a Provider, so the pipeline can run
+# against OpenAI or against FakeProvider, an in-process stand-in with
+# configurable latency and canned outputs for offline profiling and load
+# tests. PROVIDER=openai|fake selects one (see make_provider).
+
+
+class ToolCall(NamedTuple):
+    name: str
+    arguments: str  # JSON text, as the model produced it
+
+
+class ChatResult(NamedTuple):
+    content: Optional[str]
+    tool_calls: List[ToolCall]
+
+
+class ChatDelta(NamedTuple):
+    """One streamed piece: reply text and/or a fragment of tool-call arguments."""
+    content: Optional[str] = None
+    tool_arguments: Optional[str] = None
+
+
+class Provider:
+    """Interface for the upstream services; the methods mirror what main.py needs."""
+
+    name = "base"
+    # Prefix for TTS cache keys, so clips from different providers never mix
+    cache_tag = ""
+
+    async def transcribe(self, audio: bytes, filename: str, content_type: str, model: str = "whisper-1") -> str:
+        raise NotImplementedError
+
+    async def chat(self, messages: List[Dict[str, Any]], model: str, temperature: float = 0,
+                   tools: Optional[List[Dict[str, Any]]] = None, tool_choice: Any = None,
+                   json_mode: bool = False) -> ChatResult:
+        """json_mode=True asks for the reply content to be one JSON object."""
+        raise NotImplementedError
+
+    def chat_stream(self, messages: List[Dict[str, Any]], model: str, temperature: float = 0,
+                    tools: Optional[List[Dict[str, Any]]] = None, tool_choice: Any = None) -> AsyncIterator[ChatDelta]:
+        raise NotImplementedError
+
+    async def generate(self, prompt: str, model: str, temperature: float = 0) -> str:
+        """Single prompt in, text out."""
+        raise NotImplementedError
+
+    async def speech(self, text: str, model: str, voice: str, response_format: str) -> bytes:
+        raise NotImplementedError
+
+    def warm(self):
+        """Blocking set-up (client construction etc.) done before the first request."""
+
+    def stats(self) -> Dict[str, Any]:
+        return {"name": self.name}
+
+
+class OpenAIProvider(Provider):
+    """Whisper, chat completions, the Responses API and tts-1 through an AsyncOpenAI client."""
+
+    name = "openai"
+
+    def __init__(self, client):
+        self.client = client
+
+    async def transcribe(self, audio, filename, content_type, model="whisper-1"):
+        transcription = await self.client.audio.transcriptions.create(
+            model=model,
+            file=(filename, audio, content_type)
+        )
+        return transcription.text.strip()
+
+    async def chat(self, messages, model, temperature=0, tools=None, tool_choice=None, json_mode=False):
+        extra = {"tools": tools, "tool_choice": tool_choice} if tools else {}
+        if json_mode:
+            extra["response_format"] = {"type": "json_object"}
+        response = await self.client.chat.completions.create(
+            model=model,
+            messages=messages,
+            temperature=temperature,
+            **extra
+        )
+        message = response.choices[0].message
+        tool_calls = [ToolCall(t.function.name, t.function.arguments) for t in message.tool_calls or []]
+        return ChatResult(message.content, tool_calls)
+
+    async def chat_stream(self, messages, model, temperature=0, tools=None, tool_choice=None):
+        extra = {"tools": tools, "tool_choice": tool_choice} if tools else {}
+        stream = await self.client.chat.completions.create(
+            model=model,
+            messages=messages,
+            temperature=temperature,
+            stream=True,
+            **extra
+        )
+        async for chunk in stream:
+            if not chunk.choices:
+                continue
+            delta = chunk.choices[0].delta
+            arguments = "".join(
+                t.function.arguments for t in delta.tool_calls or []
+                if t.function and t.function.arguments
+            )
+            if delta.content or arguments:
+                yield ChatDelta(delta.content or None, arguments or None)
+
+    async def generate(self, prompt, model, temperature=0):
+        response = await self.client.responses.create(
+            model=model,
+            input=prompt,
+            temperature=temperature
+        )
+        return response.output[0].content[0].text
+
+    async def speech(self, text, model, voice, response_format):
+        tts = await self.client.audio.speech.create(
+            model=model,
+            voice=voice,
+            input=text,
+            response_format=response_format
+        )
+        return tts.content
+
+    def warm(self):
+        get = getattr(self.client, "get", None)
+        if get is not None:
+            get()
+
+
+# --- Fake provider ---
+
+def parse_latency(spec) -> Callable[[random.Random], float]:
+    """
+    Latency distribution in seconds from a spec:
+      "0.3"                  fixed
+      "uniform:LOW,HIGH"
+      "normal:MEAN,STDDEV"   (clamped at 0)
+      "lognormal:MEDIAN,SIGMA"
+      "exp:MEAN"
+    """
+    if isinstance(spec, (int, float)):
+        value = float(spec)
+        return lambda rng: value
+    kind, _, params = str(spec).strip().partition(":")
+    if not params:
+        value = float(kind)
+        return lambda rng: value
+    values = [float(p) for p in params.split(",")]
+    kind = kind.lower()
+    if kind == "uniform" and len(values) == 2:
+        low, high = values
+        return lambda rng: rng.uniform(low, high)
+    if kind == "normal" and len(values) == 2:
+        mean, stddev = values
+        return lambda rng: max(0.0, rng.gauss(mean, stddev))
+    if kind == "lognormal" and len(values) == 2:
+        median, sigma = values
+        return lambda rng: rng.lognormvariate(math.log(median), sigma) if median > 0 else 0.0
+    if kind == "exp" and len(values) == 1:
+        mean = values[0]
+        return lambda rng: rng.expovariate(1 / mean) if mean > 0 else 0.0
+    raise ValueError(f"Unknown latency spec: {spec!r}")
+
+
+FAKE_DEFAULTS: Dict[str, Any] = {
+    "seed": 0,
+    "latency": {
+        "stt": "lognormal:0.45,0.3",
+        "chat": "lognormal:0.8,0.35",       # whole response, or time to first chunk when streamed
+        "chat_chunk": "0.015",               # between streamed chunks
+        "generate": "lognormal:0.9,0.3",
+        "tts": "lognormal:0.35,0.25",
+    },
+    "transcripts": ["yes"],
+    # "audio": picked by a checksum of the clip, so the same clip always gets the same text;
+    # "cycle": one after the other in call order (varied turns from a single recording)
+    "transcript_order": "audio",
+    # Tool-call arguments; "{user}" in a string value becomes the user's message
+    "tool_arguments": {
+        "intent": "answer",
+        "mapped_answer": "{user}",
+        "reply_to_speak": "Thank you. Let's move on to the next question.",
+    },
+    # Plain chat replies (mapping, translation, summaries); "{user}" echoes the user's message,
+    # which also makes survey localization an identity translation
+    "chat_reply": "{user}",
+    "generate_reply": "Hello {employee_name}\nThank you for taking a few minutes for this short survey.",
+    # Characters of streamed text per chunk
+    "chunk_chars": 12,
+    # Length of the synthesized clip per character of text (roughly tts-1's speaking rate)
+    "tts_seconds_per_char": 0.065,
+}
+
+_OPUS_FRAME_SAMPLES = 960  # 20 ms at 48 kHz
+_OPUS_FRAMES_PER_PAGE = 50
+# A 20 ms CELT fullband frame of silence (TOC byte + padding), decodable by any Opus decoder
+_OPUS_SILENT_FRAME = b"\xf8\xff\xfe"
+
+
+def silent_ogg_opus(seconds: float, serial: int) -> bytes:
+    """A valid Ogg Opus stream of `seconds` of silence."""
+    pre_skip = 312
+    head = b"OpusHead" + bytes([1, 1]) + struct.pack("<HIhB", pre_skip, 48000, 0, 0)
+    tags = b"OpusTags" + struct.pack("<I", 0) + struct.pack("<I", 0)
+    out = [
+        encode_page(2, 0, serial, 0, bytes([len(head)]), head),
+        encode_page(0, 0, serial, 1, bytes([len(tags)]), tags),
+    ]
+    frames = max(1, round(seconds * 50))
+    granule, seqno = pre_skip, 2
+    while frames > 0:
+        count = min(frames, _OPUS_FRAMES_PER_PAGE)
+        frames -= count
+        granule += count * _OPUS_FRAME_SAMPLES
+        out.append(encode_page(
+            4 if frames == 0 else 0, granule, serial, seqno,
+            bytes([len(_OPUS_SILENT_FRAME)]) * count, _OPUS_SILENT_FRAME * count,
+        ))
+        seqno += 1
+    return b"".join(out)
+
+
+def _last_user_message(messages: List[Dict[str, Any]]) -> str:
+    for message in reversed(messages):
+        if message.get("role") == "user":
+            return str(message.get("content") or "")
+    return ""
+
+
+def _fill(value: Any, user: str) -> Any:
+    if isinstance(value, str):
+        return value.replace("{user}", user)
+    if isinstance(value, dict):
+        return {k: _fill(v, user) for k, v in value.items()}
+    if isinstance(value, list):
+        return [_fill(v, user) for v in value]
+    return value
+
+
+class FakeProvider(Provider):
+    """
+    In-process stand-in: sleeps for a latency drawn from the configured
+    distributions, then returns canned outputs. With a fixed seed and the
+    same sequence of calls, latencies and outputs are reproducible.
+    """
+
+    name = "fake"
+    cache_tag = "fake:"
+
+    def __init__(self, config: Optional[Dict[str, Any]] = None):
+        config = dict(config or {})
+        self.config = {**FAKE_DEFAULTS, **config}
+        self.config["latency"] = {**FAKE_DEFAULTS["latency"], **config.get("latency", {})}
+        self.latency = {kind: parse_latency(spec) for kind, spec in self.config["latency"].items()}
+        self.rng = random.Random(self.config["seed"])
+        self.calls = {kind: 0 for kind in ("stt", "chat", "generate", "tts")}
+
+    @classmethod
+    def from_env(cls, environ=os.environ) -> "FakeProvider":
+        """
+        FAKE_PROVIDER_CONFIG: JSON file with any FAKE_DEFAULTS keys.
+        FAKE_PROVIDER_SEED, FAKE_<KIND>_LATENCY (STT, CHAT, CHAT_CHUNK,
+        GENERATE, TTS) and FAKE_TRANSCRIPTS ("|"-separated) override it.
+        """
+        config: Dict[str, Any] = {}
+        path = environ.get("FAKE_PROVIDER_CONFIG")
+        if path:
+            with open(path, encoding="utf-8") as f:
+                config = json.load(f)
+        if environ.get("FAKE_PROVIDER_SEED"):
+            config["seed"] = int(environ["FAKE_PROVIDER_SEED"])
+        latency = dict(config.get("latency", {}))
+        for kind in FAKE_DEFAULTS["latency"]:
+            spec = environ.get(f"FAKE_{kind.upper()}_LATENCY")
+            if spec:
+                latency[kind] = spec
+        config["latency"] = latency
+        if environ.get("FAKE_TRANSCRIPTS"):
+            config["transcripts"] = environ["FAKE_TRANSCRIPTS"].split("|")
+        return cls(config)
+
+    async def _wait(self, kind: str):
+        self.calls[kind] = self.calls.get(kind, 0) + 1
+        await asyncio.sleep(self.latency[kind](self.rng))
+
+    def _chunks(self, text: str) -> List[str]:
+        size = max(1, int(self.config["chunk_chars"]))
+        return [text[i:i + size] for i in range(0, len(text), size)]
+
+    def _reply(self, messages, tools) -> ChatResult:
+        user = _last_user_message(messages)
+        if tools:
+            name = tools[0].get("function", {}).get("name", "tool")
+            arguments = json.dumps(_fill(self.config["tool_arguments"], user))
+            return ChatResult(None, [ToolCall(name, arguments)])
+        return ChatResult(_fill(self.config["chat_reply"], user), [])
+
+    async def transcribe(self, audio, filename, content_type, model="whisper-1"):
+        await self._wait("stt")
+        transcripts = self.config["transcripts"]
+        if not audio or not transcripts:
+            return ""
+        if self.config["transcript_order"] == "cycle":
+            return transcripts[(self.calls["stt"] - 1) % len(transcripts)].strip()
+        return transcripts[zlib.crc32(audio) % len(transcripts)].strip()
+
+    async def chat(self, messages, model, temperature=0, tools=None, tool_choice=None, json_mode=False):
+        await self._wait("chat")
+        return self._reply(messages, tools)
+
+    async def chat_stream(self, messages, model, temperature=0, tools=None, tool_choice=None):
+        await self._wait("chat")
+        result = self._reply(messages, tools)
+        chunk_latency = self.latency["chat_chunk"]
+        pieces = (
+            [ChatDelta(tool_arguments=piece) for call in result.tool_calls for piece in self._chunks(call.arguments)]
+            + [ChatDelta(content=piece) for piece in self._chunks(result.content or "")]
+        )
+        for i, piece in enumerate(pieces):
+            if i:
+                await asyncio.sleep(chunk_latency(self.rng))
+            yield piece
+
+    async def generate(self, prompt, model, temperature=0):
+        await self._wait("generate")
+        return self.config["generate_reply"]
+
+    async def speech(self, text, model, voice, response_format):
+        await self._wait("tts")
+        seconds = len(text) * float(self.config["tts_seconds_per_char"])
+        if response_format == "opus":
+            return silent_ogg_opus(seconds, zlib.crc32(text.encode("utf-8")))
+        # Other formats: placeholder bytes of a plausible size (~32 kbit/s)
+        return bytes(int(seconds * 4000))
+
+    def stats(self):
+        return {"name": self.name, "calls": dict(self.calls), "latency": dict(self.config["latency"])}
+
+
+def make_provider(kind: str, openai_client_factory: Callable[[], Any]) -> Provider:
+    """PROVIDER=openai (default) or fake."""
+    kind = (kind or "openai").strip().lower()
+    if kind == "openai":
+        return OpenAIProvider(LazyProxy(openai_client_factory))
+    if kind == "fake":
+        return FakeProvider.from_env()
+    raise ValueError(f"Unknown PROVIDER: {kind!r} (expected 'openai' or 'fake')")
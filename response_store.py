@@ -0,0 +1,367 @@
+import base64
+import concurrent.futures
+import csv
+import json
+import os
+import queue
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+# Write-behind persistence for submitted surveys. Handlers only enqueue; a
+# single writer thread drains the queue and commits batches (by size or by
+# time) into an append-only SQLite table, so concurrent submits can never
+# interleave rows and the request path does no file I/O.
+#
+# RESPONSES_FSYNC:
+#   batch  (default) every batch is committed with synchronous=FULL; submit
+#          returns as soon as the record is queued.
+#   always submit waits until its batch is committed (group commit: all
+#          submits waiting at that moment share one fsync).
+#   off    synchronous=OFF; fastest, may lose recent batches on power loss.
+#
+# Reads are indexed: responses by (session_id, id), and one filled_sessions
+# row per session (kept up to date by the writer, in the same transaction)
+# by (submitted_at, session_id) for time-ordered, cursor-paginated listing.
+
+FSYNC_POLICIES = ("batch", "always", "off")
+RESPONSE_FIELDS = ("session_id", "question", "answer", "timestamp")
+# Per-answer fields a reader can project (session_id is always returned once per session)
+ANSWER_FIELDS = ("question", "answer", "timestamp")
+
+_STOP = object()
+
+
+class ResponseQueueFull(Exception):
+    """The writer is too far behind; the submit was not queued."""
+
+
+class InvalidCursor(ValueError):
+    """A pagination cursor that this store did not produce."""
+
+
+def encode_cursor(submitted_at: float, session_id: str) -> str:
+    raw = json.dumps([submitted_at, session_id], separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[float, str]:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        submitted_at, session_id = json.loads(raw)
+        return float(submitted_at), str(session_id)
+    except (ValueError, TypeError):
+        raise InvalidCursor(cursor)
+
+
+def answer_fields(fields: Optional[Iterable[str]]) -> Tuple[str, ...]:
+    """Validates a field projection; None means every answer field."""
+    if fields is None:
+        return ANSWER_FIELDS
+    fields = tuple(dict.fromkeys(f.strip() for f in fields if f.strip()))
+    unknown = [f for f in fields if f not in ANSWER_FIELDS]
+    if unknown or not fields:
+        raise ValueError(f"fields must be a subset of {', '.join(ANSWER_FIELDS)}")
+    return fields
+
+
+class _Batch:
+    __slots__ = ("rows", "future")
+
+    def __init__(self, rows: List[tuple]):
+        self.rows = rows
+        self.future: "concurrent.futures.Future[int]" = concurrent.futures.Future()
+
+
+class ResponseStore:
+    """Append-only SQLite store of submitted answers, written by one background thread."""
+
+    def __init__(
+        self,
+        path: str,
+        batch_size: int = 500,
+        flush_interval: float = 0.2,
+        fsync: str = "batch",
+        max_queued: int = 100000,
+    ):
+        if fsync not in FSYNC_POLICIES:
+            raise ValueError(f"fsync must be one of {FSYNC_POLICIES}")
+        self.path = path
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.fsync = fsync
+        self._queue: "queue.Queue[Any]" = queue.Queue(maxsize=max_queued)
+        self._local = threading.local()
+        self._stats_lock = threading.Lock()
+        self.queued = 0
+        self.written = 0
+        self.batches = 0
+        self.failed = 0
+        self.last_commit_seconds = 0.0
+
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        conn = self._conn()
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS responses (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                session_id TEXT NOT NULL,
+                question TEXT,
+                answer TEXT,
+                timestamp REAL NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS responses_session ON responses (session_id, id);
+            CREATE TABLE IF NOT EXISTS filled_sessions (
+                session_id TEXT PRIMARY KEY,
+                submitted_at REAL NOT NULL,
+                responses INTEGER NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS filled_sessions_time ON filled_sessions (submitted_at, session_id);
+            """
+        )
+        # Stores written before filled_sessions existed: build it once from the responses
+        if conn.execute("SELECT 1 FROM filled_sessions LIMIT 1").fetchone() is None:
+            conn.execute(
+                "INSERT INTO filled_sessions (session_id, submitted_at, responses) "
+                "SELECT session_id, MAX(timestamp), COUNT(*) FROM responses GROUP BY session_id"
+            )
+        self._writer = threading.Thread(target=self._run, name="response-writer", daemon=True)
+        self._writer.start()
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None, check_same_thread=False)
+            conn.execute("PRAGMA busy_timeout=30000")
+            conn.execute("PRAGMA synchronous=%s" % ("OFF" if self.fsync == "off" else "FULL"))
+            self._local.conn = conn
+        return conn
+
+    # --- write path ---
+
+    def submit(self, records: Iterable[Dict[str, Any]]) -> "concurrent.futures.Future[int]":
+        """
+        Queues one submit (a list of response rows). The returned future
+        resolves to the number of rows once they are committed.
+        """
+        rows = [tuple(record.get(field) for field in RESPONSE_FIELDS) for record in records]
+        batch = _Batch(rows)
+        try:
+            self._queue.put(batch, timeout=1.0)
+        except queue.Full:
+            raise ResponseQueueFull("Response writer queue is full")
+        with self._stats_lock:
+            self.queued += len(rows)
+        return batch.future
+
+    def _run(self):
+        conn = self._conn()
+        stopping = False
+        while not stopping:
+            item = self._queue.get()
+            if item is _STOP:
+                break
+            pending = [item]
+            count = len(item.rows)
+            deadline = time.monotonic() + self.flush_interval
+            # Collect until the batch is full or the oldest row has waited flush_interval.
+            # With fsync=always submitters are waiting, so commit whatever is queued now.
+            while count < self.batch_size:
+                timeout = 0 if self.fsync == "always" else deadline - time.monotonic()
+                try:
+                    item = self._queue.get(timeout=timeout) if timeout > 0 else self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if item is _STOP:
+                    stopping = True
+                    break
+                pending.append(item)
+                count += len(item.rows)
+            self._commit(conn, pending)
+        # Drain whatever was queued before close()
+        rest = []
+        while True:
+            try:
+                item = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is not _STOP:
+                rest.append(item)
+        if rest:
+            self._commit(conn, rest)
+
+    def _commit(self, conn: sqlite3.Connection, pending: List[_Batch]):
+        start = time.perf_counter()
+        try:
+            conn.execute("BEGIN")
+            for batch in pending:
+                self._insert(conn, batch.rows)
+            conn.execute("COMMIT")
+        except Exception as e:
+            if conn.in_transaction:
+                conn.execute("ROLLBACK")
+            print(f"Response writer: batch of {len(pending)} submits failed: {e}")
+            with self._stats_lock:
+                self.failed += sum(len(b.rows) for b in pending)
+            for batch in pending:
+                batch.future.set_exception(e)
+            return
+        elapsed = time.perf_counter() - start
+        with self._stats_lock:
+            self.written += sum(len(b.rows) for b in pending)
+            self.batches += 1
+            self.last_commit_seconds = elapsed
+        for batch in pending:
+            batch.future.set_result(len(batch.rows))
+
+    @staticmethod
+    def _insert(conn: sqlite3.Connection, rows: List[tuple]):
+        """Appends rows and updates their sessions' summaries (caller holds the transaction)."""
+        conn.executemany(
+            "INSERT INTO responses (session_id, question, answer, timestamp) VALUES (?, ?, ?, ?)", rows
+        )
+        sessions: Dict[str, List[float]] = {}
+        for session_id, _, _, timestamp in rows:
+            summary = sessions.setdefault(session_id, [timestamp, 0])
+            summary[0] = max(summary[0], timestamp)
+            summary[1] += 1
+        conn.executemany(
+            "INSERT INTO filled_sessions (session_id, submitted_at, responses) VALUES (?, ?, ?) "
+            "ON CONFLICT (session_id) DO UPDATE SET "
+            "submitted_at = MAX(submitted_at, excluded.submitted_at), responses = responses + excluded.responses",
+            [(session_id, ts, count) for session_id, (ts, count) in sessions.items()],
+        )
+
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """Waits until everything queued so far is committed."""
+        future = self.submit([])
+        try:
+            future.result(timeout)
+            return True
+        except concurrent.futures.TimeoutError:
+            return False
+
+    def close(self, timeout: float = 30.0):
+        """Flushes queued submits and stops the writer."""
+        if self._writer.is_alive():
+            self._queue.put(_STOP)
+            self._writer.join(timeout)
+        conn = getattr(self._local, "conn", None)
+        if conn is not None:
+            conn.close()
+            self._local.conn = None
+
+    def stats(self) -> Dict[str, Any]:
+        with self._stats_lock:
+            return {
+                "fsync": self.fsync,
+                "queued_rows": self.queued,
+                "written_rows": self.written,
+                "failed_rows": self.failed,
+                "pending_submits": self._queue.qsize(),
+                "batches": self.batches,
+                "avg_rows_per_batch": round(self.written / self.batches, 1) if self.batches else 0.0,
+                "last_commit_ms": round(self.last_commit_seconds * 1000, 2),
+            }
+
+    # --- read path ---
+
+    def rows_for_session(self, session_id: str, fields: Optional[Sequence[str]] = None) -> List[Dict[str, Any]]:
+        """One session's answers in order (index lookup on session_id)."""
+        fields = answer_fields(fields)
+        cursor = self._conn().execute(
+            f"SELECT {', '.join(fields)} FROM responses WHERE session_id = ? ORDER BY id", (session_id,)
+        )
+        return [dict(zip(fields, row)) for row in cursor]
+
+    def sessions_page(
+        self,
+        limit: int = 100,
+        cursor: Optional[str] = None,
+        since: Optional[float] = None,
+        until: Optional[float] = None,
+        fields: Optional[Sequence[str]] = None,
+    ) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+        """
+        Filled sessions ordered by submission time, `limit` at a time, with
+        since <= submitted_at < until. Returns (sessions, next_cursor);
+        next_cursor is None on the last page.
+        """
+        fields = answer_fields(fields)
+        clauses, params = [], []
+        if since is not None:
+            clauses.append("submitted_at >= ?")
+            params.append(since)
+        if until is not None:
+            clauses.append("submitted_at < ?")
+            params.append(until)
+        if cursor:
+            clauses.append("(submitted_at, session_id) > (?, ?)")
+            params.extend(decode_cursor(cursor))
+        where = f" WHERE {' AND '.join(clauses)}" if clauses else ""
+        conn = self._conn()
+        page = conn.execute(
+            f"SELECT session_id, submitted_at FROM filled_sessions{where} "
+            "ORDER BY submitted_at, session_id LIMIT ?",
+            (*params, limit + 1),
+        ).fetchall()
+        next_cursor = encode_cursor(page[limit - 1][1], page[limit - 1][0]) if len(page) > limit else None
+        page = page[:limit]
+        if not page:
+            return [], None
+
+        answers: Dict[str, List[Dict[str, Any]]] = {session_id: [] for session_id, _ in page}
+        rows = conn.execute(
+            f"SELECT session_id, {', '.join(fields)} FROM responses "
+            f"WHERE session_id IN ({', '.join('?' * len(answers))}) ORDER BY session_id, id",
+            list(answers),
+        )
+        for session_id, *values in rows:
+            answers[session_id].append(dict(zip(fields, values)))
+        return [
+            {"session_id": session_id, "submitted_at": submitted_at, "responses": answers[session_id]}
+            for session_id, submitted_at in page
+        ], next_cursor
+
+    def is_empty(self) -> bool:
+        return self._conn().execute("SELECT 1 FROM responses LIMIT 1").fetchone() is None
+
+    def export_watermark(self) -> int:
+        """Id of the newest committed row; rows are numbered in commit order."""
+        return self._conn().execute("SELECT COALESCE(MAX(id), 0) FROM responses").fetchone()[0]
+
+    def iter_rows(self, since: int = 0, until: Optional[int] = None, chunk_size: int = 1000) -> Iterator[List[tuple]]:
+        """
+        (id, session_id, question, answer, timestamp) rows with since < id <= until,
+        in id order, chunk_size rows at a time. Each chunk is its own query, so
+        the caller may consume chunks from different threads and at its own pace.
+        """
+        last_id = since
+        upper = self.export_watermark() if until is None else until
+        while last_id < upper:
+            chunk = self._conn().execute(
+                "SELECT id, session_id, question, answer, timestamp FROM responses "
+                "WHERE id > ? AND id <= ? ORDER BY id LIMIT ?",
+                (last_id, upper, chunk_size),
+            ).fetchall()
+            if not chunk:
+                return
+            yield chunk
+            last_id = chunk[-1][0]
+
+    def import_csv(self, csv_path: str) -> int:
+        """One-off import of the legacy responses CSV into an empty store."""
+        if not os.path.isfile(csv_path) or not self.is_empty():
+            return 0
+        with open(csv_path, newline="", encoding="utf-8") as f:
+            rows = [
+                (r.get("session_id"), r.get("question"), r.get("answer"), float(r.get("timestamp") or 0))
+                for r in csv.DictReader(f)
+            ]
+        conn = self._conn()
+        conn.execute("BEGIN")
+        self._insert(conn, rows)
+        conn.execute("COMMIT")
+        return len(rows)
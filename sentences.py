@@ -0,0 +1,59 @@
+import re
+from typing import List
+
+# Sentence enders for English and Urdu: . ! ? plus the Urdu full stop (۔),
+# Arabic question mark (؟) and line breaks. A decimal point or an
+# abbreviation without a following space is not treated as a boundary.
+_BOUNDARY = re.compile(r"(?<=[.!?۔؟])[\"')\]]*\s+|\n+")
+
+# Fragments shorter than this are merged into the next sentence; tiny clips
+# cost a full TTS round trip for almost no audio.
+MIN_CHUNK_CHARS = 20
+
+
+class SentenceBuffer:
+    """
+    Incremental sentence splitter for text that arrives in pieces (LLM deltas).
+
+    feed() returns the chunks that can no longer change; finish() returns
+    whatever is left. Feeding a whole string and calling finish() gives the
+    same chunks as split_sentences(), so streamed and non-streamed replies
+    produce identical TTS cache keys.
+    """
+
+    def __init__(self, min_chars: int = MIN_CHUNK_CHARS):
+        self.min_chars = min_chars
+        self._pending = ""
+        self._tail = ""
+
+    def _accept(self, part: str) -> List[str]:
+        part = part.strip()
+        if not part:
+            return []
+        self._pending = f"{self._pending} {part}" if self._pending else part
+        if len(self._pending) >= self.min_chars:
+            chunk, self._pending = self._pending, ""
+            return [chunk]
+        return []
+
+    def feed(self, text: str) -> List[str]:
+        self._tail += text
+        parts = _BOUNDARY.split(self._tail)
+        # The last part has no boundary after it yet, so it may still grow.
+        self._tail = parts.pop()
+        chunks = []
+        for part in parts:
+            chunks.extend(self._accept(part))
+        return chunks
+
+    def finish(self) -> List[str]:
+        tail, self._tail = self._tail.strip(), ""
+        rest = f"{self._pending} {tail}".strip() if tail else self._pending
+        self._pending = ""
+        return [rest] if rest else []
+
+
+def split_sentences(text: str, min_chars: int = MIN_CHUNK_CHARS) -> List[str]:
+    """Splits a reply into speakable sentence chunks, keeping punctuation."""
+    buffer = SentenceBuffer(min_chars)
+    return buffer.feed(text) + buffer.finish()
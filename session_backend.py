@@ -0,0 +1,363 @@
+import asyncio
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Callable, Dict, List, NamedTuple, Optional, Tuple, TypeVar
+
+from stores import TTLStore
+
+# Session state shared by every worker process. Sessions are stored as JSON
+# snapshots with a version number: a turn loads (snapshot, version) and saves
+# with the version it loaded; if another turn saved in between, the save is
+# rejected with VersionConflict instead of overwriting it.
+#
+# Besides sessions, the backend keeps small JSON values by kind ("surveys",
+# "tts", "results") so anything a follow-up request needs is visible to
+# every worker.
+#
+# SESSION_BACKEND=memory (single process) or sqlite:///path/to/sessions.db
+#
+# Backend methods are synchronous. Async code calls them through
+# backend.run(), which moves them to a worker thread when the backend does
+# I/O (sqlite can wait up to busy_timeout on a contended write) and calls
+# the in-memory backend directly.
+#
+# Both backends apply the same per-kind policy, taken from the kind's
+# TTLStore: TTL, sliding expiry (a read renews it) and the entry and byte
+# limits. The memory backend enforces limits on every write. The sqlite
+# backend enforces them at each sweep, evicting the entries closest to
+# expiry, so between sweeps a kind can run over by one sweep interval's
+# writes.
+
+T = TypeVar("T")
+
+
+class KindPolicy(NamedTuple):
+    """Expiry and limits of one kind of value (the same as its TTLStore's)."""
+    ttl_seconds: float
+    sliding: bool = False
+    max_entries: Optional[int] = None
+    max_bytes: Optional[int] = None
+
+    @classmethod
+    def of(cls, store: TTLStore) -> "KindPolicy":
+        return cls(store.ttl_seconds, store.sliding, store.max_entries, store.max_bytes)
+
+
+class VersionConflict(Exception):
+    """The session was saved by another turn since it was loaded."""
+
+
+class SessionBackend:
+    name = "session_backend"
+    # True if calls may block on I/O and must stay off the event loop
+    blocking = False
+
+    async def run(self, fn: Callable[..., T], *args: Any) -> T:
+        """Calls fn (a method of this backend or a KindView of it) from async code."""
+        if self.blocking:
+            return await asyncio.to_thread(fn, *args)
+        return fn(*args)
+
+    def create_session(self, session_id: str, snapshot: Dict[str, Any]) -> int:
+        raise NotImplementedError
+
+    def load_session(self, session_id: str) -> Optional[Tuple[Dict[str, Any], int]]:
+        raise NotImplementedError
+
+    def save_session(self, session_id: str, snapshot: Dict[str, Any], expected_version: int) -> int:
+        raise NotImplementedError
+
+    def delete_session(self, session_id: str):
+        raise NotImplementedError
+
+    def put(self, kind: str, key: str, value: Any):
+        raise NotImplementedError
+
+    def get(self, kind: str, key: str, default: Any = None) -> Any:
+        raise NotImplementedError
+
+    def pop(self, kind: str, key: str, default: Any = None) -> Any:
+        raise NotImplementedError
+
+    def sweep(self) -> int:
+        return 0
+
+    def stats(self) -> Dict[str, Any]:
+        return {}
+
+    def close(self):
+        pass
+
+    def kind(self, kind: str) -> "KindView":
+        return KindView(self, kind)
+
+
+class KindView:
+    """Dict-like view of one kind of value in a backend (e.g. TTS_STORE)."""
+
+    def __init__(self, backend: SessionBackend, kind: str):
+        self.backend = backend
+        self.kind = kind
+
+    def __setitem__(self, key: str, value: Any):
+        self.backend.put(self.kind, key, value)
+
+    def put(self, key: str, value: Any):
+        self.backend.put(self.kind, key, value)
+
+    def get(self, key: str, default: Any = None) -> Any:
+        return self.backend.get(self.kind, key, default)
+
+    def pop(self, key: str, default: Any = None) -> Any:
+        return self.backend.pop(self.kind, key, default)
+
+
+class MemorySessionBackend(SessionBackend):
+    """Single-process backend on TTLStores; one store per kind plus "sessions"."""
+
+    name = "memory"
+
+    def __init__(self, stores: Dict[str, TTLStore]):
+        if "sessions" not in stores:
+            raise ValueError("MemorySessionBackend needs a 'sessions' store")
+        self.stores = stores
+        self._lock = threading.Lock()
+
+    def create_session(self, session_id, snapshot):
+        self.stores["sessions"][session_id] = (json.dumps(snapshot), 1)
+        return 1
+
+    def load_session(self, session_id):
+        entry = self.stores["sessions"].get(session_id)
+        if entry is None:
+            return None
+        data, version = entry
+        return json.loads(data), version
+
+    def save_session(self, session_id, snapshot, expected_version):
+        with self._lock:
+            entry = self.stores["sessions"].get(session_id)
+            if entry is None or entry[1] != expected_version:
+                raise VersionConflict(session_id)
+            version = expected_version + 1
+            self.stores["sessions"][session_id] = (json.dumps(snapshot), version)
+            return version
+
+    def delete_session(self, session_id):
+        self.stores["sessions"].pop(session_id, None)
+
+    def put(self, kind, key, value):
+        self.stores[kind][key] = json.dumps(value)
+
+    def get(self, kind, key, default=None):
+        data = self.stores[kind].get(key)
+        return default if data is None else json.loads(data)
+
+    def pop(self, kind, key, default=None):
+        data = self.stores[kind].pop(key, None)
+        return default if data is None else json.loads(data)
+
+    def sweep(self):
+        return sum(store.sweep() for store in self.stores.values())
+
+    def stats(self):
+        return {name: store.stats() for name, store in self.stores.items()}
+
+
+class SQLiteSessionBackend(SessionBackend):
+    """
+    SQLite in WAL mode, shared by every worker on the host. Each thread gets
+    its own connection; writes are single statements, so they are atomic
+    without holding a transaction across the turn.
+    """
+
+    name = "sqlite"
+    blocking = True
+
+    def __init__(self, path: str, policies: Dict[str, KindPolicy], clock: Callable[[], float] = time.time):
+        self.path = path
+        self.policies = policies
+        self.clock = clock
+        self.evicted = 0
+        self._local = threading.local()
+        # Every thread's connection, so close() can close them all
+        self._connections: List[sqlite3.Connection] = []
+        self._connections_lock = threading.Lock()
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        conn = self._conn()
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS sessions (
+                id TEXT PRIMARY KEY,
+                version INTEGER NOT NULL,
+                data TEXT NOT NULL,
+                expires_at REAL NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS sessions_expires ON sessions (expires_at);
+            CREATE TABLE IF NOT EXISTS kv (
+                kind TEXT NOT NULL,
+                key TEXT NOT NULL,
+                value TEXT NOT NULL,
+                expires_at REAL NOT NULL,
+                PRIMARY KEY (kind, key)
+            );
+            CREATE INDEX IF NOT EXISTS kv_expires ON kv (expires_at);
+            """
+        )
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            # autocommit: every statement is its own transaction
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None, check_same_thread=False)
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("PRAGMA busy_timeout=30000")
+            self._local.conn = conn
+            with self._connections_lock:
+                self._connections.append(conn)
+        return conn
+
+    def _policy(self, kind: str) -> KindPolicy:
+        return self.policies.get(kind) or KindPolicy(3600)
+
+    def _expiry(self, kind: str) -> float:
+        return self.clock() + self._policy(kind).ttl_seconds
+
+    def _renewal(self, kind: str, expires_at: float) -> Optional[float]:
+        """New expiry for a read of a sliding kind, or None. Renewed at most every 1% of the TTL, to spare writes."""
+        policy = self._policy(kind)
+        if not policy.sliding:
+            return None
+        renewed = self.clock() + policy.ttl_seconds
+        return renewed if renewed - expires_at >= max(1.0, policy.ttl_seconds / 100) else None
+
+    def create_session(self, session_id, snapshot):
+        self._conn().execute(
+            "INSERT INTO sessions (id, version, data, expires_at) VALUES (?, 1, ?, ?)",
+            (session_id, json.dumps(snapshot), self._expiry("sessions")),
+        )
+        return 1
+
+    def load_session(self, session_id):
+        conn = self._conn()
+        row = conn.execute(
+            "SELECT data, version, expires_at FROM sessions WHERE id = ? AND expires_at > ?",
+            (session_id, self.clock()),
+        ).fetchone()
+        if row is None:
+            return None
+        renewed = self._renewal("sessions", row[2])
+        if renewed is not None:
+            conn.execute("UPDATE sessions SET expires_at = MAX(expires_at, ?) WHERE id = ?", (renewed, session_id))
+        return json.loads(row[0]), row[1]
+
+    def save_session(self, session_id, snapshot, expected_version):
+        cursor = self._conn().execute(
+            "UPDATE sessions SET data = ?, version = version + 1, expires_at = ? WHERE id = ? AND version = ?",
+            (json.dumps(snapshot), self._expiry("sessions"), session_id, expected_version),
+        )
+        if cursor.rowcount != 1:
+            raise VersionConflict(session_id)
+        return expected_version + 1
+
+    def delete_session(self, session_id):
+        self._conn().execute("DELETE FROM sessions WHERE id = ?", (session_id,))
+
+    def put(self, kind, key, value):
+        self._conn().execute(
+            "INSERT OR REPLACE INTO kv (kind, key, value, expires_at) VALUES (?, ?, ?, ?)",
+            (kind, key, json.dumps(value), self._expiry(kind)),
+        )
+
+    def get(self, kind, key, default=None):
+        conn = self._conn()
+        row = conn.execute(
+            "SELECT value, expires_at FROM kv WHERE kind = ? AND key = ? AND expires_at > ?",
+            (kind, key, self.clock()),
+        ).fetchone()
+        if row is None:
+            return default
+        renewed = self._renewal(kind, row[1])
+        if renewed is not None:
+            conn.execute(
+                "UPDATE kv SET expires_at = MAX(expires_at, ?) WHERE kind = ? AND key = ?", (renewed, kind, key),
+            )
+        return json.loads(row[0])
+
+    def pop(self, kind, key, default=None):
+        row = self._conn().execute(
+            "DELETE FROM kv WHERE kind = ? AND key = ? AND expires_at > ? RETURNING value",
+            (kind, key, self.clock()),
+        ).fetchone()
+        return default if row is None else json.loads(row[0])
+
+    def sweep(self):
+        now = self.clock()
+        conn = self._conn()
+        removed = conn.execute("DELETE FROM sessions WHERE expires_at <= ?", (now,)).rowcount
+        removed += conn.execute("DELETE FROM kv WHERE expires_at <= ?", (now,)).rowcount
+        for kind, policy in self.policies.items():
+            if kind == "sessions":
+                evicted = self._evict(conn, "sessions", "id", "data", "1 = 1", (), policy)
+            else:
+                evicted = self._evict(conn, "kv", "key", "value", "kind = ?", (kind,), policy)
+            self.evicted += evicted
+            removed += evicted
+        return removed
+
+    @staticmethod
+    def _evict(conn: sqlite3.Connection, table: str, key: str, value: str, where: str, params: tuple,
+               policy: KindPolicy) -> int:
+        """Deletes the entries closest to expiry until the kind is within max_entries and max_bytes."""
+        evicted = 0
+        if policy.max_entries is not None:
+            evicted += conn.execute(
+                f"DELETE FROM {table} WHERE {where} AND {key} IN ("
+                f"SELECT {key} FROM {table} WHERE {where} ORDER BY expires_at DESC LIMIT -1 OFFSET ?)",
+                (*params, *params, policy.max_entries),
+            ).rowcount
+        if policy.max_bytes is not None:
+            evicted += conn.execute(
+                f"DELETE FROM {table} WHERE {where} AND {key} IN ("
+                f"SELECT {key} FROM (SELECT {key}, SUM(LENGTH({value})) OVER "
+                f"(ORDER BY expires_at DESC, {key}) AS running FROM {table} WHERE {where}) WHERE running > ?)",
+                (*params, *params, policy.max_bytes),
+            ).rowcount
+        return evicted
+
+    def stats(self):
+        conn = self._conn()
+        now = self.clock()
+        stats = {"sessions": {"entries": conn.execute(
+            "SELECT COUNT(*) FROM sessions WHERE expires_at > ?", (now,)).fetchone()[0]}}
+        for kind, count, size in conn.execute(
+            "SELECT kind, COUNT(*), SUM(LENGTH(value)) FROM kv WHERE expires_at > ? GROUP BY kind", (now,)
+        ):
+            stats[kind] = {"entries": count, "bytes": size}
+        stats["evicted"] = self.evicted
+        stats["file_bytes"] = sum(
+            os.path.getsize(p) for p in (self.path, self.path + "-wal") if os.path.exists(p)
+        )
+        return stats
+
+    def close(self):
+        with self._connections_lock:
+            connections, self._connections = self._connections, []
+        for conn in connections:
+            conn.close()
+        self._local = threading.local()
+
+
+def make_session_backend(url: str, stores: Dict[str, TTLStore]) -> SessionBackend:
+    """memory -> MemorySessionBackend(stores); sqlite:///path -> SQLiteSessionBackend with the stores' policies."""
+    if url.startswith("sqlite:///"):
+        policies = {kind: KindPolicy.of(store) for kind, store in stores.items()}
+        return SQLiteSessionBackend(url[len("sqlite:///"):], policies)
+    if url != "memory":
+        raise ValueError(f"Unknown SESSION_BACKEND: {url}")
+    return MemorySessionBackend(stores)
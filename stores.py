@@ -0,0 +1,213 @@
+import asyncio
+import sys
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Iterable, Iterator, MutableMapping, Optional, Tuple, Type
+
+# Bounded in-memory stores for sessions, surveys, pending TTS texts and
+# submitted results. Each kind has its own TTL, entry limit and memory
+# budget; least recently used entries are evicted first.
+
+
+def approx_size(obj: Any, exclude: Tuple[Type, ...] = (), _seen: Optional[set] = None) -> int:
+    """
+    Rough deep size in bytes. Follows containers, __dict__ and __slots__;
+    objects of `exclude` types (e.g. a survey shared by many sessions) and
+    objects already counted are skipped.
+    """
+    if _seen is None:
+        _seen = set()
+    if id(obj) in _seen or (exclude and isinstance(obj, exclude)):
+        return 0
+    _seen.add(id(obj))
+    size = sys.getsizeof(obj, 64)
+    if isinstance(obj, (str, bytes, bytearray, int, float, bool, type(None))):
+        return size
+    if isinstance(obj, dict):
+        for k, v in obj.items():
+            size += approx_size(k, exclude, _seen) + approx_size(v, exclude, _seen)
+        return size
+    if isinstance(obj, (list, tuple, set, frozenset)):
+        for item in obj:
+            size += approx_size(item, exclude, _seen)
+        return size
+    if hasattr(obj, "__dict__"):
+        size += approx_size(vars(obj), exclude, _seen)
+    for cls in type(obj).__mro__:
+        for name in getattr(cls, "__slots__", ()):
+            if hasattr(obj, name):
+                size += approx_size(getattr(obj, name), exclude, _seen)
+    return size
+
+
+class _Entry:
+    __slots__ = ("value", "expires_at", "size")
+
+    def __init__(self, value: Any, expires_at: float, size: int):
+        self.value = value
+        self.expires_at = expires_at
+        self.size = size
+
+
+class TTLStore(MutableMapping):
+    """
+    Dict-like store with a TTL, a maximum entry count and a memory budget.
+
+    - sliding=True renews the TTL on every read (idle timeout, for sessions);
+      otherwise entries expire a fixed time after they were written.
+    - When a limit is exceeded, least recently used entries are evicted.
+    - Sizes are estimated once when an entry is written (`sizeof`), so keep
+      values roughly fixed-size after insertion.
+    - on_evict(key, value, reason) runs for expired and evicted entries.
+    Expired entries are dropped on access and by sweep().
+    """
+
+    def __init__(
+        self,
+        name: str,
+        ttl_seconds: float,
+        max_entries: Optional[int] = None,
+        max_bytes: Optional[int] = None,
+        sliding: bool = False,
+        sizeof: Callable[[Any], int] = approx_size,
+        on_evict: Optional[Callable[[Any, Any, str], None]] = None,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.name = name
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.sliding = sliding
+        self.sizeof = sizeof
+        self.on_evict = on_evict
+        self.clock = clock
+        self._data: "OrderedDict[Any, _Entry]" = OrderedDict()
+        self._lock = threading.RLock()
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.expired = 0
+        self.evicted = 0
+
+    def _remove(self, key, reason: Optional[str]) -> _Entry:
+        entry = self._data.pop(key)
+        self.bytes -= entry.size
+        if reason == "expired":
+            self.expired += 1
+        elif reason == "evicted":
+            self.evicted += 1
+        return entry
+
+    def _notify(self, removed: Iterable[Tuple[Any, Any, str]]):
+        if self.on_evict is None:
+            return
+        for key, value, reason in removed:
+            try:
+                self.on_evict(key, value, reason)
+            except Exception as e:
+                print(f"Store {self.name}: on_evict failed for {key}: {e}")
+
+    def get(self, key, default=None):
+        removed = []
+        with self._lock:
+            now = self.clock()
+            entry = self._data.get(key)
+            if entry is not None and entry.expires_at <= now:
+                removed.append((key, self._remove(key, "expired").value, "expired"))
+                entry = None
+            if entry is None:
+                self.misses += 1
+                value = default
+            else:
+                self.hits += 1
+                self._data.move_to_end(key)
+                if self.sliding:
+                    entry.expires_at = now + self.ttl_seconds
+                value = entry.value
+        self._notify(removed)
+        return value
+
+    def __getitem__(self, key):
+        missing = object()
+        value = self.get(key, missing)
+        if value is missing:
+            raise KeyError(key)
+        return value
+
+    def __setitem__(self, key, value):
+        size = self.sizeof(value)
+        removed = []
+        with self._lock:
+            if key in self._data:
+                self._remove(key, None)
+            self._data[key] = _Entry(value, self.clock() + self.ttl_seconds, size)
+            self.bytes += size
+            # Evict LRU entries (never the one just written) until within limits
+            while len(self._data) > 1 and (
+                (self.max_entries is not None and len(self._data) > self.max_entries)
+                or (self.max_bytes is not None and self.bytes > self.max_bytes)
+            ):
+                old_key = next(iter(self._data))
+                removed.append((old_key, self._remove(old_key, "evicted").value, "evicted"))
+        self._notify(removed)
+
+    def __delitem__(self, key):
+        with self._lock:
+            self._remove(key, None)
+
+    def pop(self, key, *default):
+        with self._lock:
+            if key in self._data:
+                return self._remove(key, None).value
+        if default:
+            return default[0]
+        raise KeyError(key)
+
+    def __contains__(self, key) -> bool:
+        with self._lock:
+            entry = self._data.get(key)
+            return entry is not None and entry.expires_at > self.clock()
+
+    def __len__(self):
+        return len(self._data)
+
+    def __iter__(self) -> Iterator:
+        with self._lock:
+            return iter(list(self._data))
+
+    def sweep(self) -> int:
+        """Removes expired entries; returns how many."""
+        removed = []
+        with self._lock:
+            now = self.clock()
+            for key in [k for k, e in self._data.items() if e.expires_at <= now]:
+                removed.append((key, self._remove(key, "expired").value, "expired"))
+        self._notify(removed)
+        return len(removed)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "entries": len(self._data),
+                "bytes": self.bytes,
+                "max_entries": self.max_entries,
+                "max_bytes": self.max_bytes,
+                "ttl_seconds": self.ttl_seconds,
+                "hits": self.hits,
+                "misses": self.misses,
+                "expired": self.expired,
+                "evicted": self.evicted,
+            }
+
+
+async def sweep_periodically(stores: Iterable[TTLStore], interval_seconds: float):
+    """Background task: drops expired entries from every store every interval."""
+    stores = list(stores)
+    while True:
+        await asyncio.sleep(interval_seconds)
+        for store in stores:
+            # Stores backed by a database sweep in a worker thread
+            removed = await asyncio.to_thread(store.sweep) if getattr(store, "blocking", False) else store.sweep()
+            if removed:
+                print(f"Store {store.name}: swept {removed} expired entries")
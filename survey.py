@@ -0,0 +1,188 @@
+import math
+from typing import Any, Dict, Iterable, Iterator, List, Mapping, Optional, Tuple
+
+from answer_index import OptionAliasIndex
+from embeddings import Embedder, OptionEmbeddings
+
+# Surveys are compiled once at upload into immutable, slotted records so the
+# per-turn paths (current question, prompts, summaries, saving) never touch
+# pandas. Responses live in a fixed-size list aligned to question order.
+
+_UNANSWERED = object()
+
+
+def _missing(value: Any) -> bool:
+    if value is None or (isinstance(value, float) and math.isnan(value)):
+        return True
+    return str(value).strip().lower() in ("", "nan")
+
+
+def split_options(raw: Any) -> List[str]:
+    """"a|b|c" or "a, b, c" -> ["a", "b", "c"], lowercased."""
+    if _missing(raw):
+        return []
+    options = [opt.strip().lower() for opt in str(raw).split("|")]
+    if len(options) == 1 and "," in options[0]:
+        options = [opt.strip() for opt in options[0].split(",")]
+    return [opt for opt in options if opt]
+
+
+class _Frozen:
+    __slots__ = ()
+
+    def __setattr__(self, name, value):
+        raise AttributeError(f"{type(self).__name__} is immutable")
+
+    def __delattr__(self, name):
+        raise AttributeError(f"{type(self).__name__} is immutable")
+
+
+class Question(_Frozen):
+    """One survey question. `options` is the display text, None for open-ended questions."""
+
+    __slots__ = ("position", "id", "text", "options", "options_list", "alias_index", "option_embeddings")
+
+    def __init__(self, position: int, id: int, text: str, options: Optional[str], embedder: Optional[Embedder] = None):
+        options_list = split_options(options)
+        init = object.__setattr__
+        init(self, "position", position)
+        init(self, "id", id)
+        init(self, "text", text)
+        init(self, "options", None if _missing(options) else str(options))
+        init(self, "options_list", tuple(options_list))
+        # Per-question alias index so clear answers map to an option without the LLM
+        init(self, "alias_index", OptionAliasIndex(options_list))
+        # Option embeddings are computed once here; answers are scored with one mat-vec
+        init(self, "option_embeddings", OptionEmbeddings(options_list, embedder) if embedder else None)
+
+    @property
+    def is_open_ended(self) -> bool:
+        return self.options is None
+
+    def with_aliases(self, aliases: Iterable[Tuple[str, int, Optional[str]]]) -> "Question":
+        """
+        A copy whose alias index also matches `aliases` ((alias, option
+        position, language), e.g. translated options). The original is left
+        as is, so sessions already matching against it are unaffected.
+        """
+        question = object.__new__(Question)
+        for name in self.__slots__:
+            object.__setattr__(question, name, getattr(self, name))
+        object.__setattr__(question, "alias_index", OptionAliasIndex(list(self.options_list), aliases))
+        return question
+
+    def __repr__(self):
+        return f"Question(id={self.id}, text={self.text!r}, options={list(self.options_list)})"
+
+
+class CompiledSurvey(_Frozen):
+    """Questions in order (a tuple) plus a question id -> position map."""
+
+    __slots__ = ("questions", "index_by_id")
+
+    def __init__(self, questions: Iterable[Question]):
+        questions = tuple(questions)
+        index_by_id = {q.id: q.position for q in questions}
+        if len(index_by_id) != len(questions):
+            raise ValueError("Question ids must be unique")
+        object.__setattr__(self, "questions", questions)
+        object.__setattr__(self, "index_by_id", index_by_id)
+
+    def __len__(self):
+        return len(self.questions)
+
+    def __iter__(self) -> Iterator[Question]:
+        return iter(self.questions)
+
+    def __getitem__(self, position: int) -> Question:
+        return self.questions[position]
+
+    def by_id(self, qid: int) -> Optional[Question]:
+        position = self.index_by_id.get(qid)
+        return None if position is None else self.questions[position]
+
+    def texts(self) -> List[str]:
+        return [q.text for q in self.questions]
+
+    def rows(self) -> List[Dict[str, Any]]:
+        """JSON-serializable source rows; compile_survey(rows) rebuilds the same survey."""
+        return [{"id": q.id, "question": q.text, "options": q.options} for q in self.questions]
+
+
+def compile_survey(records: Iterable[Mapping[str, Any]], embedder: Optional[Embedder] = None) -> CompiledSurvey:
+    """Builds a CompiledSurvey from rows with id, question and options."""
+    questions = []
+    for position, row in enumerate(records):
+        if _missing(row.get("id")) or _missing(row.get("question")):
+            raise ValueError(f"Row {position + 1} needs an id and a question")
+        questions.append(Question(position, int(row["id"]), str(row["question"]), row.get("options"), embedder))
+    return CompiledSurvey(questions)
+
+
+class Responses:
+    """
+    Answers in a fixed-size list aligned to question order. Dict-like and
+    keyed by question id, so `responses[qid] = answer` and
+    `responses.get(qid, default)` work as before.
+    """
+
+    __slots__ = ("survey", "_answers", "_count")
+
+    def __init__(self, survey: CompiledSurvey):
+        self.survey = survey
+        self._answers: List[Any] = [_UNANSWERED] * len(survey)
+        self._count = 0
+
+    def __setitem__(self, qid: int, answer: Any):
+        position = self.survey.index_by_id[qid]
+        if self._answers[position] is _UNANSWERED:
+            self._count += 1
+        self._answers[position] = answer
+
+    def __getitem__(self, qid: int) -> Any:
+        answer = self._answers[self.survey.index_by_id[qid]]
+        if answer is _UNANSWERED:
+            raise KeyError(qid)
+        return answer
+
+    def __contains__(self, qid: int) -> bool:
+        position = self.survey.index_by_id.get(qid)
+        return position is not None and self._answers[position] is not _UNANSWERED
+
+    def __len__(self):
+        return self._count
+
+    def get(self, qid: int, default: Any = None) -> Any:
+        position = self.survey.index_by_id.get(qid)
+        if position is None:
+            return default
+        answer = self._answers[position]
+        return default if answer is _UNANSWERED else answer
+
+    def answer_at(self, position: int, default: Any = None) -> Any:
+        answer = self._answers[position]
+        return default if answer is _UNANSWERED else answer
+
+    def items(self) -> Iterator[Tuple[int, Any]]:
+        """(question id, answer) for answered questions, in question order."""
+        for question, answer in zip(self.survey.questions, self._answers):
+            if answer is not _UNANSWERED:
+                yield question.id, answer
+
+    def to_dict(self) -> Dict[int, Any]:
+        return dict(self.items())
+
+    def to_positions(self) -> List[List[Any]]:
+        """[[position, answer], ...] for answered questions (JSON-serializable)."""
+        return [[i, answer] for i, answer in enumerate(self._answers) if answer is not _UNANSWERED]
+
+    @classmethod
+    def from_positions(cls, survey: CompiledSurvey, pairs: Iterable[Iterable[Any]]) -> "Responses":
+        responses = cls(survey)
+        for position, answer in pairs:
+            responses._answers[position] = answer
+            responses._count += 1
+        return responses
+
+    def __repr__(self):
+        return f"Responses({self.to_dict()!r})"
@@ -0,0 +1,86 @@
+import re
+from typing import Optional
+
+_SIMPLE_ESCAPES = {
+    '"': '"',
+    "\\": "\\",
+    "/": "/",
+    "b": "\b",
+    "f": "\f",
+    "n": "\n",
+    "r": "\r",
+    "t": "\t",
+}
+
+
+class JSONStringFieldStream:
+    """
+    Pulls one string field out of a JSON object that arrives in fragments,
+    e.g. the `arguments` of a streamed tool call.
+
+    feed() returns the newly decoded characters of the field's value as soon
+    as they arrive; escape sequences split across fragments are held back
+    until complete. The decoded text matches json.loads() of the full object.
+    """
+
+    def __init__(self, field: str):
+        self._key = re.compile(r'"%s"\s*:\s*"' % re.escape(field))
+        self.buffer = ""
+        self.value = ""
+        self.done = False
+        self._pos: Optional[int] = None
+
+    def feed(self, fragment: str) -> str:
+        self.buffer += fragment
+        if self.done:
+            return ""
+        if self._pos is None:
+            match = self._key.search(self.buffer)
+            if not match:
+                return ""
+            self._pos = match.end()
+
+        buf = self.buffer
+        i = self._pos
+        out = []
+        while i < len(buf):
+            c = buf[i]
+            if c == '"':
+                self.done = True
+                i += 1
+                break
+            if c != "\\":
+                out.append(c)
+                i += 1
+                continue
+            if i + 1 >= len(buf):
+                break
+            esc = buf[i + 1]
+            if esc != "u":
+                out.append(_SIMPLE_ESCAPES.get(esc, esc))
+                i += 2
+                continue
+            if i + 6 > len(buf):
+                break
+            code = int(buf[i + 2:i + 6], 16)
+            if 0xD800 <= code < 0xDC00:
+                # Surrogate pair: wait for the low half.
+                if i + 12 > len(buf):
+                    break
+                low = int(buf[i + 8:i + 12], 16)
+                out.append(chr(0x10000 + ((code - 0xD800) << 10) + (low - 0xDC00)))
+                i += 12
+            else:
+                out.append(chr(code))
+                i += 6
+
+        self._pos = i
+        text = "".join(out)
+        self.value += text
+        return text
+
+
+def find_string_field(buffer: str, field: str) -> Optional[str]:
+    """Returns a short string field once its closing quote has arrived (no escapes expected)."""
+    match = re.search(r'"%s"\s*:\s*"([^"\\]*)"' % re.escape(field), buffer)
+    return match.group(1) if match else None
@@ -0,0 +1,233 @@
+import os
+import time
+import asyncio
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
+
+
+def tts_cache_key(text: str, model: str, voice: str, response_format: str) -> str:
+    """Content address of a synthesized clip: same text + voice settings -> same audio."""
+    raw = "\x1f".join([model, voice, response_format, text])
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+class TTSCache:
+    """
+    Two-tier cache for synthesized audio.
+
+    A size-bounded in-memory LRU sits in front of an on-disk store
+    (one file per clip, sharded by the first two hex chars of the key).
+    Disk hits are promoted back into memory. Concurrent misses for the
+    same key share a single upstream synthesis.
+
+    The disk tier is bounded too (max_disk_bytes, None = unbounded): a hit
+    touches the file's mtime, and when a write takes the directory over
+    budget the least recently used files are deleted down to 90% of it.
+    Disk work only runs in worker threads. The directory is scanned on the
+    first write and again at each eviction, so workers sharing it stay close
+    to the real total.
+    """
+
+    def __init__(self, cache_dir: Optional[str], max_memory_bytes: int = 64 * 1024 * 1024,
+                 max_disk_bytes: Optional[int] = 1024 * 1024 * 1024):
+        self.cache_dir = cache_dir
+        self.max_memory_bytes = max_memory_bytes
+        self.max_disk_bytes = max_disk_bytes
+        self._disk_bytes: Optional[int] = None
+        self._disk_lock = threading.Lock()
+        self._memory: "OrderedDict[str, bytes]" = OrderedDict()
+        self._memory_bytes = 0
+        self._lock = threading.Lock()
+        self._inflight: Dict[str, "asyncio.Task[bytes]"] = {}
+
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.coalesced = 0
+        self.misses = 0
+        self.evictions = 0
+        self.disk_evictions = 0
+        self.synth_seconds = 0.0
+        self.chars_synthesized = 0
+        self.chars_saved = 0
+
+        if cache_dir:
+            os.makedirs(cache_dir, exist_ok=True)
+
+    # --- memory tier ---
+
+    def _memory_get(self, key: str) -> Optional[bytes]:
+        with self._lock:
+            data = self._memory.get(key)
+            if data is not None:
+                self._memory.move_to_end(key)
+            return data
+
+    def _memory_put(self, key: str, data: bytes):
+        if len(data) > self.max_memory_bytes:
+            return
+        with self._lock:
+            old = self._memory.pop(key, None)
+            if old is not None:
+                self._memory_bytes -= len(old)
+            self._memory[key] = data
+            self._memory_bytes += len(data)
+            while self._memory_bytes > self.max_memory_bytes:
+                _, evicted = self._memory.popitem(last=False)
+                self._memory_bytes -= len(evicted)
+                self.evictions += 1
+
+    # --- disk tier ---
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, key[:2], key)
+
+    def _disk_get(self, key: str) -> Optional[bytes]:
+        if not self.cache_dir:
+            return None
+        path = self._path(key)
+        try:
+            with open(path, "rb") as f:
+                data = f.read()
+        except FileNotFoundError:
+            return None
+        try:
+            # mtime is the disk tier's LRU clock
+            os.utime(path)
+        except OSError:
+            pass
+        return data
+
+    def _disk_put(self, key: str, data: bytes):
+        if not self.cache_dir:
+            return
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp, "wb") as f:
+            f.write(data)
+        try:
+            replaced = os.path.getsize(path)
+        except OSError:
+            replaced = 0
+        os.replace(tmp, path)
+        if self.max_disk_bytes is None:
+            return
+        with self._disk_lock:
+            if self._disk_bytes is None:
+                self._disk_bytes = sum(size for _, size, _ in self._disk_files())
+            else:
+                self._disk_bytes += len(data) - replaced
+            if self._disk_bytes > self.max_disk_bytes:
+                self._evict_disk()
+
+    def _disk_files(self) -> List[Tuple[str, int, float]]:
+        """(path, size, mtime) of every cached clip."""
+        files = []
+        for shard in os.scandir(self.cache_dir):
+            # Only the key shards: other files in the directory aren't the cache's
+            if len(shard.name) != 2 or not shard.is_dir():
+                continue
+            for entry in os.scandir(shard.path):
+                if entry.name.endswith(".tmp"):
+                    continue
+                try:
+                    stat = entry.stat()
+                except FileNotFoundError:
+                    continue
+                files.append((entry.path, stat.st_size, stat.st_mtime))
+        return files
+
+    def _evict_disk(self):
+        # Called with _disk_lock held; rescans, since other workers share the directory
+        files = sorted(self._disk_files(), key=lambda item: item[2])
+        total = sum(size for _, size, _ in files)
+        target = self.max_disk_bytes * 0.9
+        for path, size, _ in files:
+            if total <= target:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            total -= size
+            self.disk_evictions += 1
+        self._disk_bytes = total
+
+    # --- public API ---
+
+    async def get(self, key: str) -> Optional[bytes]:
+        data = self._memory_get(key)
+        if data is not None:
+            self.memory_hits += 1
+            return data
+        data = await asyncio.to_thread(self._disk_get, key)
+        if data is not None:
+            self.disk_hits += 1
+            self._memory_put(key, data)
+        return data
+
+    async def put(self, key: str, data: bytes):
+        self._memory_put(key, data)
+        await asyncio.to_thread(self._disk_put, key, data)
+
+    async def get_or_create(self, key: str, text: str, factory: Callable[[], Awaitable[bytes]]) -> bytes:
+        data = await self.get(key)
+        if data is not None:
+            self.chars_saved += len(text)
+            return data
+
+        task = self._inflight.get(key)
+        if task is not None:
+            self.coalesced += 1
+            self.chars_saved += len(text)
+        else:
+            self.misses += 1
+            # The synthesis runs in its own task so that no caller, including
+            # the one that started it, can cancel it for the others.
+            task = asyncio.ensure_future(self._create(key, text, factory))
+            self._inflight[key] = task
+            task.add_done_callback(lambda done: self._finished(key, done))
+        return await asyncio.shield(task)
+
+    async def _create(self, key: str, text: str, factory: Callable[[], Awaitable[bytes]]) -> bytes:
+        start = time.perf_counter()
+        data = await factory()
+        self.synth_seconds += time.perf_counter() - start
+        self.chars_synthesized += len(text)
+        await self.put(key, data)
+        return data
+
+    def _finished(self, key: str, task: "asyncio.Task[bytes]"):
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+        # Every waiter may have gone; don't leave "exception never retrieved" noise.
+        if not task.cancelled():
+            task.exception()
+
+    def contains(self, key: str) -> bool:
+        """Memory tier only, so it is safe on the event loop; get() also looks on disk."""
+        with self._lock:
+            return key in self._memory
+
+    def stats(self) -> Dict[str, float]:
+        hits = self.memory_hits + self.disk_hits + self.coalesced
+        lookups = hits + self.misses
+        avg_synth = self.synth_seconds / self.misses if self.misses else 0.0
+        return {
+            "memory_hits": self.memory_hits,
+            "disk_hits": self.disk_hits,
+            "coalesced": self.coalesced,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": round(hits / lookups, 4) if lookups else 0.0,
+            "memory_entries": len(self._memory),
+            "memory_bytes": self._memory_bytes,
+            "disk_bytes": self._disk_bytes,
+            "disk_evictions": self.disk_evictions,
+            "avg_synth_seconds": round(avg_synth, 4),
+            "est_seconds_saved": round(avg_synth * hits, 2),
+            "chars_synthesized": self.chars_synthesized,
+            "chars_saved": self.chars_saved,
+        }
@@ -0,0 +1,141 @@
+import asyncio
+import time
+from typing import Any, Awaitable, Callable, Dict, Iterable, Set
+
+# Speculative TTS. While the user answers question k, the reply they hear next
+# almost always ends with question k+1 (its text and the choices line), so
+# after every turn the app predicts those sentence chunks and synthesizes them
+# in the background. When /tts later needs the same clip it is already in
+# TTS_CACHE, or still in flight and the request joins it.
+#
+# A prediction stays open until its session's next reply is known: settle()
+# keeps the chunks that reply contains, for /tts to claim, and lets go of the
+# rest. Sessions on the same survey predict the same clips, so a prediction
+# is only dropped once no session is waiting on it: one still running is
+# cancelled (the shared synthesis itself still finishes into TTS_CACHE), a
+# finished one counts as unused. Unclaimed predictions expire after
+# ttl_seconds.
+
+
+class _Prediction:
+    __slots__ = ("task", "sessions", "started")
+
+    def __init__(self, task: "asyncio.Task[Any]"):
+        self.task = task
+        self.sessions: Set[str] = set()
+        self.started = time.monotonic()
+
+
+class SpeechPrefetcher:
+    """Background syntheses of predicted clips, keyed by TTS cache key."""
+
+    def __init__(self, synthesize: Callable[[str], Awaitable[Any]], key: Callable[[str], str],
+                 cached: Callable[[str], bool], ttl_seconds: float = 120, enabled: bool = True):
+        self.synthesize = synthesize
+        self.key = key
+        self.cached = cached
+        self.ttl_seconds = ttl_seconds
+        self.enabled = enabled
+        self._predictions: Dict[str, _Prediction] = {}
+        self._by_session: Dict[str, Set[str]] = {}
+        self.started = 0
+        self.already_cached = 0
+        self.hits = 0
+        self.unused = 0
+        self.cancelled = 0
+
+    def prefetch(self, session_id: str, texts: Iterable[str]):
+        """Starts background TTS for clips this session will probably hear next."""
+        if not self.enabled:
+            return
+        self.expire()
+        for text in texts:
+            key = self.key(text)
+            prediction = self._predictions.get(key)
+            if prediction is None:
+                if self.cached(key):
+                    self.already_cached += 1
+                    continue
+                task = asyncio.create_task(self.synthesize(text))
+                task.add_done_callback(_consume_exception)
+                prediction = self._predictions[key] = _Prediction(task)
+                self.started += 1
+            prediction.sessions.add(session_id)
+            self._by_session.setdefault(session_id, set()).add(key)
+
+    def claim(self, key: str) -> bool:
+        """Called before every synthesis; True if the clip was prefetched."""
+        prediction = self._predictions.pop(key, None)
+        if prediction is None:
+            return False
+        for session_id in prediction.sessions:
+            self._release_key(session_id, key)
+        self.hits += 1
+        return True
+
+    def settle(self, session_id: str, reply_texts: Iterable[str]):
+        """The session's reply is known: keep the predictions it contains, let go of the others."""
+        keys = self._by_session.get(session_id)
+        if not keys:
+            return
+        wanted = {self.key(text) for text in reply_texts}
+        for key in list(keys - wanted):
+            self._release(session_id, key)
+
+    def forget(self, session_id: str):
+        """Lets go of every open prediction of a session (e.g. it was submitted)."""
+        for key in list(self._by_session.get(session_id, ())):
+            self._release(session_id, key)
+
+    def expire(self):
+        cutoff = time.monotonic() - self.ttl_seconds
+        for key in [k for k, p in self._predictions.items() if p.started < cutoff]:
+            for session_id in self._predictions[key].sessions:
+                self._release_key(session_id, key)
+            self._drop(key)
+
+    def _release(self, session_id: str, key: str):
+        self._release_key(session_id, key)
+        prediction = self._predictions[key]
+        prediction.sessions.discard(session_id)
+        if not prediction.sessions:
+            self._drop(key)
+
+    def _release_key(self, session_id: str, key: str):
+        keys = self._by_session.get(session_id)
+        if keys is not None:
+            keys.discard(key)
+            if not keys:
+                del self._by_session[session_id]
+
+    def _drop(self, key: str):
+        prediction = self._predictions.pop(key)
+        if prediction.task.done():
+            self.unused += 1
+        else:
+            prediction.task.cancel()
+            self.cancelled += 1
+
+    def stats(self) -> Dict[str, Any]:
+        settled = self.hits + self.unused + self.cancelled
+        return {
+            "enabled": self.enabled,
+            "started": self.started,
+            "already_cached": self.already_cached,
+            "open": len(self._predictions),
+            "hits": self.hits,
+            "unused": self.unused,
+            "cancelled": self.cancelled,
+            "hit_rate": round(self.hits / settled, 3) if settled else 0.0,
+        }
+
+    def close(self):
+        for key in list(self._predictions):
+            self._drop(key)
+        self._by_session.clear()
+
+
+def _consume_exception(task: "asyncio.Task[Any]"):
+    # Nobody awaits a speculative synthesis; a failure only means a later cache miss.
+    if not task.cancelled():
+        task.exception()